@@ -1,8 +1,39 @@
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+
+from app.analysis.sentiment import add_sums, analyze, features_from_sums, sentiment_sums
 
 def summarize_maps(raw: Dict[str, Any]) -> Dict[str, Any]:
     if not raw:
         return {"reviews": 0, "rating": 0.0}
     reviews = int(raw.get("reviews", 0))
     rating = float(raw.get("rating", 0.0))
-    return {"reviews": reviews, "rating": round(rating, 2)}
\ No newline at end of file
+    out = {"reviews": reviews, "rating": round(rating, 2)}
+    totals = raw.get("totals")
+    if totals is not None:
+        sums = totals["sentiment"]  # acumulado por merge_maps
+    else:
+        sums = sentiment_sums(analyze(raw.get("review_items") or [], "gmaps"))
+    if sums["n"]:
+        out["sentiment"] = features_from_sums(sums)
+    return out
+
+def merge_maps(prev: Optional[Dict[str, Any]], fresh: Dict[str, Any], limit: int) -> Dict[str, Any]:
+    """
+    Combina las reseñas nuevas (el scrape se corta al llegar a una conocida) con
+    las `limit` más recientes ya vistas. Cada reseña guarda su `lang`/`compound`;
+    los totales se ajustan solo con las que entran y las que salen.
+    """
+    old_items: List[Dict[str, Any]] = list((prev or {}).get("review_items") or [])
+    totals = dict((prev or {}).get("totals") or {"sentiment": sentiment_sums([])})
+    seen = {r.get("id") for r in old_items}
+    new_items = [r for r in fresh.get("review_items") or [] if r.get("id") and r["id"] not in seen]
+    scored = {s["id"]: s for s in analyze(new_items, "gmaps")}
+    new_items = [
+        {**r, "lang": scored[r["id"]]["lang"], "compound": scored[r["id"]]["compound"]}
+        for r in new_items if r.get("id") in scored
+    ]
+    totals["sentiment"] = add_sums(totals["sentiment"], sentiment_sums(new_items))
+
+    items = new_items + old_items
+    totals["sentiment"] = add_sums(totals["sentiment"], sentiment_sums(items[limit:]), -1)
+    return {**fresh, "review_items": items[:limit], "totals": totals}
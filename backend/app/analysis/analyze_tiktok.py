@@ -1,8 +1,12 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+from app.analysis.sentiment import add_sums, analyze, features_from_sums, sentiment_sums, summarize_sentiment
 
 def summarize_tiktok(raw: Dict[str, Any]) -> Dict[str, Any]:
     if not raw:
         return {"videos": 0, "followers": 0, "engagement": 0.0}
+    if raw.get("totals"):
+        return _summary_from_totals(raw)
     vids = raw.get("videos", [])
     followers = int(raw.get("followers", 0))
     likes = sum(int(v.get("likes", 0)) for v in vids)
@@ -10,8 +14,73 @@ def summarize_tiktok(raw: Dict[str, Any]) -> Dict[str, Any]:
     shares = sum(int(v.get("shares", 0)) for v in vids)
     denom = max(1, followers)
     engagement = (likes + comments + shares) / denom
-    return {
+    out = {
         "videos": len(vids),
         "followers": followers,
         "engagement": round(engagement, 4),
-    }
\ No newline at end of file
+    }
+    texts = [c for v in vids for c in (v.get("comment_items") or [])]
+    sent = summarize_sentiment(texts, "tiktok") if texts else {"n": 0}
+    if sent["n"]:
+        out["sentiment"] = sent
+    return out
+
+def _summary_from_totals(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Mismo resumen a partir de las sumas acumuladas por `merge_tiktok` (O(1))."""
+    t = raw["totals"]
+    followers = int(raw.get("followers", 0))
+    engagement = (t["likes"] + t["comments"] + t["shares"]) / max(1, followers)
+    out = {
+        "videos": t["videos"],
+        "followers": followers,
+        "engagement": round(engagement, 4),
+    }
+    if t["sentiment"]["n"]:
+        out["sentiment"] = features_from_sums(t["sentiment"])
+    return out
+
+# ---- re-scrape incremental ----
+def _empty_totals() -> Dict[str, Any]:
+    return {"videos": 0, "likes": 0, "comments": 0, "shares": 0, "sentiment": sentiment_sums([])}
+
+def _apply(totals: Dict[str, Any], v: Dict[str, Any], sign: int) -> None:
+    totals["videos"] += sign
+    for k in ("likes", "comments", "shares"):
+        totals[k] += sign * int(v.get(k, 0))
+    totals["sentiment"] = add_sums(totals["sentiment"], v.get("_sentiment"), sign)
+
+def merge_tiktok(
+    prev: Optional[Dict[str, Any]], fresh: Dict[str, Any], video_limit: int, comments_per_video: int
+) -> Dict[str, Any]:
+    """
+    Combina un scrape (que pudo cortarse al llegar a videos conocidos) con el
+    resultado combinado anterior. Solo se tocan los totales de los videos que
+    llegaron o salieron de la ventana de `video_limit` más recientes; el
+    sentimiento de cada video se guarda en `_sentiment` y se recalcula solo si
+    cambiaron sus comentarios.
+    """
+    prev_videos = {v["id"]: v for v in (prev or {}).get("videos") or []}
+    totals = dict((prev or {}).get("totals") or _empty_totals())
+    merged = dict(prev_videos)
+    for v in fresh.get("videos") or []:
+        old = prev_videos.get(v["id"])
+        items = list(v.get("comment_items") or [])
+        if old is not None:
+            seen = {c["id"] for c in items}
+            items += [c for c in old.get("comment_items") or [] if c["id"] not in seen]
+            items = items[:comments_per_video]
+            if [c["id"] for c in items] == [c["id"] for c in old.get("comment_items") or []]:
+                sent = old.get("_sentiment")
+            else:
+                sent = sentiment_sums(analyze(items, "tiktok"))
+            _apply(totals, old, -1)
+        else:
+            sent = sentiment_sums(analyze(items, "tiktok"))
+        nv = {**v, "comment_items": items, "_sentiment": sent}
+        _apply(totals, nv, +1)
+        merged[v["id"]] = nv
+
+    ordered = sorted(merged.values(), key=lambda v: -int(v.get("create_time") or 0))
+    for v in ordered[video_limit:]:
+        _apply(totals, v, -1)
+    return {**fresh, "videos": ordered[:video_limit], "totals": totals}
@@ -1,4 +1,9 @@
-from typing import Dict, Any, List
+from __future__ import annotations
+from typing import TYPE_CHECKING, Dict, Any, List
+
+if TYPE_CHECKING:  # numpy/pandas solo se cargan en el camino por lotes
+    import numpy as np
+    import pandas as pd
 
 
 def safe_float(x, default=0.0):
@@ -61,4 +66,234 @@ def rule_based_financials(d: Dict[str, Any]) -> Dict[str, Any]:
         "creditLimit": float(credit_limit),
         "details": d,
         "comments": comments[:3]
-    }
\ No newline at end of file
+    }
+
+def heuristic_financials(d: Dict[str, Any]) -> Dict[str, Any]:
+    """Heurística rápida de /api/evaluate: score 0..100 por margen, deuda/ventas y liquidez."""
+    ventas = d.get("ingresos_ventas") or 0
+    utilidad = d.get("utilidad_neta") or 0
+    deuda = d.get("deuda_total") or 0
+    liquidez = d.get("liquidez_corriente") or 1
+
+    # Menos riesgo si utilidad y liquidez son altos; más riesgo si deuda alta
+    raw = 0.5
+    try:
+        if ventas > 0:
+            margen = (utilidad / max(1.0, ventas))
+            raw -= 0.3 * max(0.0, min(0.5, margen))       # mejor margen → reduce riesgo
+        raw += 0.2 * min(1.0, deuda / max(1.0, ventas))    # deuda/ventas alto → sube riesgo
+        raw -= 0.2 * max(0.0, min(1.0, (liquidez - 1.0)))  # liquidez >1 reduce riesgo
+    except Exception:
+        pass
+
+    raw = max(0.0, min(1.0, raw))
+    score_0_100 = round(100 * raw)
+    level = "low" if score_0_100 < 30 else "medium" if score_0_100 < 70 else "high"
+    credit = max(0.0, 100000 - score_0_100 * 1000)
+
+    return {
+        "score": score_0_100,
+        "level": level,
+        "creditLimit": float(credit),
+        "details": d,
+    }
+
+
+# ---- Versión columnar (carteras completas) ----
+# Mismas reglas que rule_based_financials / heuristic_financials, evaluadas sobre
+# columnas NumPy. Como en safe_float, campos ausentes, None o no numéricos cuentan
+# como 0 y NaN se conserva; min/max siguen la semántica de Python con NaN
+# (ver _pmin/_pmax), así que ambos caminos dan lo mismo para la misma entrada.
+
+_RULE_COMMENTS = [
+    "Patrimonio o utilidad neta negativa.",
+    "Liquidez corriente menor a 1.",
+    "Apalancamiento elevado respecto al patrimonio.",
+    "Rentabilidad neta sobre ventas baja.",
+    "ROE bajo respecto al mercado.",
+]
+_PAD_COMMENT = "Información incompleta o no provista."
+
+
+def _num(df: pd.DataFrame, col: str) -> np.ndarray:
+    import numpy as np
+    import pandas as pd
+
+    if col not in df.columns:
+        return np.zeros(len(df))
+    s = df[col]
+    if s.dtype != object and not pd.api.types.is_string_dtype(s):
+        return s.astype("float64").to_numpy()  # columna numérica: NaN queda NaN
+    out = pd.to_numeric(s, errors="coerce").to_numpy(dtype="float64", copy=True)
+    bad = np.isnan(out)
+    if bad.any():
+        # None / texto no numérico → 0, NaN o "nan" → NaN: lo mismo que safe_float
+        out[bad] = [safe_float(v) for v in s.to_numpy(dtype=object)[bad]]
+    return out
+
+
+def _pmin(a: float, x: np.ndarray) -> np.ndarray:
+    """`min(a, x)` de Python por elemento: con x NaN devuelve `a` (np.minimum daría NaN)."""
+    import numpy as np
+
+    return np.where(x < a, x, a)
+
+
+def _pmax(a: float, x: np.ndarray) -> np.ndarray:
+    """`max(a, x)` de Python por elemento: con x NaN devuelve `a`."""
+    import numpy as np
+
+    return np.where(x > a, x, a)
+
+
+_RULE_COLS = ("patrimonio", "utilidad_neta", "deuda_total", "liquidez_corriente", "rent_neta_ventas", "roe")
+_HEURISTIC_COLS = ("ingresos_ventas", "utilidad_neta", "deuda_total", "liquidez_corriente")
+
+
+def _records_frame(rows: List[Dict[str, Any]], cols) -> pd.DataFrame:
+    """
+    Tabla con las columnas `cols` de las filas. No usa `from_records`: convertiría
+    None en NaN y se perdería la diferencia (None → 0, NaN → NaN). Una columna con
+    valores que no son números queda como object y `_num` la resuelve con safe_float.
+    """
+    import numpy as np
+    import pandas as pd
+
+    data = {}
+    for c in cols:
+        vals = [r.get(c) for r in rows]
+        try:
+            data[c] = np.array([0.0 if v is None else v for v in vals], dtype="float64")
+        except (TypeError, ValueError):
+            data[c] = pd.Series(vals, dtype=object)
+    return pd.DataFrame(data, index=range(len(rows)))
+
+
+def _round2(x: np.ndarray) -> np.ndarray:
+    """round(x, 2) de Python: np.round difiere en los casi-empates, que se recalculan."""
+    import numpy as np
+
+    out = np.round(x, 2)
+    frac = np.abs(np.modf(x * 100)[0])
+    near_tie = np.abs(frac - 0.5) < 1e-6
+    if near_tie.any():
+        out[near_tie] = [round(v, 2) for v in x[near_tie].tolist()]
+    return out
+
+
+def _level(score: np.ndarray) -> np.ndarray:
+    import numpy as np
+
+    return np.select([score < 30, score < 70], ["low", "medium"], default="high")
+
+
+def rule_based_financials_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    `rule_based_financials` para una tabla de FinancialData en una sola pasada.
+    Devuelve score, level, creditLimit y comment_1..comment_3 (mismo índice que `df`).
+    """
+    import numpy as np
+    import pandas as pd
+
+    patrimonio = _num(df, "patrimonio")
+    utilidad = _num(df, "utilidad_neta")
+    deuda_total = _num(df, "deuda_total")
+    liquidez = _num(df, "liquidez_corriente")
+    rent_ventas = _num(df, "rent_neta_ventas")
+    roe = _num(df, "roe")
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        leverage = deuda_total / np.maximum(patrimonio, 1)
+    flags = np.column_stack([
+        (patrimonio <= 0) | (utilidad <= 0),
+        liquidez < 1,
+        (deuda_total > 0) & (patrimonio > 0) & (leverage > 2),
+        rent_ventas < 0.03,
+        roe < 0.05,
+    ])
+
+    risk = np.where(flags[:, 0], 90.0, 50.0)
+    risk = risk + 10 * flags[:, 1] + 10 * flags[:, 2] + 5 * flags[:, 3] + 5 * flags[:, 4]
+    risk = np.clip(risk, 0, 100)
+
+    base = np.maximum(0.1, 0.3 - risk / 500)
+    credit_limit = _round2(patrimonio * base)
+
+    # los 3 primeros factores activos (en el orden de las reglas) + relleno
+    order = np.argsort(~flags, axis=1, kind="stable")[:, :3]
+    active = np.take_along_axis(flags, order, axis=1)
+    msgs = np.array(_RULE_COMMENTS + [_PAD_COMMENT], dtype=object)
+    comments = msgs[np.where(active, order, len(_RULE_COMMENTS))]
+
+    return pd.DataFrame(
+        {
+            "score": np.rint(risk).astype(int),
+            "level": _level(risk),
+            "creditLimit": credit_limit,
+            "comment_1": comments[:, 0],
+            "comment_2": comments[:, 1],
+            "comment_3": comments[:, 2],
+        },
+        index=df.index,
+    )
+
+
+def heuristic_financials_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """`heuristic_financials` para una tabla completa; devuelve score, level y creditLimit."""
+    import numpy as np
+    import pandas as pd
+
+    ventas = _num(df, "ingresos_ventas")
+    utilidad = _num(df, "utilidad_neta")
+    deuda = _num(df, "deuda_total")
+    liquidez = _num(df, "liquidez_corriente")
+    liquidez = np.where(liquidez == 0, 1.0, liquidez)  # `or 1` (NaN es verdadero: se queda)
+
+    denom = _pmax(1.0, ventas)
+    raw = np.full(len(df), 0.5)
+    with np.errstate(invalid="ignore"):
+        raw = raw - np.where(ventas > 0, 0.3 * _pmax(0.0, _pmin(0.5, utilidad / denom)), 0.0)
+        raw = raw + 0.2 * _pmin(1.0, deuda / denom)
+        raw = raw - 0.2 * _pmax(0.0, _pmin(1.0, liquidez - 1.0))
+
+    raw = _pmax(0.0, _pmin(1.0, raw))
+    score = np.rint(100 * raw).astype(int)
+    return pd.DataFrame(
+        {
+            "score": score,
+            "level": _level(score),
+            "creditLimit": np.maximum(0.0, 100000 - score * 1000).astype(float),
+        },
+        index=df.index,
+    )
+
+
+def rule_based_financials_batch(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Igual que llamar `rule_based_financials` por fila, pero en una pasada vectorizada."""
+    if not rows:
+        return []
+    res = rule_based_financials_frame(_records_frame(rows, _RULE_COLS))
+    return [
+        {
+            "score": int(score),
+            "level": level,
+            "creditLimit": float(credit),
+            "details": d,
+            "comments": [c1, c2, c3],
+        }
+        for d, score, level, credit, c1, c2, c3 in zip(
+            rows, res["score"], res["level"], res["creditLimit"],
+            res["comment_1"], res["comment_2"], res["comment_3"],
+        )
+    ]
+
+
+def heuristic_financials_batch(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Igual que llamar `heuristic_financials` por fila, pero en una pasada vectorizada."""
+    if not rows:
+        return []
+    res = heuristic_financials_frame(_records_frame(rows, _HEURISTIC_COLS))
+    return [
+        {"score": int(score), "level": level, "creditLimit": float(credit), "details": d}
+        for d, score, level, credit in zip(rows, res["score"], res["level"], res["creditLimit"])
+    ]
@@ -0,0 +1,345 @@
+"""
+Sentimiento de comentarios (TikTok) y reseñas (Maps), por lotes y con caché.
+
+- Idioma: heurística de palabras vacías es/en (microsegundos por texto); solo si
+  queda empate y está instalado `langdetect` se le pregunta a langdetect.
+- Puntaje `compound` en -1..1: VADER para inglés si está `vaderSentiment`; en el
+  resto de casos, un léxico propio es/en con negación, intensificadores, "pero" y
+  emojis (misma normalización que VADER).
+- Caché por id de comentario (o hash del texto si no trae id): un re-scrape solo
+  puntúa el texto nuevo.
+- Lotes grandes (SENTIMENT_POOL_MIN textos nuevos o más) se reparten en un pool de
+  procesos con SENTIMENT_WORKERS procesos.
+"""
+from __future__ import annotations
+import hashlib, importlib.util, math, re, threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.config import (
+    CACHE_DIR, SENTIMENT_CACHE_ITEMS, SENTIMENT_CACHE_TTL, SENTIMENT_POOL_MIN, SENTIMENT_WORKERS,
+)
+from app.services.cache import TieredCache
+
+# opcionales; se importan recién al usarse
+_VADER_OK = importlib.util.find_spec("vaderSentiment") is not None
+_LANGDETECT_OK = importlib.util.find_spec("langdetect") is not None
+
+POS_THRESHOLD = 0.05  # umbrales habituales de VADER para positivo/negativo
+NEG_THRESHOLD = -0.05
+
+sentiment_cache = TieredCache(
+    CACHE_DIR / "sentiment.sqlite",
+    ttls={"sentiment": SENTIMENT_CACHE_TTL},
+    max_items=SENTIMENT_CACHE_ITEMS,
+)
+
+# ---- léxico ----
+# valencias en la escala de VADER (-4..4); adjetivos en masculino singular (se
+# agregan femenino y plurales), todo sin tildes
+_ADJ = {
+    # es +
+    "bueno": 1.9, "excelente": 3.2, "perfecto": 2.9, "hermoso": 2.6, "bonito": 2.0, "lindo": 2.0,
+    "rico": 2.0, "delicioso": 2.8, "recomendado": 2.2, "maravilloso": 3.0, "fantastico": 3.0,
+    "atento": 1.6, "rapido": 1.2, "limpio": 1.4, "barato": 1.0, "contento": 2.2, "satisfecho": 2.0,
+    "comodo": 1.6, "seguro": 1.2, "fino": 1.5, "honesto": 2.0, "puntual": 1.4, "economico": 1.0,
+    # es −
+    "malo": -2.2, "pesimo": -3.2, "feo": -2.0, "sucio": -2.2, "caro": -1.2, "lento": -1.4,
+    "decepcionado": -2.4, "grosero": -2.4, "malisimo": -3.0, "roto": -1.8, "falso": -2.2,
+    "mentiroso": -2.6, "enganoso": -2.4, "inseguro": -1.8, "asqueroso": -3.0, "nefasto": -3.0,
+    "estafador": -3.2, "ladron": -3.0, "demorado": -1.4, "peligroso": -2.0,
+}
+_WORDS = {
+    # es +
+    "buen": 1.9, "bien": 1.5, "genial": 2.8, "increible": 2.6, "recomiendo": 2.2,
+    "recomendable": 2.0, "amable": 2.0, "amables": 2.0, "calidad": 1.2, "feliz": 2.6, "felices": 2.6,
+    "encanta": 2.8, "encanto": 2.4, "encantan": 2.8, "gusta": 1.8, "gustan": 1.8, "gusto": 1.6,
+    "amor": 2.8, "amo": 2.8, "mejor": 2.0, "mejores": 2.0, "top": 2.0, "gracias": 1.8,
+    "espectacular": 3.0, "agradable": 2.0, "agradables": 2.0, "eficiente": 1.8, "profesional": 1.6,
+    "profesionales": 1.6, "confiable": 2.0, "confiables": 2.0, "chevere": 2.2, "bacan": 2.0,
+    "facil": 1.2, "felicitaciones": 2.6, "felicidades": 2.6, "excelencia": 2.6, "fenomenal": 3.0,
+    "brutal": 1.5, "crack": 1.8, "ideal": 2.0, "util": 1.4, "vale": 0.8,
+    # es −
+    "mal": -2.0, "horrible": -3.0, "horribles": -3.0, "terrible": -3.0, "terribles": -3.0,
+    "estafa": -3.2, "robo": -2.8, "roban": -2.8, "fraude": -3.2, "basura": -2.8, "asco": -2.8,
+    "decepcion": -2.4, "decepcionante": -2.4, "peor": -2.4, "peores": -2.4, "queja": -1.6,
+    "quejas": -1.6, "reclamo": -1.4, "problema": -1.6, "problemas": -1.6, "demora": -1.4,
+    "mentira": -2.2, "engano": -2.6, "triste": -2.0, "odio": -3.0, "fatal": -2.8,
+    "deficiente": -2.2, "incompetente": -2.6, "irresponsable": -2.4, "irresponsables": -2.4,
+    "mediocre": -2.0, "lamentable": -2.6, "desastre": -3.0, "nunca_mas": -2.6, "cuidado": -1.0,
+    "pesimos": -3.2, "indignante": -2.8, "abuso": -2.6, "cobran": -0.6, "insalubre": -2.6,
+    # en +
+    "good": 1.9, "great": 3.1, "excellent": 3.2, "amazing": 2.8, "awesome": 3.1, "love": 3.2,
+    "loved": 2.9, "loves": 2.7, "nice": 1.8, "best": 3.2, "perfect": 2.7, "recommend": 1.5,
+    "recommended": 1.5, "friendly": 2.2, "happy": 2.7, "beautiful": 2.9, "fast": 1.0, "clean": 1.7,
+    "cool": 1.3, "wow": 2.8, "fantastic": 2.6, "thanks": 1.9, "thank": 1.5, "wonderful": 2.7,
+    "delicious": 2.7, "helpful": 1.8, "fun": 2.3, "cute": 2.0, "legit": 1.5,
+    # en −
+    "bad": -2.5, "awful": -2.0, "worst": -3.1, "hate": -2.7, "scam": -2.6, "fraud": -2.8,
+    "poor": -2.1, "slow": -1.0, "dirty": -1.9, "rude": -2.0, "disappointed": -1.9,
+    "disappointing": -2.2, "broken": -1.7, "fake": -2.0, "waste": -1.8, "problem": -1.7,
+    "problems": -1.7, "expensive": -0.9, "sad": -2.1, "angry": -2.3, "useless": -1.8,
+    "ugly": -2.3, "stolen": -2.2, "lie": -1.9, "liar": -2.4,
+}
+LEXICON: Dict[str, float] = dict(_WORDS)
+for _w, _v in _ADJ.items():
+    _stem = _w[:-1] if _w.endswith("o") else _w
+    for _form in ((_w, _stem + "a", _w + "s", _stem + "as") if _w.endswith("o") else (_w, _w + "es")):
+        LEXICON.setdefault(_form, _v)
+
+EMOJI = {
+    "😀": 1.8, "😃": 1.9, "😄": 2.0, "😁": 2.0, "😊": 2.0, "🙂": 1.2, "😍": 2.8, "🥰": 2.8,
+    "😘": 2.2, "🤩": 2.8, "😎": 1.6, "😂": 1.2, "🤣": 1.2, "👍": 1.8, "👏": 2.0, "🙌": 2.0,
+    "🙏": 1.4, "❤": 2.6, "💕": 2.4, "💖": 2.4, "💯": 2.2, "🔥": 1.8, "✨": 1.2, "⭐": 1.6,
+    "😡": -2.8, "😠": -2.6, "🤬": -3.0, "👎": -2.4, "😞": -2.0, "😢": -1.8, "😭": -1.2,
+    "💩": -2.4, "🤮": -2.8, "😤": -1.8, "😒": -1.6, "🙄": -1.4, "😔": -1.6, "☹": -1.8, "🤡": -1.4,
+}
+
+_NEGATORS = frozenset({
+    "no", "ni", "nunca", "jamas", "tampoco", "sin", "nada", "nadie",
+    "not", "never", "nothing", "without", "dont", "don't", "doesn't", "didn't", "isn't", "wasn't",
+    "aren't", "can't", "won't", "cannot",
+})
+_BOOSTERS = {
+    "muy": 0.293, "super": 0.293, "tan": 0.293, "demasiado": 0.293, "bastante": 0.2, "re": 0.293,
+    "totalmente": 0.293, "realmente": 0.293, "sumamente": 0.293, "extremadamente": 0.293,
+    "very": 0.293, "really": 0.293, "so": 0.293, "extremely": 0.293, "totally": 0.293,
+    "absolutely": 0.293, "too": 0.293,
+    "poco": -0.293, "algo": -0.2, "medio": -0.2, "slightly": -0.293, "somewhat": -0.293,
+    "kinda": -0.293, "barely": -0.293,
+}
+_BUT = frozenset({"pero", "but", "sino", "aunque"})
+_N_SCALAR = -0.74   # VADER: una negación invierte y atenúa
+_ALPHA = 15.0       # VADER: normalización x / sqrt(x² + α)
+
+_ES_STOP = frozenset(
+    "de la que el en y los se del las un por con una su para es al lo como mas pero sus le ya "
+    "muy sin sobre hay donde porque esta este son todo todos nos yo tiene mi me te nada nunca nunca_mas "
+    "fue era tan bien gracias buen bueno excelente pesimo servicio atencion".split()
+)
+_EN_STOP = frozenset(
+    "the and is it to of in that this for you was with on are be have not but they at my so "
+    "very what all we can good great love just its it's i service".split()
+)
+
+_ACCENTS = str.maketrans("áéíóúüñàèìòù", "aeiouunaeiou")
+_REPEAT_RE = re.compile(r"([a-z])\1{2,}")        # "buenooo" → "bueno"
+_WORD_RE = re.compile(r"[a-z]+(?:'[a-z]+)?")
+_EMOJI_RE = re.compile("|".join(map(re.escape, EMOJI)))
+
+
+def _tokens(text: str) -> List[str]:
+    t = _REPEAT_RE.sub(r"\1", text.lower().translate(_ACCENTS))
+    toks = _WORD_RE.findall(t)
+    # "nunca más" como una sola expresión
+    for i in range(len(toks) - 1):
+        if toks[i] == "nunca" and toks[i + 1] == "mas":
+            toks[i], toks[i + 1] = "nunca_mas", ""
+    return toks
+
+
+def detect_lang(text: str, toks: Optional[List[str]] = None) -> str:
+    """"es" | "en" | código de langdetect | "und"."""
+    toks = _tokens(text) if toks is None else toks
+    es = sum(1 for t in toks if t in _ES_STOP)
+    en = sum(1 for t in toks if t in _EN_STOP)
+    if es != en:
+        return "es" if es > en else "en"
+    if _LANGDETECT_OK and len(toks) >= 3:
+        try:
+            return _langdetect(text)
+        except Exception:
+            pass
+    return "und"
+
+
+_ld = None
+
+
+def _langdetect(text: str) -> str:
+    global _ld
+    if _ld is None:
+        from langdetect import DetectorFactory, detect
+        DetectorFactory.seed = 0  # resultados reproducibles
+        _ld = detect
+    return _ld(text)
+
+
+_vader = None
+
+
+def _vader_compound(text: str) -> float:
+    global _vader
+    if _vader is None:
+        from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+        _vader = SentimentIntensityAnalyzer()
+    return _vader.polarity_scores(text)["compound"]
+
+
+def lexicon_compound(text: str, toks: Optional[List[str]] = None) -> float:
+    """Puntaje -1..1 con el léxico propio (es/en)."""
+    toks = _tokens(text) if toks is None else toks
+    valences: List[float] = []
+    but_at = -1
+    for i, tok in enumerate(toks):
+        v = LEXICON.get(tok)
+        if v is None:
+            if tok in _BUT:
+                but_at = len(valences)
+            continue
+        # intensificador y negación en las 3 palabras anteriores
+        for j in range(max(0, i - 3), i):
+            prev = toks[j]
+            boost = _BOOSTERS.get(prev)
+            if boost is not None and j == i - 1:
+                v += boost if v > 0 else -boost
+            if prev in _NEGATORS:
+                v *= _N_SCALAR
+        valences.append(v)
+    if but_at >= 0:
+        valences = [v * 0.5 for v in valences[:but_at]] + [v * 1.5 for v in valences[but_at:]]
+    total = sum(valences) + sum(EMOJI[e] for e in _EMOJI_RE.findall(text))
+    if not total:
+        return 0.0
+    bangs = min(text.count("!"), 4) * 0.292
+    total += bangs if total > 0 else -bangs
+    return max(-1.0, min(1.0, total / math.sqrt(total * total + _ALPHA)))
+
+
+def score_text(text: str) -> Tuple[str, float]:
+    """(idioma, compound) de un texto."""
+    toks = _tokens(text)
+    lang = detect_lang(text, toks)
+    if lang == "en" and _VADER_OK:
+        return lang, _vader_compound(text)
+    return lang, lexicon_compound(text, toks)
+
+
+def _score_chunk(texts: Sequence[str]) -> List[Tuple[str, float]]:
+    # trabajo de cada proceso del pool (función de módulo: se serializa por nombre)
+    return [score_text(t) for t in texts]
+
+
+# ---- lotes ----
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            import multiprocessing
+            # spawn: el proceso de la API tiene hilos (pool de navegadores, jobs)
+            _pool = ProcessPoolExecutor(
+                max_workers=SENTIMENT_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+def score_texts(texts: Sequence[str], workers: Optional[int] = None) -> List[Tuple[str, float]]:
+    """Puntúa muchos textos (sin caché); con lotes grandes usa el pool de procesos."""
+    texts = list(texts)
+    workers = SENTIMENT_WORKERS if workers is None else workers
+    if workers <= 1 or len(texts) < SENTIMENT_POOL_MIN:
+        return _score_chunk(texts)
+    size = max(500, -(-len(texts) // (workers * 4)))
+    out: List[Tuple[str, float]] = []
+    for part in _get_pool().map(_score_chunk, [texts[i:i + size] for i in range(0, len(texts), size)]):
+        out.extend(part)
+    return out
+
+
+def _cache_key(item: Dict[str, Any], source: str) -> str:
+    cid = item.get("id")
+    if cid:
+        return f"{source}:{cid}"
+    return "h:" + hashlib.blake2b(item["text"].encode("utf-8"), digest_size=12).hexdigest()
+
+
+def analyze(items: Iterable[Dict[str, Any]], source: str = "") -> List[Dict[str, Any]]:
+    """
+    [{id?, text}, ...] → [{id, lang, compound}, ...] (se omiten los textos vacíos).
+    Solo se puntúa lo que no está en caché; repetidos dentro del lote, una vez.
+    """
+    items = [it for it in items if (it.get("text") or "").strip()]
+    if not items:
+        return []
+    keys = [_cache_key(it, source) for it in items]
+    known = sentiment_cache.get_many("sentiment", keys)
+    todo: Dict[str, str] = {}
+    for key, it in zip(keys, items):
+        if key not in known and key not in todo:
+            todo[key] = it["text"]
+    if todo:
+        new = {key: [lang, round(c, 4)] for key, (lang, c) in zip(todo, score_texts(list(todo.values())))}
+        sentiment_cache.set_many("sentiment", new)
+        known.update(new)
+    return [
+        {"id": it.get("id"), "lang": known[key][0], "compound": known[key][1]}
+        for key, it in zip(keys, items)
+    ]
+
+
+def sentiment_sums(scored: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Sumas acumulables de un conjunto de textos puntuados. `sum_e4` es la suma de
+    compound en diezmilésimos (entero): sumar y restar deltas no acumula error.
+    """
+    comp = [s["compound"] for s in scored]
+    return {
+        "n": len(comp),
+        "sum_e4": sum(round(c * 10_000) for c in comp),
+        "pos": sum(1 for c in comp if c >= POS_THRESHOLD),
+        "neg": sum(1 for c in comp if c <= NEG_THRESHOLD),
+        "langs": dict(Counter(s["lang"] for s in scored)),
+    }
+
+
+def add_sums(a: Optional[Dict[str, Any]], b: Optional[Dict[str, Any]], sign: int = 1) -> Dict[str, Any]:
+    """a + b (o a - b con sign=-1), sin modificar los argumentos."""
+    a = a or sentiment_sums([])
+    b = b or sentiment_sums([])
+    langs = Counter(a["langs"])
+    for lang, k in b["langs"].items():
+        langs[lang] += sign * k
+    return {
+        "n": a["n"] + sign * b["n"],
+        "sum_e4": a["sum_e4"] + sign * b["sum_e4"],
+        "pos": a["pos"] + sign * b["pos"],
+        "neg": a["neg"] + sign * b["neg"],
+        "langs": {lang: k for lang, k in langs.items() if k > 0},
+    }
+
+
+def features_from_sums(sums: Dict[str, Any]) -> Dict[str, Any]:
+    """Agregados: n, media de compound, proporción positiva/negativa e idiomas."""
+    n = sums["n"]
+    if not n:
+        return {"n": 0}
+    return {
+        "n": n,
+        "mean": round(sums["sum_e4"] / (10_000 * n), 4),
+        "pos_share": round(sums["pos"] / n, 4),
+        "neg_share": round(sums["neg"] / n, 4),
+        "langs": dict(Counter(sums["langs"]).most_common()),
+    }
+
+
+def sentiment_features(scored: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    return features_from_sums(sentiment_sums(scored))
+
+
+def summarize_sentiment(items: Iterable[Dict[str, Any]], source: str = "") -> Dict[str, Any]:
+    return sentiment_features(analyze(items, source))
+
+
+def sentiment_stats() -> Dict[str, Any]:
+    return {
+        "vader": _VADER_OK,
+        "langdetect": _LANGDETECT_OK,
+        "workers": SENTIMENT_WORKERS,
+        "pool_started": _pool is not None,
+        "cache": sentiment_cache.stats(),
+    }
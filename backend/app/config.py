@@ -1,5 +1,4 @@
 from pathlib import Path
-from dotenv import load_dotenv
 import os
 
 BASE_DIR = Path(__file__).resolve().parents[1]
@@ -7,10 +6,82 @@ DATA_DIR = BASE_DIR / "data"
 TMP_DIR = DATA_DIR / "tmp"
 SAMPLES_DIR = DATA_DIR / "samples"
 
-# Carga .env
-load_dotenv(BASE_DIR / ".env")
+# Carga .env (si existe; en producción las variables vienen del entorno)
+if (BASE_DIR / ".env").exists():
+    from dotenv import load_dotenv
+    load_dotenv(BASE_DIR / ".env")
 
 # Flags
 PLAYWRIGHT_HEADLESS = os.getenv("PLAYWRIGHT_HEADLESS", "1") == "1"
 REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", "25"))
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
\ No newline at end of file
+SCRAPE_LEAN = os.getenv("SCRAPE_LEAN", "1") == "1"  # bloquea imágenes/video/fuentes/trackers
+
+# Presupuesto por orquestación (ms, 0 = sin límite) y circuit breaker por fuente
+ORCHESTRATE_DEADLINE_MS = int(os.getenv("ORCHESTRATE_DEADLINE_MS", "60000"))
+CIRCUIT_FAILURES = int(os.getenv("CIRCUIT_FAILURES", "3"))    # fallos seguidos para abrir
+CIRCUIT_RESET_S = int(os.getenv("CIRCUIT_RESET_S", "60"))     # abierto antes de reintentar
+
+# Límite de tasa por dominio, compartido entre procesos (ver services/rate_limit.py)
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_DB_PATH = Path(os.getenv("RATE_LIMIT_DB_PATH", str(DATA_DIR / "rate_limit.sqlite")))
+# dominio=por_minuto/ráfaga/concurrencia; los dominios no listados no se limitan
+RATE_LIMITS = os.getenv("RATE_LIMITS", "google.com=30/5/4,tiktok.com=12/3/2")
+RATE_BACKOFF = float(os.getenv("RATE_BACKOFF", "0.5"))                  # tasa × esto al detectar bloqueo
+RATE_RECOVERY = float(os.getenv("RATE_RECOVERY", "0.1"))                # + esto por scrape correcto (hasta 1)
+RATE_MIN_FACTOR = float(os.getenv("RATE_MIN_FACTOR", "0.05"))
+RATE_BLOCK_COOLDOWN_S = float(os.getenv("RATE_BLOCK_COOLDOWN_S", "30"))  # pausa tras un bloqueo (se dobla)
+RATE_MAX_COOLDOWN_S = float(os.getenv("RATE_MAX_COOLDOWN_S", "600"))
+RATE_LEASE_TTL_S = float(os.getenv("RATE_LEASE_TTL_S", "300"))          # plaza de un proceso que no la liberó
+
+# Google Maps (la URL base se puede apuntar a scripts/fixture_server.py para pruebas)
+GMAPS_BASE_URL = os.getenv("GMAPS_BASE_URL", "https://www.google.com/maps")
+GMAPS_TABS = int(os.getenv("GMAPS_TABS", "4"))              # pestañas simultáneas por lote
+GMAPS_MAX_REVIEWS = int(os.getenv("GMAPS_MAX_REVIEWS", "100"))
+GMAPS_SENTIMENT_REVIEWS = int(os.getenv("GMAPS_SENTIMENT_REVIEWS", "0"))  # reseñas a leer por scrape (sentimiento)
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None  # p.ej. stub local para pruebas
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(30 * 24 * 3600)))
+
+# Pool de navegadores Playwright
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+BROWSER_CONTEXT_MAX_USES = int(os.getenv("BROWSER_CONTEXT_MAX_USES", "50"))
+BROWSER_STATE_DIR = DATA_DIR / "browser_state"
+TIKTOK_STATE_PATH = Path(os.getenv("TIKTOK_STATE_PATH", str(BASE_DIR / "tiktok_state.json")))
+
+# Caché de resultados de scraping (segundos)
+CACHE_DIR = DATA_DIR / "cache"
+CACHE_MAX_ITEMS = int(os.getenv("CACHE_MAX_ITEMS", "1000"))
+CACHE_PURGE_INTERVAL_S = int(os.getenv("CACHE_PURGE_INTERVAL_S", "3600"))  # borra vencidos del disco
+CACHE_TTL_GMAPS = int(os.getenv("CACHE_TTL_GMAPS", str(24 * 3600)))
+CACHE_TTL_TIKTOK = int(os.getenv("CACHE_TTL_TIKTOK", str(6 * 3600)))
+
+# Sentimiento de comentarios/reseñas (ver analysis/sentiment.py)
+SENTIMENT_WORKERS = int(os.getenv("SENTIMENT_WORKERS", str(os.cpu_count() or 1)))
+SENTIMENT_POOL_MIN = int(os.getenv("SENTIMENT_POOL_MIN", "5000"))  # textos nuevos para usar el pool
+SENTIMENT_CACHE_TTL = int(os.getenv("SENTIMENT_CACHE_TTL", str(90 * 24 * 3600)))
+SENTIMENT_CACHE_ITEMS = int(os.getenv("SENTIMENT_CACHE_ITEMS", "200000"))
+SENTIMENT_WEIGHT = float(os.getenv("SENTIMENT_WEIGHT", "0.3"))     # peso dentro de maps/tt
+SENTIMENT_MIN_TEXTS = int(os.getenv("SENTIMENT_MIN_TEXTS", "5"))    # menos textos → se ignora
+
+# Marcas de agua para re-scrapear solo lo nuevo (ver services/watermarks.py)
+WATERMARKS_ENABLED = os.getenv("WATERMARKS_ENABLED", "1") == "1"
+WATERMARKS_DB_PATH = Path(os.getenv("WATERMARKS_DB_PATH", str(DATA_DIR / "watermarks.sqlite")))
+
+# Almacén local de datos financieros (ver scripts/ingest_financials.py)
+FINANCIAL_DB_PATH = Path(os.getenv("FINANCIAL_DB_PATH", str(DATA_DIR / "financials.sqlite")))
+
+# Cola de trabajos (orquestaciones largas con scraping)
+JOBS_DB_PATH = Path(os.getenv("JOBS_DB_PATH", str(DATA_DIR / "jobs.sqlite")))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_TIMEOUT = int(os.getenv("JOB_TIMEOUT", "600"))
+
+# Historial de resultados (append-only, consultable por RUC)
+RESULTS_DB_PATH = Path(os.getenv("RESULTS_DB_PATH", str(DATA_DIR / "results.sqlite")))
+
+# Perfilado bajo demanda por request (ver services/profiler.py); vacío = deshabilitado
+PROFILE_SECRET = os.getenv("PROFILE_SECRET", "")
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", str(DATA_DIR / "profiles")))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "200"))          # perfiles guardados antes de rotar
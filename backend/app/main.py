@@ -1,12 +1,48 @@
 # backend/app/main.py
 from __future__ import annotations
-from fastapi import FastAPI, HTTPException
+import json, time
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import ValidationError
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.models import OrchestrateRequest, OrchestrateResponse, EvaluateRequest, ScoreResponse
-from app.pipeline import orchestrate
+from app.models import (
+    OrchestrateRequest, OrchestrateResponse, EvaluateRequest, ScoreResponse,
+    OrchestrateBatchRequest, OrchestrateBatchResponse, EvaluateBatchRequest, EvaluateBatchResponse, EvaluateBatchItem,
+    JobCreated, JobStatusResponse, ResultsResponse, WhatIfRequest, WhatIfResponse,
+)
+from app.analysis.finance_rules import (
+    heuristic_financials, heuristic_financials_batch, rule_based_financials_batch,
+)
+from app.analysis.sentiment import sentiment_stats
+from app.pipeline import (
+    DEFAULT_WEIGHTS, orchestrate_async, orchestrate_batch_async, orchestrate_events, sweep_weights, weight_grid,
+)
+from app.services.browser_pool import close_pool, pool_stats
+from app.services.cache import scrape_cache
+from app.services.circuit import circuit_stats
+from app.services.jobs import job_queue
+from app.services.llm_finance import llm_stats
+from app.services.metrics import HTTP_INFLIGHT, HTTP_SECONDS, render, server_timing, stage, start_request
+from app.services.profiler import RequestProfile, profiling_allowed
+from app.services.rate_limit import rate_limiter
+from app.services.results_store import results_store
+from app.services.serialize import Shape, fast_response, serializer_info
+from app.services.singleflight import scrape_flight
+from app.services.watermarks import watermarks
+
 
-app = FastAPI(title="Backend — Scraping + Finanzas")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    job_queue.start()
+    yield
+    job_queue.stop()
+    await close_pool()
+    results_store.flush()
+
+app = FastAPI(title="Backend — Scraping + Finanzas", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -14,8 +50,54 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Profile-Id"],
 )
 
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    """Duración por ruta para /metrics y header Server-Timing con las etapas del request."""
+    timings = start_request()
+    HTTP_INFLIGHT.inc()
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        # en respuestas en streaming esto mide hasta el primer byte
+        elapsed = time.perf_counter() - t0
+        HTTP_INFLIGHT.dec()
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        HTTP_SECONDS.observe(elapsed, method=request.method, route=route, status=str(status))
+    response.headers["Server-Timing"] = server_timing(timings, elapsed)
+    response.headers["Timing-Allow-Origin"] = "*"
+    return response
+
+@app.middleware("http")
+async def profile_middleware(request: Request, call_next):
+    """Con `X-Profile`/`?profile=` igual a PROFILE_SECRET, perfila el request (ver services/profiler.py)."""
+    if not profiling_allowed(request.headers.get("x-profile") or request.query_params.get("profile")):
+        return await call_next(request)
+    prof = RequestProfile(request.method, request.url.path)
+    try:
+        response = await call_next(request)
+    except BaseException:
+        await prof.finish_async(500)
+        raise
+    body = response.body_iterator
+
+    async def _profiled_body():
+        # el perfil termina con el último byte: cubre también las respuestas en streaming
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            await prof.finish_async(response.status_code)
+
+    response.body_iterator = _profiled_body()
+    response.headers["X-Profile-Id"] = prof.id
+    return response
+
 # --- root & health ---
 @app.get("/")
 def root():
@@ -25,6 +107,11 @@ def root():
 def healthz_root():
     return {"ok": True}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Métricas en formato de texto de Prometheus."""
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # --- namespaced /api ---
 from fastapi import APIRouter
 api = APIRouter(prefix="/api")
@@ -33,54 +120,180 @@ api = APIRouter(prefix="/api")
 def healthz_api():
     return {"ok": True}
 
+@api.get("/stats")
+def api_stats():
+    """Uso de los recursos compartidos del proceso (para dimensionarlos)."""
+    return {
+        "browser_pool": pool_stats(),
+        "scrape_cache": scrape_cache.stats(),
+        "llm": llm_stats(),
+        "singleflight": scrape_flight.stats(),
+        "circuits": circuit_stats(),
+        "rate_limit": rate_limiter.stats(),
+        "sentiment": sentiment_stats(),
+        "watermarks": watermarks.stats(),
+        "jobs": job_queue.stats(),
+        "results": results_store.stats(),
+        "serializer": serializer_info(),
+    }
+
+# campos de cada respuesta de scoring; `?fields=compact` omite los que repiten la entrada
+_ORCH = Shape(OrchestrateResponse, compact_drop=("used_files",))
+_SCORE = Shape(ScoreResponse, compact_drop=("details",))
+_SCORE_ITEM = Shape(EvaluateBatchItem, compact_drop=("details",))
+
+def _orchestrate_kwargs(body: OrchestrateRequest) -> dict:
+    return dict(
+        ruc=body.ruc,
+        tiktok=body.tiktok or "",
+        gmaps=body.gmaps or body.gmaps,  # alias seguro
+        run_scrapers=body.run_scrapers,
+        mock=body.mock,
+        weights=body.weights or DEFAULT_WEIGHTS,
+        refresh=body.refresh,
+        video_limit=body.video_limit,
+        comments_per_video=body.comments_per_video,
+        comment_pages=body.comment_pages,
+        deadline_ms=body.deadline_ms,
+    )
+
 @api.post("/orchestrate", response_model=OrchestrateResponse)
-def api_orchestrate(body: OrchestrateRequest):
+async def api_orchestrate(body: OrchestrateRequest, request: Request, fields: Optional[str] = None):
     try:
-        res = orchestrate(
-            ruc=body.ruc,
-            tiktok=body.tiktok or "",
-            gmaps=body.gmaps or body.gmaps,  # alias seguro
-            run_scrapers=body.run_scrapers,
-            mock=body.mock,
-            weights=body.weights or {"fin":0.6,"maps":0.25,"tt":0.15},
-        )
-        return res
+        res = await orchestrate_async(**_orchestrate_kwargs(body))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"orchestrate failed: {e}")
+    return fast_response(request, _ORCH.project(res, _ORCH.select(fields)))
+
+@api.post("/orchestrate/stream")
+async def api_orchestrate_stream(body: OrchestrateRequest, request: Request):
+    """
+    Igual que /orchestrate pero emite cada componente apenas está listo (NDJSON;
+    con `Accept: text/event-stream` se envía como Server-Sent Events).
+    """
+    sse = "text/event-stream" in request.headers.get("accept", "")
+    events = orchestrate_events(**_orchestrate_kwargs(body))
+
+    async def _encode():
+        async for ev in events:
+            data = json.dumps(ev, ensure_ascii=False)
+            yield f"event: {ev['event']}\ndata: {data}\n\n" if sse else data + "\n"
+
+    return StreamingResponse(
+        _encode(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@api.post("/orchestrate/batch", response_model=OrchestrateBatchResponse)
+async def api_orchestrate_batch(body: OrchestrateBatchRequest, request: Request, fields: Optional[str] = None):
+    """Muchas filas en una llamada; cada fila reporta su propio error."""
+    results: list = [None] * len(body.items)
+    valid_idx, valid_kwargs = [], []
+    for i, item in enumerate(body.items):
+        try:
+            valid_kwargs.append(_orchestrate_kwargs(OrchestrateRequest(**item)))
+            valid_idx.append(i)
+        except ValidationError as e:
+            msg = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            results[i] = {"index": i, "ok": False, "result": None, "error": f"invalid request: {msg}"}
+
+    outs = await orchestrate_batch_async(valid_kwargs)
+    names = _ORCH.select(fields)
+    for i, res in zip(valid_idx, outs):
+        if isinstance(res, BaseException):
+            results[i] = {"index": i, "ok": False, "result": None, "error": f"orchestrate failed: {res}"}
+        else:
+            results[i] = {"index": i, "ok": True, "result": _ORCH.project(res, names), "error": None}
+    return fast_response(request, {"results": results})
 
 # (opcional) endpoint para score directo con data financiera/LLM
 @api.post("/evaluate", response_model=ScoreResponse)
-def api_evaluate(body: EvaluateRequest):
-    d = body.financialData.dict()
-    # Heurística muy simple (placeholder) — reemplaza con tu LLM si quieres
-    ventas = d.get("ingresos_ventas") or 0
-    utilidad = d.get("utilidad_neta") or 0
-    deuda = d.get("deuda_total") or 0
-    liquidez = d.get("liquidez_corriente") or 1
-
-    # Menos riesgo si utilidad y liquidez son altos; más riesgo si deuda alta
-    raw = 0.5
-    try:
-        if ventas > 0:
-            margen = (utilidad / max(1.0, ventas))
-            raw -= 0.3 * max(0.0, min(0.5, margen))       # mejor margen → reduce riesgo
-        raw += 0.2 * min(1.0, deuda / max(1.0, ventas))    # deuda/ventas alto → sube riesgo
-        raw -= 0.2 * max(0.0, min(1.0, (liquidez - 1.0)))  # liquidez >1 reduce riesgo
-    except Exception:
-        pass
-
-    raw = max(0.0, min(1.0, raw))
-    score_0_100 = round(100 * raw)
-    level = "low" if score_0_100 < 30 else "medium" if score_0_100 < 70 else "high"
-    credit = max(0.0, 100000 - score_0_100 * 1000)
+def api_evaluate(body: EvaluateRequest, request: Request, fields: Optional[str] = None):
+    res = heuristic_financials(body.financialData.dict())
+    return fast_response(request, _SCORE.project(res, _SCORE.select(fields)))
+
+@api.post("/evaluate/batch", response_model=EvaluateBatchResponse)
+def api_evaluate_batch(body: EvaluateBatchRequest, request: Request, fields: Optional[str] = None):
+    """Cartera completa en una pasada vectorizada (ver finance_rules.*_batch)."""
+    rows = [fd.dict() for fd in body.items]
+    if body.engine == "heuristic":
+        res = heuristic_financials_batch(rows)
+    else:
+        res = rule_based_financials_batch(rows)
+    return fast_response(request, {"results": _SCORE_ITEM.project_many(res, _SCORE_ITEM.select(fields))})
 
+# --- historial de resultados ---
+@api.get("/results/{ruc}", response_model=ResultsResponse)
+def api_results(ruc: str, limit: int = 20, before_id: Optional[int] = None):
+    """Último resultado y el historial del RUC (más reciente primero)."""
+    limit = max(1, min(limit, 500))
+    history = results_store.history(ruc, limit=limit, before_id=before_id)
+    if not history and before_id is None:
+        raise HTTPException(status_code=404, detail="no results for ruc")
+    latest = history[0] if before_id is None and history else results_store.latest(ruc)
     return {
-        "score": score_0_100,
-        "level": level,
-        "creditLimit": credit,
-        "details": d,
+        "ruc": ruc,
+        "latest": latest,
+        "history": history,
+        "next_before_id": history[-1]["id"] if len(history) == limit else None,
     }
 
+# --- what-if: pesos sobre componentes ya guardados (sin scrapers ni LLM) ---
+@api.post("/whatif", response_model=WhatIfResponse)
+def api_whatif(body: WhatIfRequest):
+    """`final_score`/`risk_label` de cada RUC con cada vector de pesos, desde el último resultado guardado."""
+    rucs = list(dict.fromkeys(([body.ruc] if body.ruc else []) + body.rucs))
+    if not rucs:
+        raise HTTPException(status_code=422, detail="ruc o rucs requerido")
+    try:
+        weights = list(body.weights) + (weight_grid(body.grid, rows=len(rucs)) if body.grid else [])
+        if not weights:
+            raise ValueError("weights o grid requerido")
+        with stage("whatif.load"):
+            latest = results_store.latest_many(rucs)
+        found = [r for r in rucs if r in latest]
+        if not found:
+            raise HTTPException(status_code=404, detail="no results for rucs")
+        with stage("whatif.sweep"):
+            final, labels = sweep_weights([latest[r]["component_scores"] for r in found], weights)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {
+        "weights": weights,
+        "results": [
+            {
+                "ruc": r,
+                "result_id": latest[r]["id"],
+                "component_scores": latest[r]["component_scores"],
+                "final_scores": final[i].tolist(),
+                "risk_labels": labels[i].tolist(),
+            }
+            for i, r in enumerate(found)
+        ],
+        "missing": [r for r in rucs if r not in latest],
+    }
+
+# --- jobs: orquestaciones largas en segundo plano ---
+@api.post("/jobs", response_model=JobCreated, status_code=202)
+def api_jobs_create(body: OrchestrateRequest):
+    job_id = job_queue.submit(_orchestrate_kwargs(body))
+    return {"id": job_id, "status": "queued"}
+
+@api.get("/jobs/{job_id}", response_model=JobStatusResponse)
+def api_jobs_get(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job
+
+@api.delete("/jobs/{job_id}", response_model=JobCreated)
+def api_jobs_cancel(job_id: str):
+    status = job_queue.cancel(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return {"id": job_id, "status": status}
+
 app.include_router(api)
 
 if __name__ == "__main__":
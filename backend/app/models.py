@@ -1,6 +1,6 @@
 # backend/app/models.py
 from __future__ import annotations
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Literal
 from pydantic import BaseModel, Field
 
 # ---- Requests ----
@@ -15,6 +15,8 @@ class OrchestrateRequest(BaseModel):
     comments_per_video: int = 5
     comment_pages: int = 3
     use_solver: bool = False
+    refresh: bool = False  # ignora la caché de scraping y vuelve a scrapear
+    deadline_ms: Optional[int] = Field(None, ge=0)  # presupuesto total; None → ORCHESTRATE_DEADLINE_MS, 0 → sin límite
     weights: Optional[Dict[str, float]] = None  # {"fin":0.6,"maps":0.25,"tt":0.15}
 
 class FinancialData(BaseModel):
@@ -38,6 +40,10 @@ class FinancialData(BaseModel):
 class EvaluateRequest(BaseModel):
     financialData: FinancialData
 
+class EvaluateBatchRequest(BaseModel):
+    items: List[FinancialData]
+    engine: Literal["rules", "heuristic"] = "rules"  # rule_based_financials | heurística de /evaluate
+
 # ---- Responses ----
 class ScoreResponse(BaseModel):
     score: int
@@ -45,10 +51,84 @@ class ScoreResponse(BaseModel):
     creditLimit: float
     details: Dict[str, Any]
 
+class EvaluateBatchItem(ScoreResponse):
+    comments: Optional[List[str]] = None
+
+class EvaluateBatchResponse(BaseModel):
+    results: List[EvaluateBatchItem]
+
 class OrchestrateResponse(BaseModel):
     ruc: str
     used_files: Dict[str, Optional[str]]
     component_scores: Dict[str, Optional[float]]
     final_score: float
     risk_label: str
+    timed_out: List[str] = []  # fuentes que no llegaron dentro de deadline_ms (o llegaron parciales)
+    skipped: List[str] = []    # fuentes saltadas por circuit breaker abierto
     _generated_at: str
+
+class JobCreated(BaseModel):
+    id: str
+    status: str
+
+class JobStatusResponse(BaseModel):
+    id: str
+    status: str  # queued | running | done | failed | cancelled
+    request: Dict[str, Any]
+    partial: Optional[Dict[str, Any]] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    timings: Optional[Dict[str, Any]] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+class ResultRecord(BaseModel):
+    id: int
+    ruc: str
+    created_at: float
+    final_score: Optional[float] = None
+    risk_label: Optional[str] = None
+    component_scores: Dict[str, Optional[float]]
+    weights: Optional[Dict[str, float]] = None
+    used_files: Optional[Dict[str, Optional[str]]] = None
+    generated_at: Optional[str] = None
+
+class ResultsResponse(BaseModel):
+    ruc: str
+    latest: Optional[ResultRecord] = None
+    history: List[ResultRecord]
+    next_before_id: Optional[int] = None  # para pedir la página siguiente
+
+# ---- Batch ----
+class OrchestrateBatchRequest(BaseModel):
+    # filas crudas: cada una se valida como OrchestrateRequest y falla por separado
+    items: List[Dict[str, Any]]
+
+class OrchestrateBatchItem(BaseModel):
+    index: int
+    ok: bool
+    result: Optional[OrchestrateResponse] = None
+    error: Optional[str] = None
+
+class OrchestrateBatchResponse(BaseModel):
+    results: List[OrchestrateBatchItem]
+
+# ---- What-if de pesos ----
+class WhatIfRequest(BaseModel):
+    ruc: Optional[str] = None
+    rucs: List[str] = []
+    weights: List[Dict[str, float]] = []             # vectores {"fin","maps","tt"}
+    grid: Optional[Dict[str, List[float]]] = None     # o producto cartesiano {"fin": [...], ...}
+
+class WhatIfItem(BaseModel):
+    ruc: str
+    result_id: int
+    component_scores: Dict[str, Optional[float]]
+    final_scores: List[float]   # uno por vector de `weights`, en el mismo orden
+    risk_labels: List[str]
+
+class WhatIfResponse(BaseModel):
+    weights: List[Dict[str, float]]
+    results: List[WhatIfItem]
+    missing: List[str] = []     # RUCs sin resultados guardados
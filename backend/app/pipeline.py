@@ -1,11 +1,36 @@
 # app/pipeline.py
 from __future__ import annotations
-import json, math
+import asyncio, json, math, time
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Dict, Any, List, Optional, Tuple
+
+from app.analysis.analyze_maps import summarize_maps
+from app.analysis.analyze_tiktok import summarize_tiktok
+from app.analysis.finance_rules import rule_based_financials, rule_based_financials_batch
+from app.scrapers.gmaps import scrape_gmaps_async
+from app.scrapers.tiktok import scrape_tiktok_async
+from app.services.browser_pool import run_in_pool
+from app.config import ORCHESTRATE_DEADLINE_MS, SENTIMENT_MIN_TEXTS, SENTIMENT_WEIGHT
+from app.services.cache import normalize_key, scrape_cache
+from app.services.circuit import breaker
+from app.services.deadline import remaining, within
+from app.services.financial_store import get_financials, get_many, normalize_ruc
+from app.services.metrics import fallback, stage
+from app.services.results_store import results_store
+from app.services.singleflight import scrape_flight
+
+if TYPE_CHECKING:  # numpy solo se carga en la fusión por lotes
+    import numpy as np
 
 BASE = Path(__file__).resolve().parent
+DEFAULT_WEIGHTS = {"fin": 0.6, "maps": 0.25, "tt": 0.15}
+
+# del presupuesto de cada orquestación se reserva esto para fusionar y responder
+FUSION_RESERVE_S = 0.3
+
+# progress(source, payload) se llama a medida que cada fuente queda resuelta
+Progress = Callable[[str, Optional[Dict[str, Any]]], None]
 
 def now_iso() -> str:
     return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
@@ -26,6 +51,25 @@ def _load_json(p: Path) -> Dict[str, Any]:
     with open(p, "r", encoding="utf-8") as f:
         return json.load(f)
 
+def _sentiment_risk(sent: Optional[Dict[str, Any]]) -> Optional[float]:
+    """Riesgo 0..1 del sentimiento agregado ((1 - media) / 2); None con menos de SENTIMENT_MIN_TEXTS textos."""
+    try:
+        if not sent or int(sent.get("n") or 0) < SENTIMENT_MIN_TEXTS:
+            return None
+        mean = _safe_float(sent.get("mean"))
+    except Exception:
+        return None
+    if mean is None:
+        return None
+    return max(0.0, min(1.0, (1.0 - mean) / 2.0))
+
+def _with_sentiment(score: float, sent: Optional[Dict[str, Any]]) -> float:
+    """Mezcla el score del componente con el riesgo del sentimiento (peso SENTIMENT_WEIGHT)."""
+    s_risk = _sentiment_risk(sent)
+    if s_risk is None:
+        return score
+    return (1.0 - SENTIMENT_WEIGHT) * score + SENTIMENT_WEIGHT * s_risk
+
 def _score_from_maps_features(payload: Dict[str, Any]) -> Optional[float]:
     """Convierte features de Maps a score [0..1] (alto = más riesgo)."""
     try:
@@ -35,7 +79,7 @@ def _score_from_maps_features(payload: Dict[str, Any]) -> Optional[float]:
             return None
         rating_norm = max(0.0, min(1.0, 1.0 - (rating - 3.0)/2.0))  # 5★ ≈ 0 riesgo; 3★ ≈ 1 riesgo
         vol_bonus = 1.0 / (1.0 + math.log10(max(1, n)))             # más reviews → menos riesgo
-        return max(0.0, min(1.0, 0.7 * rating_norm * vol_bonus))
+        return _with_sentiment(max(0.0, min(1.0, 0.7 * rating_norm * vol_bonus)), payload.get("sentiment"))
     except Exception:
         return None
 
@@ -46,22 +90,38 @@ def _score_from_tiktok_features(payload: Dict[str, Any]) -> Optional[float]:
         rs = _safe_float(ov.get("risk_score"))
         if rs is None:
             return None
-        return max(0.0, min(1.0, rs / 100.0))
+        return _with_sentiment(max(0.0, min(1.0, rs / 100.0)), ov.get("sentiment"))
     except Exception:
         return None
 
 def _score_from_financial_placeholder(ruc: str) -> Optional[float]:
     return 0.6 if ruc else None
 
+def _score_from_financial(ruc: str) -> Optional[float]:
+    """Score [0..1] con rule_based_financials sobre el almacén local; placeholder si no hay datos."""
+    d = get_financials(ruc) if ruc else None
+    if d is None:
+        return _score_from_financial_placeholder(ruc)
+    return rule_based_financials(d)["score"] / 100.0
+
+def _score_from_financial_batch(rucs: List[str]) -> List[Optional[float]]:
+    found = get_many(r for r in rucs if r)
+    rows = [found.get(normalize_ruc(r)) if r else None for r in rucs]
+    idx = [i for i, d in enumerate(rows) if d is not None]
+    out = [_score_from_financial_placeholder(r) for r in rucs]
+    for i, res in zip(idx, rule_based_financials_batch([rows[i] for i in idx])):
+        out[i] = res["score"] / 100.0
+    return out
+
 def fuse_scores(
     ruc: str,
     maps_payload: Optional[Dict[str, Any]],
     tiktok_payload: Optional[Dict[str, Any]],
     weights: Optional[Dict[str, float]] = None,
 ) -> Dict[str, Any]:
-    w = weights or {"fin": 0.6, "maps": 0.25, "tt": 0.15}
+    w = weights or DEFAULT_WEIGHTS
 
-    fin = _score_from_financial_placeholder(ruc)
+    fin = _score_from_financial(ruc)
     mps = _score_from_maps_features(maps_payload or {}) if maps_payload else None
     tts = _score_from_tiktok_features(tiktok_payload or {}) if tiktok_payload else None
 
@@ -83,40 +143,554 @@ def fuse_scores(
         "risk_label": _risk_label_from_0_1(final),
     }
 
-def orchestrate(
+# ---- Fusión vectorizada (lotes) ----
+# Replica operación por operación a fuse_scores/_score_from_*: mismo orden de
+# operaciones en float64 y min/max con la semántica de Python (también ante NaN),
+# para que cada fila dé exactamente lo mismo que la versión escalar.
+
+def _py_min(a, b):
+    """min(a, b) de Python elemento a elemento: devuelve `a` salvo que b < a."""
+    import numpy as np
+    return np.where(b < a, b, a)
+
+def _py_max(a, b):
+    """max(a, b) de Python elemento a elemento: devuelve `a` salvo que b > a."""
+    import numpy as np
+    return np.where(b > a, b, a)
+
+def _sentiment_inputs(sent: Optional[Dict[str, Any]]) -> Tuple[bool, float]:
+    s_risk = _sentiment_risk(sent)
+    return (False, 0.0) if s_risk is None else (True, s_risk)
+
+def _maps_inputs(payload: Optional[Dict[str, Any]]) -> Tuple[bool, float, float, bool, float]:
+    """(ok, rating, n, s_ok, s_risk) de una fila, con los mismos descartes que `_score_from_maps_features`."""
+    if not payload:
+        return False, 0.0, 1.0, False, 0.0
+    try:
+        rating = _safe_float(payload.get("rating_meta") or payload.get("rating"))
+        n = int(payload.get("user_ratings_total_meta") or payload.get("user_ratings_total") or 0)
+    except Exception:
+        return False, 0.0, 1.0, False, 0.0
+    if rating is None:
+        return False, 0.0, 1.0, False, 0.0
+    return (True, rating, float(max(1, n))) + _sentiment_inputs(payload.get("sentiment"))
+
+def _tiktok_inputs(payload: Optional[Dict[str, Any]]) -> Tuple[bool, float, bool, float]:
+    """(ok, risk_score, s_ok, s_risk) de una fila, con los mismos descartes que `_score_from_tiktok_features`."""
+    if not payload:
+        return False, 0.0, False, 0.0
+    try:
+        ov = payload.get("overview") or {}
+        rs = _safe_float(ov.get("risk_score"))
+    except Exception:
+        return False, 0.0, False, 0.0
+    if rs is None:
+        return False, 0.0, False, 0.0
+    return (True, rs) + _sentiment_inputs(ov.get("sentiment"))
+
+def _blend_sentiment(score: np.ndarray, s_ok: np.ndarray, s_risk: np.ndarray) -> np.ndarray:
+    """`_with_sentiment` por lotes."""
+    import numpy as np
+    return np.where(s_ok, (1.0 - SENTIMENT_WEIGHT) * score + SENTIMENT_WEIGHT * s_risk, score)
+
+def _log10_exact(x: np.ndarray) -> np.ndarray:
+    """log10 idéntico a math.log10 (np.log10 difiere en el último ulp); se evalúa por valor único."""
+    import numpy as np
+
+    if x.size == 0:
+        return x
+    uniq, inv = np.unique(x, return_inverse=True)
+    logs = np.fromiter((math.log10(v) for v in uniq), dtype=np.float64, count=uniq.size)
+    return logs[inv.reshape(-1)]
+
+def fuse_scores_batch(
+    rucs: List[str],
+    maps_payloads: List[Optional[Dict[str, Any]]],
+    tiktok_payloads: List[Optional[Dict[str, Any]]],
+    weights: List[Optional[Dict[str, float]]],
+) -> List[Dict[str, Any]]:
+    """Versión por lotes de `fuse_scores` (mismos resultados fila a fila)."""
+    n = len(rucs)
+    if n == 0:
+        return []
+    import numpy as np
+
+    with stage("financial.batch"):
+        fin_list = _score_from_financial_batch(rucs)
+    fin_ok = np.fromiter((f is not None for f in fin_list), dtype=bool, count=n)
+    fin = np.fromiter((0.0 if f is None else f for f in fin_list), dtype=np.float64, count=n)
+
+    mi = [_maps_inputs(p) for p in maps_payloads]
+    mps_ok = np.fromiter((t[0] for t in mi), dtype=bool, count=n)
+    rating = np.fromiter((t[1] for t in mi), dtype=np.float64, count=n)
+    n_reviews = np.fromiter((t[2] for t in mi), dtype=np.float64, count=n)
+    rating_norm = _py_max(0.0, _py_min(1.0, 1.0 - (rating - 3.0) / 2.0))
+    vol_bonus = 1.0 / (1.0 + _log10_exact(n_reviews))
+    mps = _py_max(0.0, _py_min(1.0, 0.7 * rating_norm * vol_bonus))
+    mps = _blend_sentiment(
+        mps,
+        np.fromiter((t[3] for t in mi), dtype=bool, count=n),
+        np.fromiter((t[4] for t in mi), dtype=np.float64, count=n),
+    )
+
+    ti = [_tiktok_inputs(p) for p in tiktok_payloads]
+    tts_ok = np.fromiter((t[0] for t in ti), dtype=bool, count=n)
+    rs = np.fromiter((t[1] for t in ti), dtype=np.float64, count=n)
+    tts = _py_max(0.0, _py_min(1.0, rs / 100.0))
+    tts = _blend_sentiment(
+        tts,
+        np.fromiter((t[2] for t in ti), dtype=bool, count=n),
+        np.fromiter((t[3] for t in ti), dtype=np.float64, count=n),
+    )
+
+    W = np.array(
+        [[w["fin"], w["maps"], w["tt"]] for w in (wi or DEFAULT_WEIGHTS for wi in weights)],
+        dtype=np.float64,
+    ).reshape(n, 3)
+    w_fin, w_maps, w_tt = W[:, 0].copy(), W[:, 1].copy(), W[:, 2].copy()
+    tot = _py_max(1e-9, w_maps + w_tt)
+    no_fin = ~fin_ok
+    w_fin[no_fin] = 0.0
+    w_maps[no_fin] = w_maps[no_fin] / tot[no_fin]
+    w_tt[no_fin] = w_tt[no_fin] / tot[no_fin]
+
+    final = np.zeros(n)
+    totw = np.zeros(n)
+    for ok, w_c, s_c in ((fin_ok, w_fin, fin), (mps_ok, w_maps, mps), (tts_ok, w_tt, tts)):
+        final = np.where(ok, final + w_c * s_c, final)
+        totw = np.where(ok, totw + w_c, totw)
+    final = np.where(totw > 0, final / np.where(totw > 0, totw, 1.0), 0.0)
+
+    labels = np.select([final < 0.33, final < 0.66], ["bajo", "medio"], default="alto")
+
+    out: List[Dict[str, Any]] = []
+    for i in range(n):
+        out.append({
+            "component_scores": {
+                "fin": fin_list[i],
+                "maps": float(mps[i]) if mps_ok[i] else None,
+                "tt": float(tts[i]) if tts_ok[i] else None,
+            },
+            "final_score": float(final[i]),
+            "risk_label": str(labels[i]),
+        })
+    return out
+
+# ---- What-if: barrido de pesos sobre componentes ya calculados ----
+WHATIF_MAX_CELLS = 1_000_000  # filas × vectores de pesos por llamada
+COMPONENTS = ("fin", "maps", "tt")
+
+def weight_grid(grid: Dict[str, List[float]], rows: int = 1) -> List[Dict[str, float]]:
+    """
+    {"fin": [...], "maps": [...], "tt": [...]} → producto cartesiano de vectores de pesos.
+    El tamaño (× `rows` filas a evaluar) se valida contra WHATIF_MAX_CELLS antes de armarlo.
+    """
+    from itertools import product
+    missing = [k for k in COMPONENTS if not grid.get(k)]
+    if missing:
+        raise ValueError(f"grid sin valores para: {missing}")
+    n = 1
+    for k in COMPONENTS:
+        n *= len(grid[k])
+    if n * max(1, rows) > WHATIF_MAX_CELLS:
+        raise ValueError(f"demasiadas combinaciones: {n} vectores × {max(1, rows)} filas (máx. {WHATIF_MAX_CELLS})")
+    return [dict(zip(COMPONENTS, combo)) for combo in product(*(grid[k] for k in COMPONENTS))]
+
+def sweep_weights(
+    components: List[Dict[str, Optional[float]]], weights: List[Dict[str, float]]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    `fuse_scores` para cada fila × vector de pesos, como dos productos de matrices:
+    numerador = S @ Wᵀ (componentes ausentes en 0) y total de pesos = M @ Wᵀ (M =
+    1 si el componente está). La renormalización de `fuse_scores` sin `fin` divide
+    numerador y total por el mismo `tot`, así que el cociente es el mismo; puede
+    diferir del escalar en el último decimal por el orden de las sumas.
+    Devuelve (finales R×K, etiquetas R×K).
+    """
+    import numpy as np
+
+    missing = [i for i, w in enumerate(weights) if any(k not in w for k in COMPONENTS)]
+    if missing:
+        raise ValueError(f"weights sin claves fin/maps/tt en las posiciones {missing}")
+    if len(components) * len(weights) > WHATIF_MAX_CELLS:
+        raise ValueError(f"demasiadas combinaciones (máx. {WHATIF_MAX_CELLS} filas × pesos)")
+    S = np.array(
+        [[np.nan if c.get(k) is None else c[k] for k in COMPONENTS] for c in components], dtype=np.float64
+    ).reshape(len(components), 3)
+    W = np.array([[w[k] for k in COMPONENTS] for w in weights], dtype=np.float64).reshape(len(weights), 3)
+    present = ~np.isnan(S)
+    num = np.where(present, S, 0.0) @ W.T
+    totw = present.astype(np.float64) @ W.T
+    final = np.where(totw > 0, num / np.where(totw > 0, totw, 1.0), 0.0)
+    labels = np.select([final < 0.33, final < 0.66], ["bajo", "medio"], default="alto")
+    return final, labels
+
+def _maps_payload_from_scrape(raw: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Adapta la salida de `scrape_gmaps` al formato que espera `_score_from_maps_features`."""
+    summ = summarize_maps(raw)
+    if summ["rating"] <= 0:
+        return None  # sin rating (scraping fallido) → componente ausente
+    payload = {
+        "name": raw.get("query"),
+        "rating": summ["rating"],
+        "user_ratings_total": summ["reviews"],
+    }
+    if "sentiment" in summ:
+        payload["sentiment"] = summ["sentiment"]
+    return payload
+
+def _tiktok_payload_from_scrape(raw: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Adapta la salida de `scrape_tiktok` a {"overview": {"risk_score": 0..100}}."""
+    summ = summarize_tiktok(raw)
+    if not summ["followers"] and not summ["videos"]:
+        return None  # scraping vacío → componente ausente
+    per_video = summ["engagement"] / max(1, summ["videos"])
+    # ~10% de interacción por video se considera saludable (riesgo 0)
+    risk = 100.0 * (1.0 - min(1.0, per_video / 0.10))
+    overview = {
+        "n_videos": summ["videos"],
+        "followers": summ["followers"],
+        "engagement": summ["engagement"],
+        "risk_score": round(risk, 2),
+    }
+    if "sentiment" in summ:
+        overview["sentiment"] = summ["sentiment"]
+    return {"user": raw.get("username"), "overview": overview}
+
+def _mock_payloads(used: Dict[str, Optional[str]]) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    maps_payload = None
+    tt_payload = None
+    p_maps = BASE / "sample_gmaps.json"
+    p_tt   = BASE / "sample_tiktok.json"
+    if p_maps.exists():
+        maps_payload = _load_json(p_maps)
+        used["gmaps"] = str(p_maps)
+    if p_tt.exists():
+        tt_payload = _load_json(p_tt)
+        used["tiktok"] = str(p_tt)
+    return maps_payload, tt_payload
+
+_SCRAPERS = {"gmaps": scrape_gmaps_async, "tiktok": scrape_tiktok_async}
+
+def _new_flags() -> Dict[str, List[str]]:
+    return {"timed_out": [], "skipped": []}
+
+def _budget_s(deadline_ms: Optional[int]) -> Optional[float]:
+    """Presupuesto en segundos (None → ORCHESTRATE_DEADLINE_MS; 0 → sin límite)."""
+    ms = ORCHESTRATE_DEADLINE_MS if deadline_ms is None else deadline_ms
+    return ms / 1000 if ms and ms > 0 else None
+
+async def _scrape_and_store(source: str, query: str, key: str, opts: Dict[str, Any]) -> Dict[str, Any]:
+    circuit = breaker(source)
+    if not circuit.allow():
+        fallback("circuit_open")
+        return {"error": "circuit_open"}
+    raw = await _SCRAPERS[source](query, **opts)
+    if not raw or raw.get("error"):
+        # quedarse sin presupuesto no es culpa de la fuente
+        if (raw or {}).get("error") != "deadline_exceeded":
+            circuit.record_failure()
+    else:
+        circuit.record_success()
+        if not raw.get("_partial"):  # cortado por el presupuesto: no se cachea
+            scrape_cache.set(source, key, raw)
+    return raw
+
+async def _fetch_source_shared(
+    source: str, query: str, refresh: bool, opts: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    # corre en el loop del pool: ahí vive el estado de single-flight
+    key = normalize_key(query)
+    if opts:
+        # límites distintos (p.ej. video_limit) producen resultados distintos
+        key += "|" + "&".join(f"{k}={v}" for k, v in sorted(opts.items()))
+    if not refresh:
+        hit = scrape_cache.get(source, key)
+        if hit is not None:
+            return hit
+    return await scrape_flight.do(f"{source}:{key}", lambda: _scrape_and_store(source, query, key, opts))
+
+async def _fetch_source(
+    source: str, query: str, refresh: bool = False, **opts: Any
+) -> Optional[Dict[str, Any]]:
+    """
+    Scrapea `source` pasando por la caché (TTL por fuente; `refresh` la ignora).
+    Peticiones concurrentes por la misma fuente+clave comparten un único scrape, que
+    corre con el presupuesto más largo de ellas (cada una corta su espera con el suyo).
+    """
+    if not query:
+        return None
+    return await run_in_pool(_fetch_source_shared(source, query, refresh, opts))
+
+async def _fetch_bounded(
+    source: str, query: str, refresh: bool, flags: Dict[str, List[str]], **opts: Any
+) -> Optional[Dict[str, Any]]:
+    """
+    `_fetch_source` dentro del presupuesto: los scrapers ven el límite (menos la
+    reserva para fusionar) y, si aun así no vuelven a tiempo, se los deja de esperar.
+    Anota la fuente en `flags["timed_out"]` o `flags["skipped"]` (circuito abierto).
+    """
+    budget = remaining()
+    try:
+        with within(None if budget is None else budget - FUSION_RESERVE_S):
+            fetch = _fetch_source(source, query, refresh, **opts)
+            raw = await (fetch if budget is None else asyncio.wait_for(fetch, max(0.0, budget)))
+    except asyncio.TimeoutError:
+        fallback("deadline_exceeded")
+        flags["timed_out"].append(source)
+        return None
+    err = (raw or {}).get("error")
+    if err == "circuit_open":
+        flags["skipped"].append(source)
+        return None
+    if err == "deadline_exceeded" or (raw or {}).get("_partial"):
+        flags["timed_out"].append(source)
+    return raw
+
+async def _scrape_payloads(
+    gmaps: str,
+    tiktok: str,
+    used: Dict[str, Optional[str]],
+    refresh: bool = False,
+    video_limit: int = 10,
+    comments_per_video: int = 5,
+    comment_pages: int = 3,
+    progress: Optional[Progress] = None,
+    flags: Optional[Dict[str, List[str]]] = None,
+) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Lanza Maps y TikTok a la vez; la latencia queda cerca de la fuente más lenta.
+    `flags` ({"timed_out": [], "skipped": []}) recibe las fuentes que no llegaron.
+    """
+    flags = flags if flags is not None else _new_flags()
+
+    async def _maps():
+        with stage("fetch.gmaps"):
+            raw = await _fetch_bounded("gmaps", gmaps, refresh, flags)
+        # el sentimiento (caché SQLite y, en lotes grandes, el pool de procesos) fuera del loop
+        payload = await asyncio.to_thread(_maps_payload_from_scrape, raw) if raw else None
+        if payload:
+            used["gmaps"] = f"scraper:{gmaps}"
+        if progress:
+            progress("gmaps", payload)
+        return payload
+
+    async def _tiktok():
+        with stage("fetch.tiktok"):
+            raw = await _fetch_bounded(
+                "tiktok", tiktok, refresh, flags, video_limit=video_limit,
+                comments_per_video=comments_per_video, comment_pages=comment_pages,
+            )
+        payload = await asyncio.to_thread(_tiktok_payload_from_scrape, raw) if raw else None
+        if payload:
+            used["tiktok"] = f"scraper:@{tiktok}"
+        if progress:
+            progress("tiktok", payload)
+        return payload
+
+    maps_payload, tt_payload = await asyncio.gather(_maps(), _tiktok())
+    return maps_payload, tt_payload
+
+async def orchestrate_async(
     ruc: str,
     tiktok: str = "",
     gmaps: str = "",
     run_scrapers: bool = False,
     mock: bool = True,
     weights: Optional[Dict[str, float]] = None,
+    refresh: bool = False,
+    video_limit: int = 10,
+    comments_per_video: int = 5,
+    comment_pages: int = 3,
+    progress: Optional[Progress] = None,
+    deadline_ms: Optional[int] = None,
 ) -> Dict[str, Any]:
     """
     Si mock=True lee:
       - app/sample_gmaps.json
       - app/sample_tiktok.json
+    Si run_scrapers=True (y mock=False) corre los scrapers de Maps y TikTok en paralelo.
+    `progress(source, payload)` se invoca cuando cada fuente queda resuelta.
+    `deadline_ms` acota la orquestación completa: lo que no llegue a tiempo queda
+    fuera de la fusión (que renormaliza los pesos) y se lista en `timed_out`; las
+    fuentes con el circuito abierto se listan en `skipped`.
     """
-    used = {"gmaps": None, "tiktok": None}
-    maps_payload = None
-    tt_payload = None
+    with stage("orchestrate"), within(_budget_s(deadline_ms)):
+        used: Dict[str, Optional[str]] = {"gmaps": None, "tiktok": None}
+        flags = _new_flags()
+        maps_payload = None
+        tt_payload = None
 
-    if mock:
-        p_maps = BASE / "sample_gmaps.json"
-        p_tt   = BASE / "sample_tiktok.json"
-        if p_maps.exists():
-            maps_payload = _load_json(p_maps)
-            used["gmaps"] = str(p_maps)
-        if p_tt.exists():
-            tt_payload = _load_json(p_tt)
-            used["tiktok"] = str(p_tt)
-    else:
-        # TODO: aquí integrar scrapers reales
-        pass
+        if mock:
+            maps_payload, tt_payload = _mock_payloads(used)
+            if progress:
+                progress("gmaps", maps_payload)
+                progress("tiktok", tt_payload)
+        elif run_scrapers:
+            maps_payload, tt_payload = await _scrape_payloads(
+                gmaps, tiktok, used, refresh, video_limit, comments_per_video, comment_pages,
+                progress, flags,
+            )
 
-    fused = fuse_scores(ruc, maps_payload, tt_payload, weights)
-    return {
-        "ruc": ruc,
-        "used_files": used,
-        **fused,
-        "_generated_at": now_iso(),
-    }
+        with stage("fusion"):
+            fused = fuse_scores(ruc, maps_payload, tt_payload, weights)
+        out = {
+            "ruc": ruc,
+            "used_files": used,
+            **fused,
+            **flags,
+            "_generated_at": now_iso(),
+        }
+        results_store.record(out, weights or DEFAULT_WEIGHTS)
+    return out
+
+async def orchestrate_events(
+    ruc: str,
+    tiktok: str = "",
+    gmaps: str = "",
+    run_scrapers: bool = False,
+    mock: bool = True,
+    weights: Optional[Dict[str, float]] = None,
+    refresh: bool = False,
+    video_limit: int = 10,
+    comments_per_video: int = 5,
+    comment_pages: int = 3,
+    deadline_ms: Optional[int] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Variante incremental de `orchestrate_async` (para streaming):
+      1. {"event": "fin", ...}            → componente financiero, sin esperar scrapers
+      2. {"event": "gmaps" | "tiktok", ...} a medida que cada fuente termina,
+         con la fusión provisional recalculada con lo que ya se tiene
+      3. {"event": "final", "result": ...} → mismo dict que `orchestrate_async`
+    Si algo falla se emite {"event": "error", "detail": ...} y se corta.
+    """
+    t0 = time.perf_counter()
+    payloads: Dict[str, Optional[Dict[str, Any]]] = {"gmaps": None, "tiktok": None}
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def _elapsed() -> float:
+        return round(1000 * (time.perf_counter() - t0), 1)
+
+    def _step(source: str) -> Dict[str, Any]:
+        fused = fuse_scores(ruc, payloads["gmaps"], payloads["tiktok"], weights)
+        return {"event": source, "ruc": ruc, "provisional": True, **fused, "elapsed_ms": _elapsed()}
+
+    try:
+        yield _step("fin")
+    except Exception as e:
+        yield {"event": "error", "detail": f"orchestrate failed: {e}", "elapsed_ms": _elapsed()}
+        return
+
+    task = asyncio.ensure_future(orchestrate_async(
+        ruc=ruc, tiktok=tiktok, gmaps=gmaps, run_scrapers=run_scrapers, mock=mock,
+        weights=weights, refresh=refresh, video_limit=video_limit,
+        comments_per_video=comments_per_video, comment_pages=comment_pages,
+        progress=lambda source, payload: queue.put_nowait((source, payload)),
+        deadline_ms=deadline_ms,
+    ))
+    try:
+        while True:
+            getter = asyncio.ensure_future(queue.get())
+            await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            if not getter.done():
+                getter.cancel()
+                break
+            source, payload = getter.result()
+            payloads[source] = payload
+            yield _step(source)
+        while not queue.empty():  # progreso emitido justo antes de terminar
+            source, payload = queue.get_nowait()
+            payloads[source] = payload
+            yield _step(source)
+        try:
+            result = task.result()
+        except Exception as e:
+            yield {"event": "error", "detail": f"orchestrate failed: {e}", "elapsed_ms": _elapsed()}
+            return
+        yield {"event": "final", "result": result, "elapsed_ms": _elapsed()}
+    finally:
+        # cliente desconectado: no dejamos la orquestación huérfana
+        if not task.done():
+            task.cancel()
+
+async def orchestrate_batch_async(items: List[Dict[str, Any]]) -> List[Any]:
+    """
+    Orquesta muchas filas (mismos kwargs que `orchestrate_async`): resuelve las
+    fuentes de todas en paralelo y las fusiona juntas con `fuse_scores_batch`.
+    Devuelve, por fila, el resultado o la excepción que la hizo fallar. El
+    `deadline_ms` de cada fila acota el scraping de esa fila.
+    """
+    mock_cache: Dict[str, Any] = {}
+
+    async def _payloads(it: Dict[str, Any]):
+        used: Dict[str, Optional[str]] = {"gmaps": None, "tiktok": None}
+        flags = _new_flags()
+        maps_payload = tt_payload = None
+        if it.get("mock", True):
+            if not mock_cache:
+                mock_cache["used"] = {"gmaps": None, "tiktok": None}
+                mock_cache["payloads"] = _mock_payloads(mock_cache["used"])
+            used.update(mock_cache["used"])
+            maps_payload, tt_payload = mock_cache["payloads"]
+        elif it.get("run_scrapers", False):
+            with within(_budget_s(it.get("deadline_ms"))):
+                maps_payload, tt_payload = await _scrape_payloads(
+                    it.get("gmaps") or "", it.get("tiktok") or "", used,
+                    it.get("refresh", False), it.get("video_limit", 10),
+                    it.get("comments_per_video", 5), it.get("comment_pages", 3),
+                    flags=flags,
+                )
+        w = it.get("weights") or DEFAULT_WEIGHTS
+        missing = [k for k in ("fin", "maps", "tt") if k not in w]
+        if missing:
+            raise ValueError(f"weights sin claves: {missing}")
+        return used, maps_payload, tt_payload, w, flags
+
+    gathered = await asyncio.gather(*(_payloads(it) for it in items), return_exceptions=True)
+    ok_idx = [i for i, g in enumerate(gathered) if not isinstance(g, BaseException)]
+    with stage("fusion.batch"):
+        fused = fuse_scores_batch(
+            [items[i]["ruc"] for i in ok_idx],
+            [gathered[i][1] for i in ok_idx],
+            [gathered[i][2] for i in ok_idx],
+            [gathered[i][3] for i in ok_idx],
+        )
+
+    out: List[Any] = list(gathered)
+    generated_at = now_iso()
+    for i, f in zip(ok_idx, fused):
+        out[i] = {
+            "ruc": items[i]["ruc"], "used_files": gathered[i][0], **f, **gathered[i][4],
+            "_generated_at": generated_at,
+        }
+        results_store.record(out[i], gathered[i][3])
+    return out
+
+def orchestrate(
+    ruc: str,
+    tiktok: str = "",
+    gmaps: str = "",
+    run_scrapers: bool = False,
+    mock: bool = True,
+    weights: Optional[Dict[str, float]] = None,
+    refresh: bool = False,
+    video_limit: int = 10,
+    comments_per_video: int = 5,
+    comment_pages: int = 3,
+    deadline_ms: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Variante síncrona de `orchestrate_async` (scripts/CLI, fuera de un event loop)."""
+    return asyncio.run(orchestrate_async(
+        ruc=ruc,
+        tiktok=tiktok,
+        gmaps=gmaps,
+        run_scrapers=run_scrapers,
+        mock=mock,
+        weights=weights,
+        refresh=refresh,
+        video_limit=video_limit,
+        comments_per_video=comments_per_video,
+        comment_pages=comment_pages,
+        deadline_ms=deadline_ms,
+    ))
@@ -1,57 +1,350 @@
-from typing import Dict, Any
+import asyncio
+from typing import Dict, Any, AsyncIterator, Iterable, Iterator, List, Optional
 from loguru import logger
-from app.config import REQUEST_TIMEOUT, PLAYWRIGHT_HEADLESS
+from app.analysis.analyze_maps import merge_maps
+from app.config import (
+    GMAPS_BASE_URL, GMAPS_MAX_REVIEWS, GMAPS_SENTIMENT_REVIEWS, GMAPS_TABS, REQUEST_TIMEOUT, SCRAPE_LEAN,
+    WATERMARKS_ENABLED,
+)
+from app.scrapers.lean import instrument
+from app.services.browser_pool import (
+    PLAYWRIGHT_OK, get_pool, iterate_in_pool, iterate_in_pool_sync, run_in_pool, run_in_pool_sync,
+)
+from app.services.cache import normalize_key
+from app.services.deadline import expired, timeout_ms
+from app.services.metrics import fallback, stage
+from app.services.rate_limit import Blocked, rate_limiter
+from app.services.watermarks import review_ids, watermarks
 
-try:
-    from playwright.sync_api import sync_playwright
-    PLAYWRIGHT_OK = True
-except Exception:
-    PLAYWRIGHT_OK = False
+CONSENT = "button:has-text('Aceptar todo')"
+SEARCHBOX = "input#searchboxinput"
+# ficha de un lugar (título / estrellas) o lista de resultados
+RESULTS_READY = "h1.DUwDvf, span[aria-label*='estrellas'], div[role='feed']"
+MORE_REVIEWS = "button[jsaction*='pane.rating.moreReviews']"
+REVIEW = "div.jftiEf[data-review-id]"
+SORT_REVIEWS = "button[aria-label*='Ordenar'], button[data-value='Ordenar']"
+SORT_NEWEST = "div[role='menuitemradio']:has-text('Más recientes')"
+# página de bloqueo de Google (/sorry/ con reCAPTCHA)
+BLOCKED = "form#captcha-form, div#recaptcha, iframe[src*='recaptcha']"
 
+# extrae en un solo viaje las reseñas [start, start+limit) ya presentes en el panel
+_EXTRACT_REVIEWS_JS = """
+([sel, start, limit]) => Array.from(document.querySelectorAll(sel)).slice(start, start + limit).map(n => ({
+    id: n.getAttribute('data-review-id'),
+    author: n.querySelector('.d4r55')?.textContent?.trim() || null,
+    stars: n.querySelector('span.kvMYJc')?.getAttribute('aria-label') || '',
+    date: n.querySelector('span.rsqaWe')?.textContent?.trim() || null,
+    text: n.querySelector('span.wiI7pd')?.textContent?.trim() || '',
+}))
+"""
 
-def scrape_gmaps(query: str, mock: bool = False) -> Dict[str, Any]:
+# la primera reseña del panel ya no es `id` (el panel se reordenó)
+_FIRST_REVIEW_CHANGED_JS = """
+([sel, id]) => {
+    const n = document.querySelector(sel);
+    return n !== null && n.getAttribute('data-review-id') !== id;
+}
+"""
+
+# scroll al fondo del contenedor desplazable que contiene las reseñas
+_SCROLL_REVIEWS_JS = """
+(sel) => {
+    const nodes = document.querySelectorAll(sel);
+    let el = nodes.length ? nodes[nodes.length - 1].parentElement : null;
+    while (el && el.scrollHeight <= el.clientHeight) el = el.parentElement;
+    (el || document.scrollingElement).scrollTop = 1e9;
+}
+"""
+
+
+def scrape_gmaps(query: str, mock: bool = False, lean: Optional[bool] = None) -> Dict[str, Any]:
+    """Variante síncrona (scripts/CLI); delega en el loop del pool de navegadores."""
+    return run_in_pool_sync(scrape_gmaps_async(query, mock=mock, lean=lean))
+
+
+async def scrape_gmaps_async(query: str, mock: bool = False, lean: Optional[bool] = None) -> Dict[str, Any]:
     if mock or not query:
         logger.info("GMaps en modo MOCK")
         return {"query": query or "sample_business", "rating": 4.3, "reviews": 128}
 
     if not PLAYWRIGHT_OK:
         logger.warning("Playwright no disponible; usando datos vacíos.")
-        return {"query": query, "rating": 0.0, "reviews": 0}
+        fallback("playwright_unavailable")
+        return {"query": query, "rating": 0.0, "reviews": 0, "error": "playwright_unavailable"}
 
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=PLAYWRIGHT_HEADLESS)
-            page = browser.new_page()
-            page.set_default_timeout(REQUEST_TIMEOUT * 1000)
-            page.goto("https://www.google.com/maps")
-            try:
-                page.locator("button:has-text('Aceptar todo')").first.click(timeout=3000)
-            except Exception:
-                pass
+        return await run_in_pool(_scrape_gmaps_page(query, SCRAPE_LEAN if lean is None else lean))
+    except Exception as e:
+        return _failed(query, e)
 
-            page.locator("input#searchboxinput").fill(query)
-            page.locator("button#searchbox-searchbutton").click()
-            page.wait_for_timeout(3000)
 
-            rating = 0.0
-            reviews = 0
-            try:
-                rating_txt = page.locator("span[aria-label*='estrellas']").first.inner_text(timeout=4000)
-                rating = _parse_rating(rating_txt)
-            except Exception:
-                pass
+def _failed(query: str, e: Exception) -> Dict[str, Any]:
+    """Resultado vacío con el motivo (`deadline_exceeded` si se agotó el presupuesto, `blocked`)."""
+    if isinstance(e, Blocked):
+        fallback("gmaps_blocked")
+        logger.warning(f"GMaps '{query}': {e}")
+        return {"query": query, "rating": 0.0, "reviews": 0, "error": "blocked"}
+    if expired():
+        logger.warning(f"GMaps '{query}': sin presupuesto de tiempo")
+        return {"query": query, "rating": 0.0, "reviews": 0, "error": "deadline_exceeded"}
+    fallback("gmaps_error")
+    logger.error(f"Fallo scraping GMaps '{query}': {e}")
+    return {"query": query, "rating": 0.0, "reviews": 0, "error": str(e)}
+
+
+async def _scrape_gmaps_page(query: str, lean: bool) -> Dict[str, Any]:
+    # turno del dominio antes de pedir la página: la espera no retiene un navegador
+    async with rate_limiter.slot(GMAPS_BASE_URL), get_pool().page("gmaps") as page:
+        async with instrument(page, lean) as metrics:
+            out = await _read_gmaps(page, query, lean)
+        out["_metrics"] = metrics.as_dict()
+        logger.info(f"GMaps '{query}': {out['_metrics']}")
+        return out
+
+
+async def _read_gmaps(page, query: str, lean: bool) -> Dict[str, Any]:
+    with stage("gmaps.navigate"):
+        await _open_place(page, query, lean)
+
+    rating = 0.0
+    reviews = 0
+    with stage("gmaps.parse"):
+        try:
+            rating_txt = await page.locator("span[aria-label*='estrellas']").first.inner_text(timeout=timeout_ms(4))
+            rating = _parse_rating(rating_txt)
+        except Exception:
+            fallback("gmaps_parse_failure")
+        try:
+            reviews_txt = await page.locator(MORE_REVIEWS).first.inner_text(timeout=timeout_ms(4))
+            reviews = _parse_reviews(reviews_txt)
+        except Exception:
+            fallback("gmaps_parse_failure")
+
+    out = {"query": query, "rating": rating, "reviews": reviews}
+    if GMAPS_SENTIMENT_REVIEWS > 0 and reviews and not expired():
+        with stage("gmaps.reviews"):
+            out = await _read_new_reviews(page, out, GMAPS_SENTIMENT_REVIEWS)
+    return out
+
+
+async def _read_new_reviews(page, out: Dict[str, Any], limit: int) -> Dict[str, Any]:
+    """
+    Reseñas más recientes para el sentimiento. Con marca de agua, la lectura se corta
+    en la primera reseña ya vista y el resultado se combina con las anteriores. El
+    corte solo vale con el panel ordenado por "Más recientes": en el orden por
+    relevancia una reseña vieja puede ir antes que las nuevas, así que se lee entero.
+    """
+    key = f"{normalize_key(out['query'])}|{limit}"
+    prev = await asyncio.to_thread(watermarks.get, "gmaps", key) if WATERMARKS_ENABLED else None
+    items: List[Dict[str, Any]] = []
+    if await _open_reviews(page):
+        known = review_ids(prev) if await _sort_newest(page) else ()
+        items = [r async for r in _panel_reviews(page, limit, known)]
+    out["review_items"] = items
+    if not WATERMARKS_ENABLED or expired():
+        return out  # cortado por el presupuesto: puede haber un hueco con lo ya visto
+    # puntuar y guardar (SQLite) fuera del loop del pool, que comparten todos los scrapers
+    return await asyncio.to_thread(_merge_and_store, key, prev, out, limit)
+
+
+def _merge_and_store(key: str, prev: Optional[Dict[str, Any]], out: Dict[str, Any], limit: int) -> Dict[str, Any]:
+    merged = merge_maps(prev, out, limit)
+    watermarks.put("gmaps", key, merged)
+    return merged
+
+
+async def _open_reviews(page) -> bool:
+    try:
+        await page.locator(MORE_REVIEWS).first.click(timeout=timeout_ms(5))
+        await page.locator(REVIEW).first.wait_for(timeout=timeout_ms(8))
+        return True
+    except Exception:
+        return False
+
+
+async def _sort_newest(page) -> bool:
+    """
+    Ordena el panel por "Más recientes" si la página ofrece el menú (sin esperar si
+    no). True solo si el orden cambió: la primera reseña del panel es otra.
+    """
+    try:
+        if not await page.locator(SORT_REVIEWS).count():
+            return False
+        first = await page.locator(REVIEW).first.get_attribute("data-review-id", timeout=timeout_ms(2))
+        await page.locator(SORT_REVIEWS).first.click(timeout=timeout_ms(2))
+        await page.locator(SORT_NEWEST).first.click(timeout=timeout_ms(2))
+        await page.wait_for_function(
+            _FIRST_REVIEW_CHANGED_JS,
+            arg=[REVIEW, first],
+            timeout=timeout_ms(4),
+        )
+        return True
+    except Exception:
+        fallback("gmaps_sort_failure")
+        return False
+
+
+async def _panel_reviews(page, max_reviews: int, known: Iterable[str] = ()) -> AsyncIterator[Dict[str, Any]]:
+    """Reseñas del panel ya abierto, cargando más con scroll, hasta `max_reviews` o la primera de `known`."""
+    known = set(known)
+    emitted = 0
+    while emitted < max_reviews and not expired():
+        batch = await page.evaluate(
+            _EXTRACT_REVIEWS_JS, [REVIEW, emitted, min(50, max_reviews - emitted)]
+        )
+        for r in batch:
+            if r["id"] in known:
+                return
+            r["stars"] = _parse_rating(r["stars"])
+            yield r
+        emitted += len(batch)
+        if emitted >= max_reviews:
+            break
+        # pedimos más reseñas y esperamos a que el panel crezca
+        await page.evaluate(_SCROLL_REVIEWS_JS, REVIEW)
+        try:
+            await page.wait_for_function(
+                "([sel, n]) => document.querySelectorAll(sel).length > n",
+                arg=[REVIEW, emitted],
+                timeout=timeout_ms(6),
+            )
+        except Exception:
+            break  # no hay más
+
+
+async def _open_place(page, query: str, lean: bool) -> None:
+    """Abre Maps, acepta cookies si hace falta y busca `query` (cada paso, dentro del presupuesto)."""
+    page.set_default_timeout(REQUEST_TIMEOUT * 1000)
+    if lean:
+        await page.goto(GMAPS_BASE_URL, wait_until="domcontentloaded", timeout=timeout_ms(REQUEST_TIMEOUT))
+        # lo que aparezca primero: el aviso de cookies, el buscador o la página de bloqueo
+        ready = page.locator(CONSENT).or_(page.locator(SEARCHBOX)).or_(page.locator(BLOCKED)).first
+        await ready.wait_for(timeout=timeout_ms(REQUEST_TIMEOUT))
+        await _check_blocked(page)
+        if await page.locator(CONSENT).count():
+            await page.locator(CONSENT).first.click(timeout=timeout_ms(REQUEST_TIMEOUT))
+    else:
+        await page.goto(GMAPS_BASE_URL, timeout=timeout_ms(REQUEST_TIMEOUT))
+        await _check_blocked(page)
+        try:
+            await page.locator(CONSENT).first.click(timeout=timeout_ms(3))
+        except Exception:
+            pass
+
+    await page.locator(SEARCHBOX).fill(query, timeout=timeout_ms(REQUEST_TIMEOUT))
+    await page.locator("button#searchbox-searchbutton").click(timeout=timeout_ms(REQUEST_TIMEOUT))
+    if lean:
+        try:
+            await page.locator(RESULTS_READY).first.wait_for(timeout=timeout_ms(8))
+        except Exception:
+            pass  # sin resultados: los lectores de abajo devuelven 0
+    else:
+        await page.wait_for_timeout(timeout_ms(3))
+
+
+async def _check_blocked(page) -> None:
+    """`Blocked` si Google respondió con su página de bloqueo (en vez de esperar al buscador)."""
+    if "/sorry/" in page.url or await page.locator(BLOCKED).count():
+        raise Blocked(f"página de bloqueo ({page.url})")
+
+
+# ---- lotes: muchas consultas en un navegador, con pestañas acotadas ----
+def scrape_gmaps_many(
+    queries: Iterable[str], tabs: int = GMAPS_TABS, mock: bool = False, lean: Optional[bool] = None
+) -> List[Dict[str, Any]]:
+    """Variante síncrona de `scrape_gmaps_many_async`."""
+    return run_in_pool_sync(scrape_gmaps_many_async(queries, tabs=tabs, mock=mock, lean=lean))
+
+
+async def scrape_gmaps_many_async(
+    queries: Iterable[str], tabs: int = GMAPS_TABS, mock: bool = False, lean: Optional[bool] = None
+) -> List[Dict[str, Any]]:
+    """
+    Scrapea varias consultas en un solo navegador del pool, con hasta `tabs`
+    pestañas a la vez. Devuelve un resultado por consulta, en el mismo orden.
+    """
+    queries = list(queries)
+    if mock or not PLAYWRIGHT_OK or not queries:
+        return [await scrape_gmaps_async(q, mock=mock, lean=lean) for q in queries]
+    lean = SCRAPE_LEAN if lean is None else lean
+    try:
+        return await run_in_pool(_scrape_gmaps_session(queries, max(1, tabs), lean))
+    except Exception as e:
+        return [_failed(q, e) for q in queries]
+
+
+async def _scrape_gmaps_session(queries: List[str], tabs: int, lean: bool) -> List[Dict[str, Any]]:
+    results: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+    todo: asyncio.Queue = asyncio.Queue()
+    for item in enumerate(queries):
+        todo.put_nowait(item)
+
+    async def _tab(page) -> None:
+        while not todo.empty():
+            i, query = todo.get_nowait()
+            if expired():
+                results[i] = {"query": query, "rating": 0.0, "reviews": 0, "error": "deadline_exceeded"}
+                continue
             try:
-                reviews_txt = page.locator("button[jsaction*='pane.rating.moreReviews']").first.inner_text(timeout=4000)
-                reviews = _parse_reviews(reviews_txt)
-            except Exception:
-                pass
-            finally:
-                browser.close()
-
-            return {"query": query, "rating": rating, "reviews": reviews}
+                async with rate_limiter.slot(GMAPS_BASE_URL):
+                    async with instrument(page, lean) as metrics:
+                        out = await _read_gmaps(page, query, lean)
+                out["_metrics"] = metrics.as_dict()
+            except Exception as e:
+                out = _failed(query, e)
+            results[i] = out
+
+    async with get_pool().session("gmaps", min(tabs, len(queries))) as pages:
+        await asyncio.gather(*(_tab(p) for p in pages))
+    return results
+
+
+# ---- reseñas en streaming ----
+def iter_gmaps_reviews(
+    query: str, max_reviews: int = GMAPS_MAX_REVIEWS, lean: Optional[bool] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Genera las reseñas de `query` (autor, estrellas, fecha, texto) a medida que el
+    panel las carga, hasta `max_reviews`. No acumula nada: la memoria queda plana
+    aunque el negocio tenga miles de reseñas.
+    """
+    lean = SCRAPE_LEAN if lean is None else lean
+    return iterate_in_pool(_gmaps_reviews(query, max(0, max_reviews), lean))
+
+
+def iter_gmaps_reviews_sync(
+    query: str, max_reviews: int = GMAPS_MAX_REVIEWS, lean: Optional[bool] = None
+) -> Iterator[Dict[str, Any]]:
+    """Variante síncrona de `iter_gmaps_reviews` (scripts/CLI)."""
+    lean = SCRAPE_LEAN if lean is None else lean
+    return iterate_in_pool_sync(_gmaps_reviews(query, max(0, max_reviews), lean))
+
+
+async def _gmaps_reviews(query: str, max_reviews: int, lean: bool) -> AsyncIterator[Dict[str, Any]]:
+    if not PLAYWRIGHT_OK or not query or not max_reviews:
+        return
+    try:
+        async for review in _gmaps_reviews_page(query, max_reviews, lean):
+            yield review
     except Exception as e:
-        logger.error(f"Fallo scraping GMaps: {e}")
-        return {"query": query, "rating": 0.0, "reviews": 0}
+        fallback("gmaps_blocked" if isinstance(e, Blocked) else "gmaps_error")
+        logger.error(f"Fallo reseñas GMaps '{query}': {e}")
+
+
+async def _gmaps_reviews_page(query: str, max_reviews: int, lean: bool) -> AsyncIterator[Dict[str, Any]]:
+    async with rate_limiter.slot(GMAPS_BASE_URL), get_pool().page("gmaps") as page:
+        async with instrument(page, lean) as metrics:
+            with stage("gmaps.navigate"):
+                await _open_place(page, query, lean)
+            if not await _open_reviews(page):
+                logger.warning(f"GMaps '{query}': sin panel de reseñas")
+                return
+
+            emitted = 0
+            async for r in _panel_reviews(page, max_reviews):
+                emitted += 1
+                yield r
+        logger.info(f"GMaps reseñas '{query}': {emitted} · {metrics.as_dict()}")
 
 
 def _parse_rating(s: str) -> float:
@@ -0,0 +1,112 @@
+"""
+Modo "lean" para los scrapers: bloquea recursos pesados y trackers, y mide
+cada scrape (requests, bytes transferidos, tiempo de página).
+
+Las páginas vienen del pool y se reciclan, así que `instrument` deja la página
+como la encontró (quita la ruta y los listeners al salir).
+"""
+from __future__ import annotations
+import asyncio, time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Set
+from urllib.parse import urlsplit
+
+from app.services.deadline import timeout_s
+
+# imágenes, video y fuentes no aportan nada a rating/reviews/contadores
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font"})
+
+# analítica/publicidad de terceros (y telemetría propia de TikTok)
+BLOCKED_DOMAINS = (
+    "doubleclick.net",
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googlesyndication.com",
+    "googleadservices.com",
+    "adservice.google.com",
+    "facebook.net",
+    "connect.facebook.com",
+    "hotjar.com",
+    "scorecardresearch.com",
+    "analytics.tiktok.com",
+    "ads.tiktok.com",
+    "mon.tiktokv.com",
+    "mon-va.byteoversea.com",
+    "mcs.tiktokv.com",
+)
+
+
+def is_blocked(url: str, resource_type: str) -> bool:
+    if resource_type in BLOCKED_RESOURCE_TYPES:
+        return True
+    host = urlsplit(url).hostname or ""
+    return any(host == d or host.endswith("." + d) for d in BLOCKED_DOMAINS)
+
+
+class PageMetrics:
+    def __init__(self, lean: bool):
+        self.lean = lean
+        self.requests = 0
+        self.blocked = 0
+        self.bytes = 0
+        self._t0 = time.perf_counter()
+        self._elapsed_ms = None
+        self._pending: Set[asyncio.Future] = set()
+
+    def stop(self) -> None:
+        self._elapsed_ms = round(1000 * (time.perf_counter() - self._t0), 1)
+
+    def as_dict(self) -> Dict[str, Any]:
+        elapsed = self._elapsed_ms
+        if elapsed is None:
+            elapsed = round(1000 * (time.perf_counter() - self._t0), 1)
+        return {
+            "lean": self.lean,
+            "requests": self.requests,
+            "blocked": self.blocked,
+            "bytes": self.bytes,
+            "elapsed_ms": elapsed,
+        }
+
+
+@asynccontextmanager
+async def instrument(page, lean: bool) -> AsyncIterator[PageMetrics]:
+    """Mide la página y, si `lean`, aborta los recursos bloqueados."""
+    metrics = PageMetrics(lean)
+
+    async def _route(route) -> None:
+        req = route.request
+        if is_blocked(req.url, req.resource_type):
+            metrics.blocked += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _count_bytes(request) -> None:
+        try:
+            sizes = await request.sizes()
+            metrics.bytes += sizes["responseBodySize"] + sizes["responseHeadersSize"]
+        except Exception:
+            pass
+
+    def _on_finished(request) -> None:
+        metrics.requests += 1
+        fut = asyncio.ensure_future(_count_bytes(request))
+        metrics._pending.add(fut)
+        fut.add_done_callback(metrics._pending.discard)
+
+    if lean:
+        await page.route("**/*", _route)
+    page.on("requestfinished", _on_finished)
+    try:
+        yield metrics
+    finally:
+        metrics.stop()
+        page.remove_listener("requestfinished", _on_finished)
+        if lean:
+            try:
+                await page.unroute("**/*", _route)
+            except Exception:
+                pass
+        if metrics._pending:
+            await asyncio.wait(set(metrics._pending), timeout=timeout_s(2))
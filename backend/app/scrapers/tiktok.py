@@ -1,15 +1,66 @@
-from typing import Dict, Any, List
+import asyncio, json
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Set
 from loguru import logger
-from app.config import REQUEST_TIMEOUT, PLAYWRIGHT_HEADLESS
+from app.analysis.analyze_tiktok import merge_tiktok
+from app.config import REQUEST_TIMEOUT, SCRAPE_LEAN, WATERMARKS_ENABLED
+from app.scrapers.lean import instrument
+from app.scrapers.tiktok_capture import SSR_SCRIPT_ID, TikTokCapture, api_kind, record_response
+from app.services.browser_pool import PLAYWRIGHT_OK, get_pool, run_in_pool, run_in_pool_sync
+from app.services.cache import normalize_key
+from app.services.deadline import expired, timeout_ms, timeout_s
+from app.services.metrics import fallback, stage
+from app.services.rate_limit import Blocked, rate_limiter
+from app.services.watermarks import tiktok_known, watermarks
 
-try:
-    from playwright.sync_api import sync_playwright
-    PLAYWRIGHT_OK = True
-except Exception:
-    PLAYWRIGHT_OK = False
+CONSENT = "button:has-text('Accept all')"
+FOLLOWERS = "strong[data-e2e='followers-count']"
+POST_ITEM = "div[data-e2e='user-post-item']"
+COMMENT_ITEM = "[data-e2e='comment-level-1']"
+# verificación/CAPTCHA que TikTok pone delante del perfil cuando detecta tráfico automatizado
+BLOCKED = "#captcha-verify-image, .captcha_verify_container, .captcha-verify-container, #tiktok-verify-ele"
 
+RESPONSE_TIMEOUT_S = 6.0  # espera máxima por la siguiente página de JSON
+MAX_SCROLLS = 50
 
-def scrape_tiktok(username: str, mock: bool = False) -> Dict[str, Any]:
+
+def scrape_tiktok(
+    username: str,
+    mock: bool = False,
+    video_limit: int = 10,
+    comments_per_video: int = 5,
+    comment_pages: int = 3,
+    lean: Optional[bool] = None,
+    record_dir: Optional[Path] = None,
+    incremental: Optional[bool] = None,
+) -> Dict[str, Any]:
+    """Variante síncrona (scripts/CLI); delega en el loop del pool de navegadores."""
+    return run_in_pool_sync(scrape_tiktok_async(
+        username, mock=mock, video_limit=video_limit, comments_per_video=comments_per_video,
+        comment_pages=comment_pages, lean=lean, record_dir=record_dir, incremental=incremental,
+    ))
+
+
+async def scrape_tiktok_async(
+    username: str,
+    mock: bool = False,
+    video_limit: int = 10,
+    comments_per_video: int = 5,
+    comment_pages: int = 3,
+    lean: Optional[bool] = None,
+    record_dir: Optional[Path] = None,
+    incremental: Optional[bool] = None,
+) -> Dict[str, Any]:
+    """
+    Lee el perfil desde el JSON que descarga la página (perfil, lista de videos y
+    comentarios), paginando hasta `video_limit` videos y, por video, hasta
+    `comments_per_video` comentarios en como mucho `comment_pages` páginas.
+    `record_dir` guarda cada respuesta como fixture (ver `tiktok_capture.replay_fixtures`).
+
+    Con `incremental` (por defecto WATERMARKS_ENABLED) la paginación se corta en el
+    contenido visto en el scrape anterior y el resultado se combina con él: trae
+    `totals` acumulados que `summarize_tiktok` usa directamente.
+    """
     if mock or not username:
         logger.info("TikTok en modo MOCK")
         return {
@@ -23,54 +74,226 @@ def scrape_tiktok(username: str, mock: bool = False) -> Dict[str, Any]:
 
     if not PLAYWRIGHT_OK:
         logger.warning("Playwright no disponible; usando datos vacíos.")
-        return {"username": username, "followers": 0, "videos": []}
+        fallback("playwright_unavailable")
+        return {"username": username, "followers": 0, "videos": [], "error": "playwright_unavailable"}
 
     url = f"https://www.tiktok.com/@{username}"
     logger.info(f"Scrape TikTok real: {url}")
 
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=PLAYWRIGHT_HEADLESS)
-            page = browser.new_page()
-            page.set_default_timeout(REQUEST_TIMEOUT * 1000)
-            page.goto(url)
+        lean = SCRAPE_LEAN if lean is None else lean
+        incremental = WATERMARKS_ENABLED if incremental is None else incremental
+        key = f"{normalize_key(username)}|{video_limit}|{comments_per_video}"
+        prev = await asyncio.to_thread(watermarks.get, "tiktok", key) if incremental else None
+        cap = TikTokCapture(username, video_limit, comments_per_video, comment_pages, tiktok_known(prev))
+        out = await run_in_pool(_scrape_tiktok_page(cap, url, lean, record_dir))
+        # solo capturas JSON completas (no el respaldo del DOM ni cortes por presupuesto)
+        if incremental and "_capture" in out and not out.get("_partial"):
+            # puntuar y guardar (SQLite) fuera del loop
+            out = await asyncio.to_thread(_merge_and_store, key, prev, out, video_limit, comments_per_video)
+        return out
+    except Exception as e:
+        if isinstance(e, Blocked):
+            fallback("tiktok_blocked")
+            logger.warning(f"TikTok @{username}: {e}")
+            return {"username": username, "followers": 0, "videos": [], "error": "blocked"}
+        if expired():
+            logger.warning(f"TikTok @{username}: sin presupuesto de tiempo")
+            return {"username": username, "followers": 0, "videos": [], "error": "deadline_exceeded"}
+        fallback("tiktok_error")
+        logger.error(f"Fallo scraping TikTok: {e}")
+        return {"username": username, "followers": 0, "videos": [], "error": str(e)}
+
+
+def _merge_and_store(
+    key: str, prev: Optional[Dict[str, Any]], out: Dict[str, Any], video_limit: int, comments_per_video: int
+) -> Dict[str, Any]:
+    merged = merge_tiktok(prev, out, video_limit, comments_per_video)
+    watermarks.put("tiktok", key, {k: v for k, v in merged.items() if k != "_metrics"})
+    return merged
+
+
+async def _scrape_tiktok_page(
+    cap: TikTokCapture, url: str, lean: bool, record_dir: Optional[Path]
+) -> Dict[str, Any]:
+    # turno del dominio antes de pedir la página: la espera no retiene un navegador
+    async with rate_limiter.slot(url), get_pool().page("tiktok") as page:
+        async with instrument(page, lean) as metrics:
+            await _capture_tiktok(page, cap, url, lean, record_dir)
+            if cap.empty:
+                await _check_blocked(page)  # la verificación pudo aparecer después de cargar
+                # sin JSON reconocible (¿cambió la web?): lectura del DOM como respaldo
+                logger.warning(f"TikTok @{cap.username}: sin respuestas JSON; leyendo el DOM")
+                fallback("tiktok_dom_fallback")
+                with stage("tiktok.dom"):
+                    out = await _read_tiktok(page, cap.username, url, cap.video_limit, lean)
+            else:
+                out = cap.result()
+                if expired():
+                    # se cortó la paginación por el presupuesto: lo capturado sirve, pero incompleto
+                    out["_partial"] = True
+        out["_metrics"] = metrics.as_dict()
+        logger.info(f"TikTok @{cap.username}: {out['_metrics']}")
+        return out
+
+
+async def _capture_tiktok(
+    page, cap: TikTokCapture, url: str, lean: bool, record_dir: Optional[Path]
+) -> None:
+    """Navega perfil y videos escuchando las respuestas JSON; `cap` decide cuándo parar."""
+    arrived = {"item_list": asyncio.Event(), "comment_list": asyncio.Event()}
+    pending: Set[asyncio.Future] = set()
+    recorded = [0]
+
+    async def _handle(response) -> None:
+        kind = api_kind(response.url)
+        if kind is None:
+            return
+        try:
+            data = await response.json()
+        except Exception:
+            fallback("tiktok_parse_failure")
+            return
+        cap.feed(response.url, data)
+        if record_dir is not None:
+            recorded[0] += 1
+            record_response(record_dir, recorded[0], kind, response.url, data)
+        if kind in arrived:
+            arrived[kind].set()
+
+    def _on_response(response) -> None:
+        if api_kind(response.url) is None:
+            return
+        fut = asyncio.ensure_future(_handle(response))
+        pending.add(fut)
+        fut.add_done_callback(pending.discard)
+
+    async def _next(kind: str) -> bool:
+        try:
+            await asyncio.wait_for(arrived[kind].wait(), timeout_s(RESPONSE_TIMEOUT_S))
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    page.set_default_timeout(REQUEST_TIMEOUT * 1000)
+    page.on("response", _on_response)
+    try:
+        with stage("tiktok.navigate"):
+            arrived["item_list"].clear()
+            await page.goto(
+                url, wait_until="domcontentloaded" if lean else "load", timeout=timeout_ms(REQUEST_TIMEOUT)
+            )
+            await _check_blocked(page)
+            ssr = await page.evaluate(
+                f"() => document.getElementById('{SSR_SCRIPT_ID}')?.textContent || null"
+            )
+            if ssr:
+                try:
+                    data = json.loads(ssr)
+                    cap.feed_ssr(data)
+                    if record_dir is not None:
+                        recorded[0] += 1
+                        record_response(record_dir, recorded[0], "ssr", url, data)
+                except ValueError:
+                    fallback("tiktok_parse_failure")
             try:
-                page.locator("button:has-text('Accept all')").first.click(timeout=3000)
+                await page.locator(CONSENT).first.click(timeout=timeout_ms(1))
             except Exception:
                 pass
 
-            followers = 0
-            try:
-                counters = page.locator("strong[data-e2e='followers-count']").first
-                txt = counters.inner_text(timeout=4000)
-                followers = _parse_compact_number(txt)
-            except Exception:
-                logger.warning("No se pudo leer followers")
+        with stage("tiktok.videos"):
+            # videos: la primera página llega sola; las siguientes al hacer scroll
+            scrolls = 0
+            while cap.need_more_videos() and scrolls < MAX_SCROLLS and not expired():
+                if not await _next("item_list"):
+                    break
+                if not cap.need_more_videos():
+                    break
+                arrived["item_list"].clear()
+                await page.mouse.wheel(0, 6000)
+                scrolls += 1
 
-            videos: List[Dict[str, Any]] = []
-            try:
-                thumbs = page.locator("div[data-e2e='user-post-item']").all()[:6]
-                for i, item in enumerate(thumbs):
-                    like_txt = "0"
+        with stage("tiktok.comments"):
+            # comentarios: se abre cada video y se pagina haciendo scroll en el panel
+            for video_id in cap.videos_needing_comments():
+                if expired():
+                    break
+                arrived["comment_list"].clear()
+                await page.goto(
+                    f"{url}/video/{video_id}", wait_until="domcontentloaded", timeout=timeout_ms(REQUEST_TIMEOUT)
+                )
+                while cap.need_more_comments(video_id) and not expired():
+                    if not await _next("comment_list"):
+                        break
+                    if not cap.need_more_comments(video_id):
+                        break
+                    arrived["comment_list"].clear()
                     try:
-                        like_txt = item.locator("strong").first.inner_text(timeout=2000)
+                        await page.locator(COMMENT_ITEM).last.scroll_into_view_if_needed(timeout=timeout_ms(2))
                     except Exception:
-                        pass
-                    videos.append({
-                        "id": f"v{i+1}",
-                        "likes": _parse_compact_number(like_txt),
-                        "comments": 0,
-                        "shares": 0,
-                    })
+                        await page.mouse.wheel(0, 3000)
+    finally:
+        page.remove_listener("response", _on_response)
+        if pending:
+            await asyncio.wait(set(pending), timeout=timeout_s(2))
+
+
+async def _check_blocked(page) -> None:
+    """`Blocked` si TikTok muestra su verificación: sin esto cada bloqueo terminaba en timeouts."""
+    if await page.locator(BLOCKED).count():
+        raise Blocked(f"verificación/CAPTCHA en {page.url}")
+
+
+async def _read_tiktok(page, username: str, url: str, video_limit: int, lean: bool) -> Dict[str, Any]:
+    page.set_default_timeout(REQUEST_TIMEOUT * 1000)
+    if lean:
+        await page.goto(url, wait_until="domcontentloaded", timeout=timeout_ms(REQUEST_TIMEOUT))
+        # aviso de cookies o contador de seguidores, lo que llegue primero
+        try:
+            await page.locator(CONSENT).or_(page.locator(FOLLOWERS)).first.wait_for(timeout=timeout_ms(8))
+            if await page.locator(CONSENT).count():
+                await page.locator(CONSENT).first.click(timeout=timeout_ms(REQUEST_TIMEOUT))
+        except Exception:
+            pass
+    else:
+        await page.goto(url, timeout=timeout_ms(REQUEST_TIMEOUT))
+        try:
+            await page.locator(CONSENT).first.click(timeout=timeout_ms(3))
+        except Exception:
+            pass
+
+    followers = 0
+    try:
+        counters = page.locator(FOLLOWERS).first
+        txt = await counters.inner_text(timeout=timeout_ms(4))
+        followers = _parse_compact_number(txt)
+    except Exception:
+        logger.warning("No se pudo leer followers")
+
+    videos: List[Dict[str, Any]] = []
+    try:
+        if lean and video_limit > 0:
+            try:
+                await page.locator(POST_ITEM).first.wait_for(timeout=timeout_ms(4))
+            except Exception:
+                pass  # perfil sin videos (o privado)
+        thumbs = (await page.locator(POST_ITEM).all())[:max(0, video_limit)]
+        for i, item in enumerate(thumbs):
+            like_txt = "0"
+            try:
+                like_txt = await item.locator("strong").first.inner_text(timeout=timeout_ms(2))
             except Exception:
-                logger.warning("No se pudieron listar videos")
-            finally:
-                browser.close()
+                pass
+            videos.append({
+                "id": f"v{i+1}",
+                "likes": _parse_compact_number(like_txt),
+                "comments": 0,
+                "shares": 0,
+            })
+    except Exception:
+        logger.warning("No se pudieron listar videos")
 
-            return {"username": username, "followers": followers, "videos": videos}
-    except Exception as e:
-        logger.error(f"Fallo scraping TikTok: {e}")
-        return {"username": username, "followers": 0, "videos": []}
+    return {"username": username, "followers": followers, "videos": videos}
 
 
 def _parse_compact_number(s: str) -> int:
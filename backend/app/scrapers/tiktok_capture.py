@@ -0,0 +1,260 @@
+"""
+Captura de TikTok a partir del JSON que la propia página ya descarga.
+
+El perfil trae los datos del usuario embebidos (SSR, `__UNIVERSAL_DATA_FOR_REHYDRATION__`)
+y luego pide `/api/post/item_list/` (videos, paginado por cursor) y, en cada video,
+`/api/comment/list/`. `TikTokCapture` recibe esas respuestas tal cual, las parsea por
+lote y decide cuándo ya hay suficiente (video_limit / comments_per_video /
+comment_pages, o contenido ya visto en el scrape anterior: `known`). No depende de
+Playwright: el scraper le pasa las respuestas en vivo y `replay_fixtures` le pasa
+respuestas grabadas (ver data/fixtures/tiktok/).
+"""
+from __future__ import annotations
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# fragmento de path → tipo de respuesta
+API_KINDS = {
+    "/api/user/detail": "user_detail",
+    "/api/post/item_list": "item_list",
+    "/api/comment/list": "comment_list",
+}
+
+SSR_SCRIPT_ID = "__UNIVERSAL_DATA_FOR_REHYDRATION__"
+
+
+def api_kind(url: str) -> Optional[str]:
+    path = urlsplit(url).path
+    for frag, kind in API_KINDS.items():
+        if path.startswith(frag):
+            return kind
+    return None
+
+
+def _int(x: Any) -> int:
+    try:
+        return int(float(x))
+    except Exception:
+        return 0
+
+
+def _stat(obj: Dict[str, Any], key: str) -> int:
+    """Lee `stats[key]`; si falta, `statsV2[key]` (que TikTok manda como string)."""
+    stats = obj.get("stats") or {}
+    if key in stats:
+        return _int(stats[key])
+    return _int((obj.get("statsV2") or {}).get(key))
+
+
+# ---- parsers (puros) ----
+def parse_user_info(user_info: Dict[str, Any]) -> Dict[str, Any]:
+    user = user_info.get("user") or {}
+    return {
+        "user_id": user.get("id"),
+        "sec_uid": user.get("secUid"),
+        "nickname": user.get("nickname"),
+        "followers": _stat(user_info, "followerCount"),
+        "following": _stat(user_info, "followingCount"),
+        "likes_total": _stat(user_info, "heartCount"),
+        "videos_total": _stat(user_info, "videoCount"),
+    }
+
+
+def parse_ssr(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Datos del perfil desde el JSON de rehidratación (None si no vienen)."""
+    scope = data.get("__DEFAULT_SCOPE__") or {}
+    user_info = (scope.get("webapp.user-detail") or {}).get("userInfo")
+    return parse_user_info(user_info) if user_info else None
+
+
+def parse_item_list(data: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], bool]:
+    videos = []
+    for it in data.get("itemList") or []:
+        if not it.get("id"):
+            continue
+        videos.append({
+            "id": str(it["id"]),
+            "desc": it.get("desc") or "",
+            "create_time": _int(it.get("createTime")),
+            "likes": _stat(it, "diggCount"),
+            "comments": _stat(it, "commentCount"),
+            "shares": _stat(it, "shareCount"),
+            "plays": _stat(it, "playCount"),
+            "saves": _stat(it, "collectCount"),
+            "pinned": bool(it.get("isPinnedItem")),
+        })
+    return videos, bool(data.get("hasMore"))
+
+
+def parse_comment_list(data: Dict[str, Any]) -> Tuple[Optional[str], List[Dict[str, Any]], bool]:
+    """(aweme_id, comentarios, has_more) de una página de /api/comment/list/."""
+    comments = []
+    aweme_id = None
+    for c in data.get("comments") or []:
+        aweme_id = aweme_id or (str(c["aweme_id"]) if c.get("aweme_id") else None)
+        comments.append({
+            "id": str(c.get("cid") or ""),
+            "text": c.get("text") or "",
+            "likes": _int(c.get("digg_count")),
+            "replies": _int(c.get("reply_comment_total")),
+            "create_time": _int(c.get("create_time")),
+            "author": (c.get("user") or {}).get("unique_id"),
+        })
+    return aweme_id, comments, bool(data.get("has_more"))
+
+
+class TikTokCapture:
+    """
+    Acumula respuestas de un perfil hasta cubrir los límites pedidos.
+
+    `known` ({video_id: {"comments": n, "comment_ids": {...}}}, ver
+    `services.watermarks.tiktok_known`) es lo visto en el scrape anterior: la lista
+    de videos (más nuevos primero) se deja de paginar al aparecer uno conocido, no se
+    piden comentarios de videos conocidos cuyo contador no cambió y los de un video
+    se dejan de paginar al llegar a un comentario conocido.
+    """
+
+    def __init__(
+        self,
+        username: str,
+        video_limit: int = 10,
+        comments_per_video: int = 5,
+        comment_pages: int = 3,
+        known: Optional[Dict[str, Dict[str, Any]]] = None,
+    ):
+        self.username = username
+        self.video_limit = max(0, video_limit)
+        self.comments_per_video = max(0, comments_per_video)
+        self.comment_pages = max(0, comment_pages)
+        self.profile: Dict[str, Any] = {}
+        self._videos: Dict[str, Dict[str, Any]] = {}  # orden de llegada
+        self._videos_more = True
+        self._comments: Dict[str, List[Dict[str, Any]]] = {}
+        self._comment_pages: Dict[str, int] = {}
+        self._comments_more: Dict[str, bool] = {}
+        self.known = known or {}
+        self.reached_known = False
+        self.responses = 0
+
+    # ---- entrada ----
+    def feed(self, url: str, data: Dict[str, Any], aweme_id: Optional[str] = None) -> Optional[str]:
+        """Procesa una respuesta JSON; devuelve su tipo (None si no es de interés)."""
+        kind = api_kind(url)
+        if kind is None:
+            return None
+        self.responses += 1
+        if kind == "user_detail" and data.get("userInfo"):
+            self.profile.update(parse_user_info(data["userInfo"]))
+        elif kind == "item_list":
+            videos, more = parse_item_list(data)
+            for v in videos:
+                self._videos.setdefault(v["id"], v)
+            self._videos_more = more
+            # los fijados aparecen primero aunque sean viejos: no marcan el corte
+            if any(v["id"] in self.known and not v["pinned"] for v in videos):
+                self._videos_more = False
+                self.reached_known = True
+        elif kind == "comment_list":
+            vid, comments, more = parse_comment_list(data)
+            vid = vid or aweme_id
+            if vid:
+                seen = {c["id"] for c in self._comments.get(vid, [])}
+                self._comments.setdefault(vid, []).extend(c for c in comments if c["id"] not in seen)
+                self._comment_pages[vid] = self._comment_pages.get(vid, 0) + 1
+                known_ids = (self.known.get(vid) or {}).get("comment_ids") or ()
+                self._comments_more[vid] = more and not any(c["id"] in known_ids for c in comments)
+        return kind
+
+    def feed_ssr(self, data: Dict[str, Any]) -> bool:
+        parsed = parse_ssr(data)
+        if parsed:
+            self.profile.update(parsed)
+        return parsed is not None
+
+    # ---- control de paginación ----
+    def need_more_videos(self) -> bool:
+        return self._videos_more and len(self._videos) < self.video_limit
+
+    def videos_needing_comments(self) -> List[str]:
+        if not self.comments_per_video or not self.comment_pages:
+            return []
+        ids = list(self._videos)[: self.video_limit]
+        return [vid for vid in ids if self.need_more_comments(vid)]
+
+    def need_more_comments(self, video_id: str) -> bool:
+        v = self._videos.get(video_id)
+        if v is not None and v["comments"] == 0:
+            return False
+        k = self.known.get(video_id)
+        if k is not None and v is not None and v["comments"] == k["comments"]:
+            return False  # sin comentarios nuevos desde el scrape anterior
+        return (
+            self._comments_more.get(video_id, True)
+            and len(self._comments.get(video_id, [])) < self.comments_per_video
+            and self._comment_pages.get(video_id, 0) < self.comment_pages
+        )
+
+    # ---- salida ----
+    def result(self) -> Dict[str, Any]:
+        videos = []
+        for v in list(self._videos.values())[: self.video_limit]:
+            items = self._comments.get(v["id"], [])[: self.comments_per_video]
+            videos.append({**v, "comment_items": items})
+        return {
+            "username": self.username,
+            "followers": self.profile.get("followers", 0),
+            "following": self.profile.get("following", 0),
+            "likes_total": self.profile.get("likes_total", 0),
+            "videos_total": self.profile.get("videos_total", 0),
+            "nickname": self.profile.get("nickname"),
+            "videos": videos,
+            "_capture": {
+                "responses": self.responses,
+                "comment_pages": sum(self._comment_pages.values()),
+                "reached_known": self.reached_known,
+            },
+        }
+
+    @property
+    def empty(self) -> bool:
+        return not self.profile and not self._videos
+
+
+# ---- fixtures: respuestas grabadas ----
+def record_response(record_dir: Path, n: int, kind: str, url: str, data: Dict[str, Any]) -> None:
+    record_dir.mkdir(parents=True, exist_ok=True)
+    path = record_dir / f"{n:03d}_{kind}.json"
+    path.write_text(json.dumps({"kind": kind, "url": url, "json": data}, ensure_ascii=False, indent=1), encoding="utf-8")
+
+
+def replay_fixtures(
+    fixtures_dir: Path,
+    username: str,
+    video_limit: int = 10,
+    comments_per_video: int = 5,
+    comment_pages: int = 3,
+    known: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """
+    Reproduce una captura grabada en orden, como lo haría el scraper en vivo:
+    deja de "pedir" videos o comentarios en cuanto se alcanzan los límites (o
+    contenido ya conocido, con `known`).
+    """
+    cap = TikTokCapture(username, video_limit, comments_per_video, comment_pages, known)
+    for path in sorted(Path(fixtures_dir).glob("*.json")):
+        rec = json.loads(path.read_text(encoding="utf-8"))
+        kind, data = rec.get("kind"), rec.get("json") or {}
+        if kind == "ssr":
+            cap.feed_ssr(data)
+        elif kind == "item_list":
+            if cap.need_more_videos():
+                cap.feed(rec["url"], data)
+        elif kind == "comment_list":
+            vid = parse_comment_list(data)[0]
+            if vid in cap.videos_needing_comments():
+                cap.feed(rec["url"], data)
+        else:
+            cap.feed(rec["url"], data)
+    return cap.result()
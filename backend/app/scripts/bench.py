@@ -0,0 +1,300 @@
+"""
+Benchmarks offline de la API y de los caminos de scoring (sin red).
+
+Mide p50/p95/p99, media y throughput sobre entradas sintéticas de tamaño creciente,
+escribe un JSON y, si se le pasa, compara contra una línea base:
+
+    python -m app.scripts.bench --out /tmp/bench.json
+    python -m app.scripts.bench --baseline app/data/bench/baseline.json   # exit 1 si hay regresión
+    python -m app.scripts.bench --quick --save-baseline app/data/bench/baseline.json
+
+Los datos de la app (resultados, jobs, caché) van a un directorio temporal. El
+scraper de Maps se mide contra `scripts/fixture_server.py`; si no hay navegador de
+Playwright instalado ese caso queda como `skipped`.
+"""
+from __future__ import annotations
+import argparse, gc, json, os, platform, random, subprocess, sys, tempfile, time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# aislar el estado de la app antes de importar app.*
+_TMP = Path(tempfile.mkdtemp(prefix="bench-"))
+for _var, _name in (
+    ("RESULTS_DB_PATH", "results.sqlite"),
+    ("JOBS_DB_PATH", "jobs.sqlite"),
+    ("FINANCIAL_DB_PATH", "financials.sqlite"),
+):
+    os.environ.setdefault(_var, str(_TMP / _name))
+
+BASELINE_PATH = Path(__file__).resolve().parents[1] / "data" / "bench" / "baseline.json"
+
+# (nombre, tamaño) → (función a medir, filas que procesa por llamada)
+Case = Tuple[Callable[[], Any], int]
+
+
+# ---- datos sintéticos ----
+def _financial_row(rng: random.Random) -> Dict[str, Any]:
+    return {
+        "ruc": f"{rng.randrange(10**12):013d}",
+        "patrimonio": rng.uniform(-50_000, 2_000_000),
+        "utilidad_neta": rng.uniform(-100_000, 300_000),
+        "ingresos_ventas": rng.uniform(0, 5_000_000),
+        "activos": rng.uniform(10_000, 8_000_000),
+        "n_empleados": rng.randrange(0, 400),
+        "liquidez_corriente": rng.uniform(0.2, 3.5),
+        "deuda_total": rng.uniform(0, 3_000_000),
+        "roe": rng.uniform(-0.3, 0.4),
+        "roa": rng.uniform(-0.2, 0.3),
+    }
+
+
+def _maps_payload(rng: random.Random) -> Optional[Dict[str, Any]]:
+    if rng.random() < 0.1:
+        return None
+    return {"rating": round(rng.uniform(1, 5), 1), "user_ratings_total": rng.randrange(0, 5000)}
+
+
+def _tiktok_payload(rng: random.Random) -> Optional[Dict[str, Any]]:
+    if rng.random() < 0.1:
+        return None
+    return {"overview": {"risk_score": rng.uniform(0, 100)}}
+
+
+_COMMENTS = (
+    "Excelente atención, muy amables 👏", "pésimo servicio, nunca más", "no me gustó para nada",
+    "love this shop!! 🔥", "está bien pero un poco caro", "estafa, no compren 😡", "Me encanta 😍",
+    "la entrega demoró demasiado", "great quality, fast shipping", "jajaja quiero uno",
+)
+
+
+def _tiktok_raw(rng: random.Random, n_videos: int) -> Dict[str, Any]:
+    return {
+        "username": "bench",
+        "followers": rng.randrange(100, 1_000_000),
+        "videos": [
+            {"id": str(i), "likes": rng.randrange(0, 10_000), "comments": rng.randrange(0, 500), "shares": rng.randrange(0, 200)}
+            for i in range(n_videos)
+        ],
+    }
+
+
+def _validated_json(results: List[Dict[str, Any]]) -> bytes:
+    """Lo que hacían las rutas antes del camino rápido: validar con el modelo y codificar."""
+    from fastapi.encoders import jsonable_encoder
+
+    from app.models import EvaluateBatchResponse
+
+    resp = EvaluateBatchResponse(results=results)
+    body = resp.model_dump(mode="json") if hasattr(resp, "model_dump") else jsonable_encoder(resp)
+    return json.dumps(body, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+# ---- casos ----
+def _cases(quick: bool) -> Dict[Tuple[str, int], Case]:
+    from fastapi.testclient import TestClient
+
+    from app.analysis.analyze_maps import summarize_maps
+    from app.analysis.analyze_tiktok import summarize_tiktok
+    from app.analysis.finance_rules import rule_based_financials, rule_based_financials_batch
+    from app.main import _SCORE_ITEM, app
+    from app.pipeline import fuse_scores, fuse_scores_batch
+    from app.services.serialize import dumps_json, serializer_info
+
+    rng = random.Random(42)
+    sizes = [1, 100, 1000] if quick else [1, 100, 10_000]
+    cases: Dict[Tuple[str, int], Case] = {}
+
+    client = TestClient(app)
+    orch_body = {"ruc": "1790015474001", "mock": True}
+    cases[("api_orchestrate_mock", 1)] = (lambda: client.post("/api/orchestrate", json=orch_body), 1)
+    cases[("api_orchestrate_mock_compact", 1)] = (
+        lambda: client.post("/api/orchestrate?fields=compact", json=orch_body), 1
+    )
+    eval_body = {"financialData": _financial_row(rng)}
+    cases[("api_evaluate", 1)] = (lambda: client.post("/api/evaluate", json=eval_body), 1)
+    cases[("api_evaluate_compact", 1)] = (lambda: client.post("/api/evaluate?fields=compact", json=eval_body), 1)
+    msgpack = {"Accept": "application/msgpack"}
+    if serializer_info()["msgpack"]:
+        cases[("api_evaluate_msgpack", 1)] = (lambda: client.post("/api/evaluate", json=eval_body, headers=msgpack), 1)
+    for n in ([100] if quick else [100, 1000]):
+        batch_body = {"items": [_financial_row(rng) for _ in range(n)]}
+        cases[("api_evaluate_batch", n)] = (lambda b=batch_body: client.post("/api/evaluate/batch", json=b), n)
+        cases[("api_evaluate_batch_compact", n)] = (
+            lambda b=batch_body: client.post("/api/evaluate/batch?fields=compact", json=b), n
+        )
+
+    # solo la serialización de la respuesta: validación con response_model + json vs. camino rápido
+    for n in ([100] if quick else [100, 10_000]):
+        scored = rule_based_financials_batch([_financial_row(rng) for _ in range(n)])
+        cases[("response_validated", n)] = (lambda scored=scored: _validated_json(scored), n)
+        cases[("response_fast", n)] = (
+            lambda scored=scored: dumps_json({"results": _SCORE_ITEM.project_many(scored, _SCORE_ITEM.names)}), n
+        )
+
+    for n in sizes:
+        rows = [_financial_row(rng) for _ in range(n)]
+        rucs = [r["ruc"] for r in rows]
+        maps = [_maps_payload(rng) for _ in range(n)]
+        tts = [_tiktok_payload(rng) for _ in range(n)]
+        weights = [None] * n
+        cases[("fuse_scores", n)] = (
+            lambda rucs=rucs, maps=maps, tts=tts: [fuse_scores(r, m, t) for r, m, t in zip(rucs, maps, tts)], n
+        )
+        cases[("fuse_scores_batch", n)] = (
+            lambda rucs=rucs, maps=maps, tts=tts, w=weights: fuse_scores_batch(rucs, maps, tts, w), n
+        )
+        cases[("rule_based_financials", n)] = (lambda rows=rows: [rule_based_financials(r) for r in rows], n)
+        cases[("rule_based_financials_batch", n)] = (lambda rows=rows: rule_based_financials_batch(rows), n)
+
+    for n in ([10, 1000] if quick else [10, 1000, 100_000]):
+        raw = _tiktok_raw(rng, n)
+        cases[("summarize_tiktok", n)] = (lambda raw=raw: summarize_tiktok(raw), n)
+    from app.analysis.sentiment import score_texts
+    for n in ([1000] if quick else [1000, 50_000]):
+        texts = [f"{rng.choice(_COMMENTS)} #{i}" for i in range(n)]
+        cases[("sentiment_score", n)] = (lambda texts=texts: score_texts(texts, workers=1), n)
+    maps_raw = {"query": "bench", "rating": 4.4, "reviews": 321}
+    cases[("summarize_maps", 1)] = (lambda: summarize_maps(maps_raw), 1)
+
+    from app.scrapers.tiktok_capture import replay_fixtures
+    fixtures = Path(__file__).resolve().parents[1] / "data" / "fixtures" / "tiktok" / "fixture_shop"
+    cases[("tiktok_capture_replay", 10)] = (lambda: replay_fixtures(fixtures, "fixture_shop"), 10)
+    return cases
+
+
+def _gmaps_fixture_case() -> Tuple[Optional[Case], Optional[str]]:
+    """Maps contra la réplica local; (None, motivo) si no hay navegador."""
+    from app.scripts.fixture_server import serve_in_background
+
+    srv = serve_in_background("gmaps")
+    os.environ["GMAPS_BASE_URL"] = srv.base_url + "/maps"
+    import app.scrapers.gmaps as gm
+    gm.GMAPS_BASE_URL = os.environ["GMAPS_BASE_URL"]
+    probe = gm.scrape_gmaps("Nike Miraflores")
+    if probe.get("error"):
+        return None, probe["error"].splitlines()[0]
+    queries = ["Nike Miraflores", "Café Quito Centro", "Ferretería El Tornillo", "Panadería Sin Reseñas"]
+    return (lambda: gm.scrape_gmaps_many(queries, tabs=2), len(queries)), None
+
+
+# ---- medición ----
+def _measure(fn: Callable[[], Any], rows: int, min_time: float, min_reps: int, max_reps: int) -> Dict[str, Any]:
+    fn()  # warm-up (imports perezosos, cachés, JIT de numpy)
+    gc.collect()
+    times: List[float] = []
+    start = time.perf_counter()
+    while len(times) < max_reps and (len(times) < min_reps or time.perf_counter() - start < min_time):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    arr = np.array(times) * 1000.0
+    total_s = float(arr.sum()) / 1000.0
+    return {
+        "rows": rows,
+        "reps": len(times),
+        "mean_ms": round(float(arr.mean()), 4),
+        "p50_ms": round(float(np.percentile(arr, 50)), 4),
+        "p95_ms": round(float(np.percentile(arr, 95)), 4),
+        "p99_ms": round(float(np.percentile(arr, 99)), 4),
+        "ops_per_s": round(len(times) / total_s, 2) if total_s else None,
+        "rows_per_s": round(len(times) * rows / total_s, 2) if total_s else None,
+    }
+
+
+def _meta() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=False
+        ).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(
+    current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float, min_delta_ms: float = 0.05
+) -> List[Dict[str, Any]]:
+    """
+    Casos cuyo p50 o p95 empeoró más de `tolerance` (0.25 = +25 %) frente a la base.
+    Diferencias menores a `min_delta_ms` se ignoran (ruido en casos de microsegundos).
+    """
+    out = []
+    for name, cur in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base or cur.get("skipped") or base.get("skipped"):
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            b, c = base.get(metric), cur.get(metric)
+            if b and c and c > b * (1 + tolerance) and c - b >= min_delta_ms:
+                out.append({"case": name, "metric": metric, "baseline": b, "current": c, "ratio": round(c / b, 2)})
+    return out
+
+
+def run(only: Optional[List[str]], quick: bool, min_time: float, scrapers: bool) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    cases = _cases(quick)
+    if scrapers:
+        case, reason = _gmaps_fixture_case()
+        if case is None:
+            results["gmaps_fixture_many/4"] = {"skipped": reason}
+        else:
+            cases[("gmaps_fixture_many", 4)] = case
+    for (name, size), (fn, rows) in cases.items():
+        key = f"{name}/{size}"
+        if only and not any(o in key for o in only):
+            continue
+        max_reps = 10_000 if rows <= 100 else 200
+        results[key] = _measure(fn, rows, min_time, min_reps=5, max_reps=max_reps)
+        r = results[key]
+        print(
+            f"{key:<36} p50={r['p50_ms']:>10.4f}ms p95={r['p95_ms']:>10.4f}ms "
+            f"p99={r['p99_ms']:>10.4f}ms rows/s={r['rows_per_s']:>14,.0f}",
+            file=sys.stderr,
+        )
+    return {"meta": _meta(), "results": results}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmarks offline (API, fusión, reglas, resúmenes, scrapers)")
+    ap.add_argument("--out", type=Path, help="archivo JSON de salida (por defecto, stdout)")
+    ap.add_argument("--baseline", type=Path, help="compara contra esta línea base; exit 1 si hay regresión")
+    ap.add_argument("--save-baseline", type=Path, nargs="?", const=BASELINE_PATH, help="guarda el resultado como base")
+    ap.add_argument("--tolerance", type=float, default=0.5, help="empeoramiento tolerado (0.5 = +50 %%)")
+    ap.add_argument("--min-delta-ms", type=float, default=0.05, help="ignora empeoramientos menores (ms)")
+    ap.add_argument("--only", action="append", help="filtra casos por subcadena (repetible)")
+    ap.add_argument("--quick", action="store_true", help="tamaños reducidos (CI)")
+    ap.add_argument("--min-time", type=float, default=1.0, help="segundos mínimos por caso")
+    ap.add_argument("--no-scrapers", action="store_true", help="omite los scrapers contra fixtures")
+    args = ap.parse_args()
+
+    report = run(args.only, args.quick, args.min_time, scrapers=not args.no_scrapers)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(text, encoding="utf-8")
+    if args.save_baseline:
+        args.save_baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.save_baseline.write_text(text, encoding="utf-8")
+    if not args.out and not args.save_baseline:
+        print(text)
+
+    if args.baseline:
+        regressions = compare(report, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance, args.min_delta_ms)
+        for r in regressions:
+            print(f"REGRESIÓN {r['case']} {r['metric']}: {r['baseline']} → {r['current']} (x{r['ratio']})", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print("Sin regresiones frente a la línea base", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
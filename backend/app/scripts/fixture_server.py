@@ -0,0 +1,82 @@
+"""
+Servidor HTTP estático que sirve `app/data/fixtures/<sitio>/` como sustituto de la web real.
+
+Para probar el scraper de Maps contra HTML guardado, sin red:
+
+    python -m app.scripts.fixture_server --site gmaps --port 8766
+    GMAPS_BASE_URL=http://127.0.0.1:8766/maps python -m app.scripts.run_gmaps --q "Nike Miraflores" --reviews 30
+
+`/maps` (con o sin query string) sirve `maps.html`; `GET /__stats` devuelve cuántas
+peticiones se sirvieron.
+"""
+from __future__ import annotations
+import argparse, json, threading, time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+FIXTURES_DIR = Path(__file__).resolve().parents[1] / "data" / "fixtures"
+
+
+class _Handler(SimpleHTTPRequestHandler):
+    server: "FixtureServer"
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests += 1
+        if self.path.startswith("/__stats"):
+            body = json.dumps({"requests": self.server.requests}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if path in ("", "/maps"):
+            self.path = "/maps.html"
+        super().do_GET()
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, site: str = "gmaps", port: int = 0, delay: float = 0.0):
+        root = FIXTURES_DIR / site
+        if not root.is_dir():
+            raise FileNotFoundError(root)
+        super().__init__(("127.0.0.1", port), partial(_Handler, directory=str(root)))
+        self.delay = delay
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+def serve_in_background(site: str = "gmaps", port: int = 0, delay: float = 0.0) -> FixtureServer:
+    """Arranca el servidor en un hilo (port=0 → puerto libre); cerrar con `.shutdown()`."""
+    srv = FixtureServer(site, port, delay)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Sirve fixtures HTML locales en lugar del sitio real")
+    ap.add_argument("--site", default="gmaps")
+    ap.add_argument("--port", type=int, default=8766)
+    ap.add_argument("--delay", type=float, default=0.0, help="latencia simulada por petición (s)")
+    args = ap.parse_args()
+    srv = FixtureServer(args.site, args.port, args.delay)
+    print(json.dumps({"ok": True, "base_url": srv.base_url, "maps_url": srv.base_url + "/maps"}))
+    srv.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Costo de importación del punto de entrada de la API (arranque en frío).
+
+Corre un intérprete nuevo con `-X importtime`, suma el tiempo por paquete raíz y
+lista los módulos más caros. Con `--exercise` además recorre el camino mock
+(`orchestrate(mock=True)` + `heuristic_financials`) y verifica que no haya cargado
+dependencias pesadas (Playwright, OpenAI, numpy, pandas):
+
+    python -m app.scripts.import_report
+    python -m app.scripts.import_report --exercise --check          # exit 1 si algo pesado se cargó
+    python -m app.scripts.import_report --budget-ms 800 --json
+"""
+from __future__ import annotations
+import argparse, json, os, resource, subprocess, sys, tempfile
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+# no deberían cargarse ni en modo mock ni al evaluar
+HEAVY = ("playwright", "openai", "numpy", "pandas")
+
+_CHILD = """
+import json, sys
+import {module}
+if {exercise}:
+    from app.analysis.finance_rules import heuristic_financials
+    from app.pipeline import orchestrate
+    from app.services.results_store import results_store
+    orchestrate("1790015474001", mock=True)
+    heuristic_financials({{"ingresos_ventas": 1000, "utilidad_neta": 50}})
+    results_store.flush()
+print(json.dumps({{"loaded": sorted({{m.split(".")[0] for m in sys.modules}})}}))
+"""
+
+
+def _parse(stderr: str) -> List[Dict[str, Any]]:
+    """Líneas de `-X importtime` → [{name, depth, self_us, cum_us}]."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cum_us, name = line[len("import time:"):].split("|", 2)
+            self_us, cum_us = int(self_us), int(cum_us)
+        except ValueError:
+            continue
+        rows.append({
+            "name": name.strip(),
+            "depth": (len(name) - len(name.lstrip(" ")) - 1) // 2,
+            "self_us": self_us,
+            "cum_us": cum_us,
+        })
+    return rows
+
+
+def measure(module: str = "app.main", exercise: bool = False) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix="importtime-") as tmp:
+        env = {
+            **os.environ,
+            "PYTHONPATH": str(BACKEND_DIR),
+            "RESULTS_DB_PATH": str(Path(tmp) / "results.sqlite"),
+            "JOBS_DB_PATH": str(Path(tmp) / "jobs.sqlite"),
+        }
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", _CHILD.format(module=module, exercise=exercise)],
+            cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+        )
+    if proc.returncode != 0:
+        raise SystemExit(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "falló el import")
+    rows = _parse(proc.stderr)
+    loaded = json.loads(proc.stdout.strip().splitlines()[-1])["loaded"]
+
+    by_package: Dict[str, int] = defaultdict(int)
+    for r in rows:
+        by_package[r["name"].split(".")[0]] += r["self_us"]
+    target = next((r for r in rows if r["name"] == module), None)
+    return {
+        "module": module,
+        "exercise": exercise,
+        "total_ms": round(sum(r["cum_us"] for r in rows if r["depth"] == 0) / 1000, 1),
+        "module_ms": round(target["cum_us"] / 1000, 1) if target else None,
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+        "packages_ms": {
+            k: round(v / 1000, 1) for k, v in sorted(by_package.items(), key=lambda kv: -kv[1])
+        },
+        "modules": sorted(rows, key=lambda r: -r["self_us"]),
+        "heavy_loaded": [m for m in HEAVY if m in loaded],
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Tiempo de importación y dependencias pesadas del arranque")
+    ap.add_argument("--module", default="app.main", help="módulo a importar (por defecto, la API)")
+    ap.add_argument("--exercise", action="store_true", help="además corre el camino mock/evaluate")
+    ap.add_argument("--top", type=int, default=15, help="paquetes y módulos a listar")
+    ap.add_argument("--budget-ms", type=float, help="exit 1 si importar el módulo tarda más")
+    ap.add_argument("--check", action="store_true", help="exit 1 si se cargó alguna dependencia pesada")
+    ap.add_argument("--json", action="store_true", help="salida JSON")
+    args = ap.parse_args()
+
+    rep = measure(args.module, args.exercise)
+    if args.json:
+        print(json.dumps({**rep, "modules": rep["modules"][: args.top]}, indent=2, ensure_ascii=False))
+    else:
+        print(f"{rep['module']}: {rep['module_ms']} ms (intérprete: {rep['total_ms']} ms, RSS máx {rep['max_rss_mb']} MB)")
+        print("\npor paquete (tiempo propio):")
+        for name, ms in list(rep["packages_ms"].items())[: args.top]:
+            print(f"  {name:<28} {ms:>8.1f} ms")
+        print("\nmódulos más caros (tiempo propio / acumulado):")
+        for r in rep["modules"][: args.top]:
+            print(f"  {r['name']:<48} {r['self_us'] / 1000:>8.1f} {r['cum_us'] / 1000:>8.1f} ms")
+        print(f"\ndependencias pesadas cargadas: {', '.join(rep['heavy_loaded']) or 'ninguna'}")
+
+    failed = False
+    if args.budget_ms is not None and (rep["module_ms"] or 0) > args.budget_ms:
+        print(f"FUERA DE PRESUPUESTO: {rep['module_ms']} ms > {args.budget_ms} ms", file=sys.stderr)
+        failed = True
+    if args.check and rep["heavy_loaded"]:
+        print(f"DEPENDENCIAS PESADAS: {', '.join(rep['heavy_loaded'])}", file=sys.stderr)
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+from __future__ import annotations
+import argparse, json, time
+from pathlib import Path
+
+from app.config import FINANCIAL_DB_PATH
+from app.services.financial_store import count, ingest_file
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Ingesta exportaciones financieras (CSV/Excel) al almacén local por RUC")
+    ap.add_argument("files", nargs="+", help="archivos .csv / .xlsx (p.ej. ranking SuperCías)")
+    ap.add_argument("--year", type=int, default=None, help="año del ejercicio si el archivo no trae la columna")
+    ap.add_argument("--db", default=str(FINANCIAL_DB_PATH))
+    ap.add_argument("--chunksize", type=int, default=50_000)
+    args = ap.parse_args()
+
+    db = Path(args.db)
+    for f in args.files:
+        t0 = time.perf_counter()
+        res = ingest_file(Path(f), year=args.year, db_path=db, chunksize=args.chunksize)
+        res["seconds"] = round(time.perf_counter() - t0, 2)
+        print(json.dumps(res, ensure_ascii=False))
+    print(json.dumps({"ok": True, "db": str(db), "companies": count(db)}, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
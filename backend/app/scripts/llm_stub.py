@@ -0,0 +1,98 @@
+"""
+Servidor HTTP mínimo que imita `POST /v1/chat/completions` de OpenAI.
+
+Sirve para probar `services/llm_finance` (cliente, caché, concurrencia) sin red:
+
+    python -m app.scripts.llm_stub --port 8765 --delay 0.2
+    OPENAI_API_KEY=stub OPENAI_BASE_URL=http://127.0.0.1:8765/v1 uvicorn app.main:app
+
+`GET /stats` devuelve cuántas completions se sirvieron.
+"""
+from __future__ import annotations
+import argparse, hashlib, json, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "StubServer"
+
+    def _send(self, code: int, payload) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/stats"):
+            return self._send(200, {"calls": self.server.calls})
+        self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._send(404, {"error": "not found"})
+        length = int(self.headers.get("Content-Length") or 0)
+        req = json.loads(self.rfile.read(length) or b"{}")
+        with self.server.lock:
+            self.server.calls += 1
+        if self.server.delay:
+            time.sleep(self.server.delay)
+
+        user = next((m.get("content", "") for m in req.get("messages", []) if m.get("role") == "user"), "")
+        h = int(hashlib.sha256(user.encode("utf-8")).hexdigest(), 16)
+        content = json.dumps({
+            "score": h % 101,
+            "creditLimit": float(10_000 + h % 90_000),
+            "comments": ["Stub: factor 1", "Stub: factor 2", "Stub: factor 3"],
+        })
+        self._send(200, {
+            "id": f"chatcmpl-stub-{h % 10**8}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": req.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, delay: float = 0.0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.delay = delay
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+def serve_in_background(port: int = 0, delay: float = 0.0) -> StubServer:
+    """Arranca el stub en un hilo (port=0 → puerto libre); cerrar con `.shutdown()`."""
+    srv = StubServer(port, delay)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Stub local de la API de OpenAI (chat completions)")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--delay", type=float, default=0.0, help="latencia simulada por llamada (s)")
+    args = ap.parse_args()
+    srv = StubServer(args.port, args.delay)
+    print(json.dumps({"ok": True, "base_url": srv.base_url}))
+    srv.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Lista y resume los perfiles por request guardados en PROFILE_DIR (ver services/profiler.py).
+
+    python -m app.scripts.profiles list
+    python -m app.scripts.profiles show 20260101-120000-a1b2c3 --top 30
+    python -m app.scripts.profiles top --path /api/orchestrate --app      # agregado de todos
+    python -m app.scripts.profiles prune --keep 50
+
+`show` y `top` ordenan funciones por tiempo propio (la hoja de la pila) y muestran
+también el acumulado (la función aparece en la pila). `--app` deja solo el código de
+`app/`, atribuyendo a la función de la app más cercana el tiempo de las librerías que llama.
+Los `.speedscope.json` se abren en https://www.speedscope.app y los `.pstats` con
+`python -m pstats` o snakeviz.
+"""
+from __future__ import annotations
+import argparse, json, time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.config import BASE_DIR, PROFILE_DIR
+from app.services.profiler import list_profiles, prune
+
+APP_DIR = str(BASE_DIR / "app")
+
+
+def _short(path: str) -> str:
+    if "site-packages/" in path:
+        return path.split("site-packages/", 1)[1]
+    try:
+        return str(Path(path).relative_to(BASE_DIR))
+    except ValueError:
+        return Path(path).name
+
+
+def _label(frame: Dict[str, Any]) -> str:
+    return f"{frame['name']}  ({_short(frame['file'])}:{frame['line']})"
+
+
+def _load(pid: str) -> Dict[str, Any]:
+    path = PROFILE_DIR / f"{pid}.speedscope.json"
+    if not path.exists():
+        raise SystemExit(f"no existe el perfil {pid} en {PROFILE_DIR}")
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def aggregate(docs: Iterable[Dict[str, Any]], app_only: bool = False, thread: Optional[str] = None):
+    """(propio, acumulado, total) en segundos por etiqueta de función."""
+    self_s: Dict[str, float] = defaultdict(float)
+    total_s: Dict[str, float] = defaultdict(float)
+    grand = 0.0
+    for doc in docs:
+        frames = doc["shared"]["frames"]
+        labels = [_label(f) for f in frames]
+        keep = [f["file"].startswith(APP_DIR) for f in frames]
+        for prof in doc["profiles"]:
+            if thread and prof["name"] != thread:
+                continue
+            for stack, w in zip(prof["samples"], prof["weights"]):
+                if app_only:
+                    stack = [i for i in stack if keep[i]]
+                if not stack:
+                    continue
+                grand += w
+                self_s[labels[stack[-1]]] += w
+                for lab in {labels[i] for i in stack}:
+                    total_s[lab] += w
+    return self_s, total_s, grand
+
+
+def _print_top(self_s, total_s, grand: float, top: int) -> None:
+    if not grand:
+        print("sin muestras")
+        return
+    print(f"{'propio':>9} {'%':>6} {'acum.':>9} {'%':>6}  función")
+    for lab, s in sorted(self_s.items(), key=lambda kv: -kv[1])[:top]:
+        t = total_s[lab]
+        print(f"{s * 1000:>7.1f}ms {100 * s / grand:>5.1f}% {t * 1000:>7.1f}ms {100 * t / grand:>5.1f}%  {lab}")
+    print(f"\ntotal muestreado: {grand * 1000:.1f} ms")
+
+
+def cmd_list(args) -> None:
+    metas = list_profiles()[: args.limit]
+    if not metas:
+        print(f"no hay perfiles en {PROFILE_DIR}")
+        return
+    print(f"{'id':<23} {'fecha':<19} {'estado':>6} {'ms':>9} {'muestras':>8}  ruta")
+    for m in metas:
+        ts = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(m["created_at"]))
+        print(f"{m['id']:<23} {ts:<19} {m['status']:>6} {m['duration_ms']:>9.1f} {m['samples']:>8}  {m['method']} {m['path']}")
+
+
+def cmd_show(args) -> None:
+    meta_path = PROFILE_DIR / f"{args.id}.json"
+    if meta_path.exists():
+        m = json.loads(meta_path.read_text(encoding="utf-8"))
+        print(f"{m['method']} {m['path']} → {m['status']}  {m['duration_ms']} ms, {m['samples']} muestras "
+              f"cada {m['interval_ms']:g} ms")
+        print("hilos: " + ", ".join(f"{k}={v}" for k, v in m["threads"].items()) + "\n")
+    _print_top(*aggregate([_load(args.id)], args.app, args.thread), args.top)
+
+
+def cmd_top(args) -> None:
+    since = time.time() - args.since_hours * 3600 if args.since_hours else 0
+    metas = [
+        m for m in list_profiles()
+        if m["created_at"] >= since and (not args.path or m["path"].startswith(args.path))
+    ]
+    if not metas:
+        print("ningún perfil coincide")
+        return
+    print(f"{len(metas)} perfiles\n")
+    _print_top(*aggregate((_load(m["id"]) for m in metas), args.app, args.thread), args.top)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Perfiles por request guardados (X-Profile)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("list", help="perfiles guardados, del más reciente al más antiguo")
+    p.add_argument("--limit", type=int, default=50)
+    p.set_defaults(fn=cmd_list)
+
+    for name, fn, hlp in (("show", cmd_show, "funciones más costosas de un perfil"),
+                          ("top", cmd_top, "funciones más costosas sumando varios perfiles")):
+        p = sub.add_parser(name, help=hlp)
+        if name == "show":
+            p.add_argument("id")
+        else:
+            p.add_argument("--path", default=None, help="solo rutas que empiezan así")
+            p.add_argument("--since-hours", type=float, default=None)
+        p.add_argument("--top", type=int, default=25)
+        p.add_argument("--app", action="store_true", help="solo funciones de app/")
+        p.add_argument("--thread", default=None, help="solo este hilo (p. ej. browser-pool)")
+        p.set_defaults(fn=fn)
+
+    p = sub.add_parser("prune", help="borra los más antiguos")
+    p.add_argument("--keep", type=int, required=True)
+    p.set_defaults(fn=lambda a: print(f"{prune(a.keep)} perfiles borrados"))
+
+    args = ap.parse_args()
+    args.fn(args)
+
+
+if __name__ == "__main__":
+    main()
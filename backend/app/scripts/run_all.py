@@ -1,15 +1,13 @@
 from __future__ import annotations
 import argparse, json
-from pathlib import Path
 
-from app.services.pipeline import run_pipeline
-from app.services.temp_store import write_temp_txt
-
-BASE = Path(__file__).resolve().parents[1]
+from app.config import RESULTS_DB_PATH
+from app.pipeline import orchestrate
+from app.services.results_store import results_store
 
 
 def main():
-    ap = argparse.ArgumentParser(description="Orquesta scrapers + pipeline + TXT")
+    ap = argparse.ArgumentParser(description="Orquesta scrapers + pipeline y guarda el resultado en el historial")
     ap.add_argument("--ruc", required=True)
     ap.add_argument("--tiktok", default="")
     ap.add_argument("--gmaps", default="")
@@ -17,18 +15,20 @@ def main():
     ap.add_argument("--mock", action="store_true")
     args = ap.parse_args()
 
-    result = run_pipeline(
+    result = orchestrate(
         ruc=args.ruc,
-        tiktok_user=args.tiktok,
-        gmaps_query=args.gmaps,
+        tiktok=args.tiktok,
+        gmaps=args.gmaps,
         run_scrapers=args.run_scrapers,
         mock=args.mock,
     )
-    txt_path = write_temp_txt(result)
+    results_store.flush()
+    latest = results_store.latest(args.ruc)
 
     print(json.dumps({
         "ok": True,
-        "txt_path": str(Path(txt_path).as_posix()),
+        "results_db": RESULTS_DB_PATH.as_posix(),
+        "result_id": latest["id"] if latest else None,
         "summary": {
             "ruc": result.get("ruc"),
             "final_score": result.get("final_score"),
@@ -38,4 +38,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
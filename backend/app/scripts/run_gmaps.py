@@ -1,9 +1,21 @@
 import argparse, json
-from app.scrapers.gmaps import scrape_gmaps
+from app.scrapers.gmaps import iter_gmaps_reviews_sync, scrape_gmaps, scrape_gmaps_many
 
 ap = argparse.ArgumentParser()
-ap.add_argument("--q", required=True)
+ap.add_argument("--q", required=True, action="append", help="repetible: varias consultas en un solo navegador")
 ap.add_argument("--mock", action="store_true")
+ap.add_argument("--full", action="store_true", help="carga la página completa (sin modo lean), para comparar")
+ap.add_argument("--tabs", type=int, default=4, help="pestañas simultáneas con varias --q")
+ap.add_argument("--reviews", type=int, default=0, help="además, emite hasta N reseñas por consulta (NDJSON)")
 args = ap.parse_args()
 
-print(json.dumps(scrape_gmaps(args.q, mock=args.mock), ensure_ascii=False))
\ No newline at end of file
+lean = not args.full
+if len(args.q) == 1:
+    print(json.dumps(scrape_gmaps(args.q[0], mock=args.mock, lean=lean), ensure_ascii=False))
+else:
+    for res in scrape_gmaps_many(args.q, tabs=args.tabs, mock=args.mock, lean=lean):
+        print(json.dumps(res, ensure_ascii=False))
+if args.reviews and not args.mock:
+    for q in args.q:
+        for review in iter_gmaps_reviews_sync(q, max_reviews=args.reviews, lean=lean):
+            print(json.dumps({"query": q, **review}, ensure_ascii=False))
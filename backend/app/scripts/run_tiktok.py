@@ -1,9 +1,26 @@
 import argparse, json
+from pathlib import Path
 from app.scrapers.tiktok import scrape_tiktok
+from app.scrapers.tiktok_capture import replay_fixtures
 
 ap = argparse.ArgumentParser()
 ap.add_argument("--user", required=True)
 ap.add_argument("--mock", action="store_true")
+ap.add_argument("--full", action="store_true", help="carga la página completa (sin modo lean), para comparar")
+ap.add_argument("--video-limit", type=int, default=10)
+ap.add_argument("--comments-per-video", type=int, default=5)
+ap.add_argument("--comment-pages", type=int, default=3)
+ap.add_argument("--record", type=Path, help="guarda cada respuesta JSON capturada en este directorio")
+ap.add_argument("--fixtures", type=Path, help="reproduce respuestas grabadas (sin navegador)")
 args = ap.parse_args()
 
-print(json.dumps(scrape_tiktok(args.user, mock=args.mock), ensure_ascii=False))
\ No newline at end of file
+limits = dict(
+    video_limit=args.video_limit,
+    comments_per_video=args.comments_per_video,
+    comment_pages=args.comment_pages,
+)
+if args.fixtures:
+    out = replay_fixtures(args.fixtures, args.user, **limits)
+else:
+    out = scrape_tiktok(args.user, mock=args.mock, lean=not args.full, record_dir=args.record, **limits)
+print(json.dumps(out, ensure_ascii=False))
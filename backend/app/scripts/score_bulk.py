@@ -0,0 +1,268 @@
+"""
+Scoring masivo offline de una cartera (CSV o Parquet con RUC, TikTok y consulta de Maps).
+
+Reparte la entrada en bloques de `--chunk` filas entre `--workers` procesos; cada
+proceso orquesta su bloque con `orchestrate_batch_async` (fusión vectorizada) y lo
+registra en el historial. La salida se escribe a medida que terminan los bloques:
+
+- `.jsonl`: un archivo; `<out>.ckpt` anota cada bloque terminado con el tamaño del
+  archivo en ese momento. Al reanudar se trunca lo escrito después del último bloque
+  anotado y se saltan los ya hechos.
+- directorio o `.parquet` (requiere pyarrow): una parte `part-NNNNN.parquet` por bloque;
+  las partes existentes cuentan como hechas.
+
+    python -m app.scripts.score_bulk cartera.csv --out scores.jsonl --workers 4
+    python -m app.scripts.score_bulk cartera.parquet --out scores/ --run-scrapers --deadline-ms 30000
+    python -m app.scripts.score_bulk cartera.csv --out scores.jsonl --resume     # tras una caída
+
+Columnas reconocidas: ruc; tiktok/tiktok_handle/username; gmaps/maps/maps_query/query.
+"""
+from __future__ import annotations
+import argparse, csv, importlib.util, json, multiprocessing, os, sys, time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+_PYARROW_OK = importlib.util.find_spec("pyarrow") is not None
+
+COLUMNS = {
+    "ruc": "ruc", "numero_ruc": "ruc",
+    "tiktok": "tiktok", "tiktok_handle": "tiktok", "username": "tiktok",
+    "gmaps": "gmaps", "maps": "gmaps", "maps_query": "gmaps", "query": "gmaps",
+}
+
+
+# ---- entrada ----
+def _norm_row(row: Dict[str, Any]) -> Optional[Dict[str, str]]:
+    out = {"ruc": "", "tiktok": "", "gmaps": ""}
+    for k, v in row.items():
+        field = COLUMNS.get(str(k).strip().lower())
+        if field and v is not None:
+            out[field] = str(v).strip().lstrip("@") if field == "tiktok" else str(v).strip()
+    return out if out["ruc"] else None
+
+
+def read_rows(path: Path, batch: int = 10_000) -> Iterator[Dict[str, str]]:
+    """Filas normalizadas de un CSV o Parquet, en streaming (sin cargar el archivo entero)."""
+    if path.suffix.lower() == ".parquet":
+        if not _PYARROW_OK:
+            raise SystemExit("leer Parquet requiere pyarrow (pip install pyarrow)")
+        import pyarrow.parquet as pq
+        pf = pq.ParquetFile(path)
+        cols = [c for c in pf.schema_arrow.names if c.strip().lower() in COLUMNS]
+        for rb in pf.iter_batches(batch_size=batch, columns=cols):
+            for row in rb.to_pylist():
+                r = _norm_row(row)
+                if r:
+                    yield r
+        return
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t") if sample else csv.excel
+        for row in csv.DictReader(f, dialect=dialect):
+            r = _norm_row(row)
+            if r:
+                yield r
+
+
+def chunks(rows: Iterator[Dict[str, str]], size: int) -> Iterator[Tuple[int, List[Dict[str, str]]]]:
+    buf: List[Dict[str, str]] = []
+    idx = 0
+    for r in rows:
+        buf.append(r)
+        if len(buf) >= size:
+            yield idx, buf
+            idx, buf = idx + 1, []
+    if buf:
+        yield idx, buf
+
+
+# ---- trabajo de cada proceso ----
+def _score_chunk(idx: int, rows: List[Dict[str, str]], opts: Dict[str, Any]) -> Tuple[int, List[Dict[str, Any]]]:
+    import asyncio
+
+    from app.pipeline import orchestrate_batch_async
+    from app.services.rate_limit import priority
+    from app.services.results_store import results_store
+
+    items = [{**r, **opts} for r in rows]
+    with priority("bulk"):  # los requests de la API pasan antes en la cola de scraping
+        results = asyncio.run(orchestrate_batch_async(items))
+    results_store.flush()
+    out = []
+    for r, res in zip(rows, results):
+        if isinstance(res, BaseException):
+            out.append({"ruc": r["ruc"], "error": f"{type(res).__name__}: {res}"})
+        else:
+            res = dict(res)
+            res["generated_at"] = res.pop("_generated_at", None)
+            out.append(res)
+    return idx, out
+
+
+# ---- salida ----
+class JsonlSink:
+    def __init__(self, path: Path, resume: bool, chunk: int):
+        self.path = path
+        self.chunk = chunk
+        self.ckpt = path.with_name(path.name + ".ckpt")
+        self.done: Set[int] = set()
+        offset = 0
+        valid: List[str] = []
+        if resume and self.ckpt.exists():
+            for line in self.ckpt.read_text(encoding="utf-8").splitlines():
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    break  # última línea a medio escribir
+                if rec["size"] != chunk:
+                    raise SystemExit(f"el checkpoint usa --chunk {rec['size']}; reanuda con el mismo valor")
+                self.done.add(rec["chunk"])
+                offset = rec["offset"]
+                valid.append(line + "\n")
+        self.ckpt.write_text("".join(valid), encoding="utf-8")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = open(path, "ab" if resume else "wb")
+        self._f.truncate(offset)  # descarta lo escrito después del último bloque anotado
+        self._f.seek(offset)
+        self._ck = open(self.ckpt, "a", encoding="utf-8")
+
+    def write(self, idx: int, rows: List[Dict[str, Any]]) -> None:
+        self._f.write(b"".join(json.dumps(r, ensure_ascii=False).encode("utf-8") + b"\n" for r in rows))
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._ck.write(json.dumps({"chunk": idx, "size": self.chunk, "rows": len(rows), "offset": self._f.tell()}) + "\n")
+        self._ck.flush()
+
+    def close(self) -> None:
+        self._f.close()
+        self._ck.close()
+
+
+class ParquetSink:
+    def __init__(self, path: Path, resume: bool, chunk: int):
+        if not _PYARROW_OK:
+            raise SystemExit("escribir Parquet requiere pyarrow (pip install pyarrow)")
+        self.dir = path.with_suffix("") if path.suffix.lower() == ".parquet" else path
+        self.dir.mkdir(parents=True, exist_ok=True)
+        parts = sorted(self.dir.glob("part-*.parquet"))
+        if parts and not resume:
+            raise SystemExit(f"{self.dir} ya tiene partes; usa --resume o borra el directorio")
+        meta = self.dir / "_chunk"
+        # sin `_chunk` (partes de una versión previa o borrado a mano) no hay con qué comparar
+        if parts and meta.exists() and int(meta.read_text()) != chunk:
+            raise SystemExit(f"las partes usan --chunk {meta.read_text()}; reanuda con el mismo valor")
+        meta.write_text(str(chunk))
+        self.done = {int(p.stem.split("-")[1]) for p in parts}
+
+    def write(self, idx: int, rows: List[Dict[str, Any]]) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        flat = []
+        for r in rows:
+            cs = r.get("component_scores") or {}
+            flat.append({
+                "ruc": r.get("ruc"), "final_score": r.get("final_score"), "risk_label": r.get("risk_label"),
+                "fin": cs.get("fin"), "maps": cs.get("maps"), "tt": cs.get("tt"),
+                "timed_out": ",".join(r.get("timed_out") or []), "skipped": ",".join(r.get("skipped") or []),
+                "error": r.get("error"), "generated_at": r.get("generated_at"),
+            })
+        table = pa.Table.from_pylist(flat, schema=pa.schema([
+            ("ruc", pa.string()), ("final_score", pa.float64()), ("risk_label", pa.string()),
+            ("fin", pa.float64()), ("maps", pa.float64()), ("tt", pa.float64()),
+            ("timed_out", pa.string()), ("skipped", pa.string()), ("error", pa.string()),
+            ("generated_at", pa.string()),
+        ]))
+        # escribir y renombrar: una parte existe completa o no existe
+        tmp = self.dir / f".part-{idx:05d}.parquet.tmp"
+        pq.write_table(table, tmp)
+        tmp.replace(self.dir / f"part-{idx:05d}.parquet")
+
+    def close(self) -> None:
+        pass
+
+
+def _sink(out: Path, resume: bool, chunk: int):
+    if out.suffix.lower() == ".jsonl":
+        return JsonlSink(out, resume, chunk)
+    return ParquetSink(out, resume, chunk)
+
+
+# ---- orquestación ----
+def run(
+    src: Path, out: Path, workers: int, chunk: int, opts: Dict[str, Any], resume: bool, progress_s: float = 2.0
+) -> Dict[str, Any]:
+    sink = _sink(out, resume, chunk)
+    done_before = set(sink.done)
+    rows_done = errors = skipped_chunks = 0
+    t0 = last = time.perf_counter()
+
+    def _collect(fut: Future) -> None:
+        nonlocal rows_done, errors, last
+        idx, rows = fut.result()
+        sink.write(idx, rows)
+        rows_done += len(rows)
+        errors += sum(1 for r in rows if r.get("error"))
+        now = time.perf_counter()
+        if now - last >= progress_s:
+            last = now
+            print(f"{rows_done:>10,} filas  {rows_done / (now - t0):>10,.1f} filas/s  errores={errors}", file=sys.stderr)
+
+    ctx = multiprocessing.get_context("spawn")
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as ex:
+            inflight: Set[Future] = set()
+            for idx, rows in chunks(read_rows(src), chunk):
+                if idx in done_before:
+                    skipped_chunks += 1
+                    continue
+                # cola acotada: la entrada no se carga entera en memoria
+                if len(inflight) >= workers * 2:
+                    finished, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+                    for fut in finished:
+                        _collect(fut)
+                inflight.add(ex.submit(_score_chunk, idx, rows, opts))
+            for fut in wait(inflight).done:
+                _collect(fut)
+    finally:
+        sink.close()
+
+    secs = time.perf_counter() - t0
+    return {
+        "ok": True,
+        "out": str(out),
+        "rows": rows_done,
+        "errors": errors,
+        "chunks_skipped": skipped_chunks,
+        "seconds": round(secs, 2),
+        "rows_per_s": round(rows_done / secs, 1) if secs else None,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Scoring masivo y reanudable de una cartera (CSV/Parquet)")
+    ap.add_argument("input", type=Path, help="CSV o Parquet con columnas ruc, tiktok, gmaps")
+    ap.add_argument("--out", type=Path, required=True, help=".jsonl, o .parquet/directorio (partes por bloque)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--chunk", type=int, default=200, help="filas por bloque (unidad de checkpoint)")
+    ap.add_argument("--resume", action="store_true", help="continúa una corrida previa con la misma entrada y --chunk")
+    ap.add_argument("--run-scrapers", action="store_true")
+    ap.add_argument("--mock", action="store_true")
+    ap.add_argument("--deadline-ms", type=int, default=None, help="presupuesto por fila (0 = sin límite)")
+    ap.add_argument("--video-limit", type=int, default=10)
+    args = ap.parse_args()
+
+    opts = {
+        "mock": args.mock,
+        "run_scrapers": args.run_scrapers,
+        "deadline_ms": args.deadline_ms,
+        "video_limit": args.video_limit,
+    }
+    res = run(args.input, args.out, max(1, args.workers), max(1, args.chunk), opts, args.resume)
+    print(json.dumps(res, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
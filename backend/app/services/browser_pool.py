@@ -0,0 +1,338 @@
+"""
+Pool de navegadores Playwright de larga vida, compartido por todo el proceso.
+
+Todo el trabajo con Playwright corre en un event loop dedicado (hilo de fondo):
+los objetos async de Playwright quedan atados a ese loop, así que tanto la API
+(loop de uvicorn) como los scripts síncronos le delegan las corutinas con
+`run_in_pool` / `run_in_pool_sync`.
+"""
+from __future__ import annotations
+import asyncio, importlib.util, threading, time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Dict, Iterator, List, Optional, TypeVar
+
+from loguru import logger
+from app.services.metrics import stage
+from app.config import (
+    PLAYWRIGHT_HEADLESS,
+    BROWSER_POOL_SIZE,
+    BROWSER_CONTEXT_MAX_USES,
+    BROWSER_STATE_DIR,
+    TIKTOK_STATE_PATH,
+)
+
+# Playwright se importa al arrancar el pool (los modos mock/evaluate no lo cargan)
+PLAYWRIGHT_OK = importlib.util.find_spec("playwright") is not None
+
+T = TypeVar("T")
+
+# storage_state inicial por fuente (p.ej. el tiktok_state.json del bootstrap)
+BOOTSTRAP_STATE = {"tiktok": TIKTOK_STATE_PATH}
+
+
+class _Slot:
+    """Un navegador del pool con un contexto (y una página reciclable) por fuente."""
+
+    def __init__(self, idx: int):
+        self.idx = idx
+        self.browser = None
+        self.contexts: Dict[str, Any] = {}
+        self.context_uses: Dict[str, int] = {}
+        self.pages: Dict[str, Any] = {}
+        self.busy = False
+
+
+class BrowserPool:
+    def __init__(
+        self,
+        size: int = BROWSER_POOL_SIZE,
+        context_max_uses: int = BROWSER_CONTEXT_MAX_USES,
+        headless: bool = PLAYWRIGHT_HEADLESS,
+    ):
+        self.size = max(1, size)
+        self.context_max_uses = max(1, context_max_uses)
+        self.headless = headless
+        self._pw = None
+        self._slots = [_Slot(i) for i in range(self.size)]
+        self._idle: Optional[asyncio.Queue] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+        self._counters = {
+            "acquired": 0,
+            "browser_launches": 0,
+            "browser_restarts": 0,
+            "context_recycles": 0,
+            "pages_created": 0,
+            "pages_reused": 0,
+            "page_errors": 0,
+        }
+        self._wait_total_s = 0.0
+        self._wait_max_s = 0.0
+        self._waiting = 0
+
+    @property
+    def started(self) -> bool:
+        return self._idle is not None
+
+    async def _ensure_started(self) -> None:
+        if self._idle is not None:
+            return
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._idle is not None:
+                return
+            from playwright.async_api import async_playwright
+            self._pw = await async_playwright().start()
+            idle: asyncio.Queue = asyncio.Queue()
+            for slot in self._slots:
+                idle.put_nowait(slot)
+            self._idle = idle
+            logger.info(f"Browser pool iniciado (size={self.size})")
+
+    async def _ensure_browser(self, slot: _Slot) -> None:
+        if slot.browser is not None and slot.browser.is_connected():
+            return
+        if slot.browser is not None:
+            logger.warning(f"Navegador #{slot.idx} caído; relanzando")
+            self._counters["browser_restarts"] += 1
+        slot.contexts.clear()
+        slot.context_uses.clear()
+        slot.pages.clear()
+        with stage("browser.launch"):
+            slot.browser = await self._pw.chromium.launch(headless=self.headless)
+        self._counters["browser_launches"] += 1
+
+    def _state_path(self, source: str) -> Path:
+        return BROWSER_STATE_DIR / f"{source}.json"
+
+    async def _close_context(self, slot: _Slot, source: str) -> None:
+        ctx = slot.contexts.pop(source, None)
+        slot.context_uses.pop(source, None)
+        slot.pages.pop(source, None)
+        if ctx is None:
+            return
+        try:
+            # persistimos cookies/consentimientos para el próximo contexto
+            BROWSER_STATE_DIR.mkdir(parents=True, exist_ok=True)
+            await ctx.storage_state(path=str(self._state_path(source)))
+        except Exception as e:
+            logger.debug(f"No se pudo guardar storage_state de {source}: {e}")
+        try:
+            await ctx.close()
+        except Exception:
+            pass
+
+    async def _ensure_context(self, slot: _Slot, source: str):
+        ctx = slot.contexts.get(source)
+        if ctx is not None and slot.context_uses.get(source, 0) >= self.context_max_uses:
+            await self._close_context(slot, source)
+            self._counters["context_recycles"] += 1
+            ctx = None
+        if ctx is None:
+            kwargs: Dict[str, Any] = {}
+            for state in (self._state_path(source), BOOTSTRAP_STATE.get(source)):
+                if state and Path(state).exists():
+                    kwargs["storage_state"] = str(state)
+                    break
+            with stage("browser.context"):
+                ctx = await slot.browser.new_context(**kwargs)
+            slot.contexts[source] = ctx
+            slot.context_uses[source] = 0
+        slot.context_uses[source] += 1
+        return ctx
+
+    async def _acquire(self) -> _Slot:
+        await self._ensure_started()
+        t0 = time.perf_counter()
+        self._waiting += 1
+        try:
+            with stage("browser.acquire"):
+                slot: _Slot = await self._idle.get()
+        finally:
+            self._waiting -= 1
+        waited = time.perf_counter() - t0
+        self._wait_total_s += waited
+        self._wait_max_s = max(self._wait_max_s, waited)
+        self._counters["acquired"] += 1
+        slot.busy = True
+        return slot
+
+    def _release(self, slot: _Slot) -> None:
+        slot.busy = False
+        self._idle.put_nowait(slot)
+
+    async def _return_page(self, slot: _Slot, source: str, page, ok: bool) -> None:
+        """Recicla la página como la de `source` del slot, o la cierra si quedó dudosa."""
+        if page is None or page.is_closed():
+            return
+        if ok and source not in slot.pages:
+            try:
+                await page.goto("about:blank")
+                slot.pages[source] = page
+                return
+            except Exception:
+                ok = False
+        if not ok:
+            # página en estado desconocido: no se recicla
+            self._counters["page_errors"] += 1
+        try:
+            await page.close()
+        except Exception:
+            pass
+
+    @asynccontextmanager
+    async def page(self, source: str) -> AsyncIterator[Any]:
+        """Presta una página del contexto de `source`; se recicla al devolverla."""
+        slot = await self._acquire()
+        page = None
+        ok = False
+        try:
+            await self._ensure_browser(slot)
+            ctx = await self._ensure_context(slot, source)
+            page = slot.pages.pop(source, None)
+            if page is None or page.is_closed():
+                page = await ctx.new_page()
+                self._counters["pages_created"] += 1
+            else:
+                self._counters["pages_reused"] += 1
+            yield page
+            ok = True
+        finally:
+            await self._return_page(slot, source, page, ok)
+            self._release(slot)
+
+    @asynccontextmanager
+    async def session(self, source: str, tabs: int) -> AsyncIterator[List[Any]]:
+        """
+        Presta un navegador con `tabs` pestañas del contexto de `source` (lotes de
+        consultas). Al devolverlo se recicla una pestaña y se cierran las demás.
+        """
+        slot = await self._acquire()
+        pages: List[Any] = []
+        ok = False
+        try:
+            await self._ensure_browser(slot)
+            ctx = await self._ensure_context(slot, source)
+            reused = slot.pages.pop(source, None)
+            if reused is not None and not reused.is_closed():
+                pages.append(reused)
+                self._counters["pages_reused"] += 1
+            while len(pages) < max(1, tabs):
+                pages.append(await ctx.new_page())
+                self._counters["pages_created"] += 1
+            yield pages
+            ok = True
+        finally:
+            for p in pages:
+                await self._return_page(slot, source, p, ok)
+            self._release(slot)
+
+    async def close(self) -> None:
+        for slot in self._slots:
+            for source in list(slot.contexts):
+                await self._close_context(slot, source)
+            if slot.browser is not None:
+                try:
+                    await slot.browser.close()
+                except Exception:
+                    pass
+                slot.browser = None
+        if self._pw is not None:
+            await self._pw.stop()
+            self._pw = None
+        self._idle = None
+
+    def stats(self) -> Dict[str, Any]:
+        acquired = self._counters["acquired"]
+        return {
+            "size": self.size,
+            "started": self.started,
+            "in_use": sum(1 for s in self._slots if s.busy),
+            "waiting": self._waiting,
+            "browsers_alive": sum(
+                1 for s in self._slots if s.browser is not None and s.browser.is_connected()
+            ),
+            "context_max_uses": self.context_max_uses,
+            "context_uses": {
+                str(s.idx): dict(s.context_uses) for s in self._slots if s.context_uses
+            },
+            **self._counters,
+            "wait_avg_ms": round(1000 * self._wait_total_s / acquired, 2) if acquired else 0.0,
+            "wait_max_ms": round(1000 * self._wait_max_s, 2),
+        }
+
+
+# ---- loop dedicado + singleton ----
+_pool: Optional[BrowserPool] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="browser-pool", daemon=True).start()
+    return _loop
+
+
+def get_pool() -> BrowserPool:
+    global _pool
+    if _pool is None:
+        _pool = BrowserPool()
+    return _pool
+
+
+async def run_in_pool(coro: Awaitable[T]) -> T:
+    """Ejecuta `coro` en el loop del pool y la espera desde el loop actual."""
+    loop = get_loop()
+    try:
+        current = asyncio.get_running_loop()
+    except RuntimeError:
+        current = None
+    if current is loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+
+def run_in_pool_sync(coro: Awaitable[T]) -> T:
+    """Igual que `run_in_pool`, para código síncrono (scripts/CLI)."""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop()).result()
+
+
+async def iterate_in_pool(agen: AsyncIterator[T]) -> AsyncIterator[T]:
+    """Consume, desde cualquier loop, un generador async que vive en el loop del pool."""
+    try:
+        while True:
+            try:
+                item = await run_in_pool(agen.__anext__())
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        # consumidor que corta antes: cerramos el generador (libera la página)
+        await run_in_pool(agen.aclose())
+
+
+def iterate_in_pool_sync(agen: AsyncIterator[T]) -> Iterator[T]:
+    """Igual que `iterate_in_pool`, como generador síncrono (scripts/CLI)."""
+    try:
+        while True:
+            try:
+                item = run_in_pool_sync(agen.__anext__())
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        run_in_pool_sync(agen.aclose())
+
+
+async def close_pool() -> None:
+    if _pool is not None and _pool.started:
+        await run_in_pool(_pool.close())
+
+
+def pool_stats() -> Dict[str, Any]:
+    return get_pool().stats()
@@ -0,0 +1,219 @@
+"""
+Caché en dos niveles (LRU en memoria + SQLite en disco) con TTL por namespace.
+
+El nivel en memoria está acotado (`max_items`) y el de disco sobrevive reinicios.
+Los valores se guardan como JSON, así que deben ser serializables. La memoria
+también guarda el texto JSON y cada lectura lo decodifica: el que llama recibe su
+propia copia (puede modificarla sin tocar la caché) y ambos niveles devuelven lo mismo.
+
+Las entradas vencidas se borran del disco al escribir, como mucho una vez cada
+`purge_interval` segundos (la primera escritura tras arrancar ya purga).
+"""
+from __future__ import annotations
+import json, re, sqlite3, threading, time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from loguru import logger
+
+from app.config import CACHE_DIR, CACHE_MAX_ITEMS, CACHE_PURGE_INTERVAL_S, CACHE_TTL_GMAPS, CACHE_TTL_TIKTOK
+
+
+def normalize_key(s: str) -> str:
+    """'  @Nike  Miraflores ' → 'nike miraflores'."""
+    s = re.sub(r"\s+", " ", (s or "").strip().lower())
+    return s.lstrip("@")
+
+
+class TieredCache:
+    def __init__(
+        self,
+        db_path: Path,
+        ttls: Dict[str, float],
+        max_items: int = CACHE_MAX_ITEMS,
+        purge_interval: float = CACHE_PURGE_INTERVAL_S,
+    ):
+        self.db_path = Path(db_path)
+        self.ttls = dict(ttls)
+        self.max_items = max(1, max_items)
+        self.purge_interval = purge_interval
+        self._last_purge = 0.0
+        self.purged = 0
+        self._mem: "OrderedDict[Tuple[str, str], Tuple[float, str]]" = OrderedDict()  # (vence, JSON)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    # ---- disco ----
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " ns TEXT NOT NULL, k TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL NOT NULL,"
+                " PRIMARY KEY (ns, k))"
+            )
+            self._local.conn = conn
+        return conn
+
+    def _bump(self, ns: str, counter: str, n: int = 1) -> None:
+        st = self._stats.setdefault(
+            ns, {"mem_hits": 0, "disk_hits": 0, "misses": 0, "expired": 0, "sets": 0, "evictions": 0}
+        )
+        st[counter] += n
+
+    def _mem_put(self, ns: str, key: str, expires_at: float, value_json: str) -> None:
+        # se llama con self._lock tomado
+        self._mem[(ns, key)] = (expires_at, value_json)
+        self._mem.move_to_end((ns, key))
+        while len(self._mem) > self.max_items:
+            (old_ns, _), _ = self._mem.popitem(last=False)
+            self._bump(old_ns, "evictions")
+
+    # ---- API ----
+    def get(self, ns: str, key: str, default: Any = None) -> Any:
+        now = time.time()
+        with self._lock:
+            item = self._mem.get((ns, key))
+            if item is not None:
+                expires_at, value_json = item
+                if expires_at > now:
+                    self._mem.move_to_end((ns, key))
+                    self._bump(ns, "mem_hits")
+                    return json.loads(value_json)
+                del self._mem[(ns, key)]
+
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM entries WHERE ns = ? AND k = ?", (ns, key)
+        ).fetchone()
+        with self._lock:
+            if row is None:
+                self._bump(ns, "misses")
+                return default
+            value_json, expires_at = row
+            if expires_at <= now:
+                self._bump(ns, "expired")
+                self._bump(ns, "misses")
+                return default
+            self._mem_put(ns, key, expires_at, value_json)
+            self._bump(ns, "disk_hits")
+        return json.loads(value_json)
+
+    def set(self, ns: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttls.get(ns, 3600) if ttl is None else ttl
+        expires_at = time.time() + ttl
+        value_json = json.dumps(value, ensure_ascii=False)
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (ns, k, value, expires_at) VALUES (?, ?, ?, ?)",
+                (ns, key, value_json, expires_at),
+            )
+        with self._lock:
+            self._mem_put(ns, key, expires_at, value_json)
+            self._bump(ns, "sets")
+        self._maybe_purge()
+
+    def get_many(self, ns: str, keys: Iterable[str]) -> Dict[str, Any]:
+        """Como `get` para muchas claves (una consulta por cada 900); solo devuelve los aciertos."""
+        now = time.time()
+        out: Dict[str, Any] = {}
+        pending = []
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                item = self._mem.get((ns, key))
+                if item is not None and item[0] > now:
+                    self._mem.move_to_end((ns, key))
+                    self._bump(ns, "mem_hits")
+                    out[key] = json.loads(item[1])
+                else:
+                    pending.append(key)
+
+        conn = self._conn()
+        rows = []
+        for i in range(0, len(pending), 900):
+            part = pending[i:i + 900]
+            rows.extend(conn.execute(
+                f"SELECT k, value, expires_at FROM entries WHERE ns = ? AND k IN ({','.join('?' * len(part))})",
+                [ns, *part],
+            ))
+        with self._lock:
+            for key, value_json, expires_at in rows:
+                if expires_at <= now:
+                    self._bump(ns, "expired")
+                    continue
+                self._mem_put(ns, key, expires_at, value_json)
+                self._bump(ns, "disk_hits")
+                out[key] = json.loads(value_json)
+            self._bump(ns, "misses", sum(1 for k in pending if k not in out))
+        return out
+
+    def set_many(self, ns: str, items: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        """Como `set` para muchas claves, en una sola transacción."""
+        if not items:
+            return
+        ttl = self.ttls.get(ns, 3600) if ttl is None else ttl
+        expires_at = time.time() + ttl
+        rows = [(ns, k, json.dumps(v, ensure_ascii=False), expires_at) for k, v in items.items()]
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO entries (ns, k, value, expires_at) VALUES (?, ?, ?, ?)", rows
+            )
+        with self._lock:
+            for _, k, value_json, _ in rows:
+                self._mem_put(ns, k, expires_at, value_json)
+            self._bump(ns, "sets", len(items))
+        self._maybe_purge()
+
+    def purge_expired(self) -> int:
+        """Borra del disco (y de la memoria) las entradas vencidas; devuelve cuántas borró."""
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            cur = conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+        with self._lock:
+            for k in [k for k, (expires_at, _) in self._mem.items() if expires_at <= now]:
+                del self._mem[k]
+            self.purged += cur.rowcount
+        return cur.rowcount
+
+    def _maybe_purge(self) -> None:
+        with self._lock:
+            now = time.time()
+            if self.purge_interval <= 0 or now - self._last_purge < self.purge_interval:
+                return
+            self._last_purge = now
+        try:
+            n = self.purge_expired()
+        except sqlite3.Error as e:
+            logger.warning(f"[cache] no se pudieron purgar vencidos de {self.db_path.name}: {e}")
+            return
+        if n:
+            logger.info(f"[cache] {self.db_path.name}: {n} entradas vencidas borradas")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            per_ns = {}
+            for ns, st in self._stats.items():
+                hits = st["mem_hits"] + st["disk_hits"]
+                total = hits + st["misses"]
+                per_ns[ns] = {**st, "hit_ratio": round(hits / total, 4) if total else 0.0}
+            return {
+                "mem_items": len(self._mem),
+                "max_items": self.max_items,
+                "ttls": self.ttls,
+                "purged": self.purged,
+                "namespaces": per_ns,
+            }
+
+
+scrape_cache = TieredCache(
+    CACHE_DIR / "scrapes.sqlite",
+    ttls={"gmaps": CACHE_TTL_GMAPS, "tiktok": CACHE_TTL_TIKTOK},
+)
@@ -0,0 +1,86 @@
+"""
+Circuit breaker por fuente de scraping.
+
+Tras `CIRCUIT_FAILURES` fallos seguidos la fuente queda abierta: las orquestaciones
+la saltan (componente ausente, `skipped`) en lugar de gastar su presupuesto en ella.
+Pasados `CIRCUIT_RESET_S` se deja pasar un intento de prueba: si sale bien se
+cierra, si falla vuelve a abrirse. El estado es por proceso.
+"""
+from __future__ import annotations
+import threading, time
+from typing import Any, Dict
+
+from loguru import logger
+
+from app.config import CIRCUIT_FAILURES, CIRCUIT_RESET_S
+from app.services.metrics import CIRCUIT_OPEN
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failures: int = CIRCUIT_FAILURES, reset_s: float = CIRCUIT_RESET_S):
+        self.name = name
+        self.max_failures = max(1, failures)
+        self.reset_s = reset_s
+        self.state = "closed"  # closed | open | half_open
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """¿Se puede intentar la fuente ahora? En half_open deja pasar un intento por ventana."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_s:
+                # prueba: si no vuelve (p.ej. cancelada), otra ventana después
+                self.state = "half_open"
+                self.opened_at = time.monotonic()
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != "closed":
+                logger.info(f"Circuito {self.name} cerrado")
+            self.state = "closed"
+            self.failures = 0
+        CIRCUIT_OPEN.set(0, source=self.name)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.max_failures:
+                if self.state != "open":
+                    self.trips += 1
+                    logger.warning(f"Circuito {self.name} abierto tras {self.failures} fallos")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+        if self.state == "open":
+            CIRCUIT_OPEN.set(1, source=self.name)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker(source: str) -> CircuitBreaker:
+    b = _breakers.get(source)
+    if b is None:
+        with _breakers_lock:
+            b = _breakers.setdefault(source, CircuitBreaker(source))
+    return b
+
+
+def circuit_stats() -> Dict[str, Any]:
+    return {name: b.stats() for name, b in _breakers.items()}
@@ -0,0 +1,88 @@
+"""
+Presupuesto de tiempo de punta a punta para una orquestación.
+
+`within(segundos)` fija la hora límite en un ContextVar. La heredan las corutinas
+que se mandan al loop del pool con `run_in_pool` (y los hilos de `asyncio.to_thread`),
+así que cada paso de scraping y cada llamada al LLM acota sus esperas con
+`timeout_ms(...)` / `timeout_s(...)` sin que el dato pase por cada firma.
+
+Una ejecución compartida por varios llamadores (single-flight) corre con un
+`SharedDeadline`: el presupuesto más largo de los que la esperan.
+"""
+from __future__ import annotations
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional, Union
+
+# nunca 0: en Playwright timeout=0 significa "sin límite"
+MIN_TIMEOUT_S = 0.05
+
+_deadline: ContextVar[Union[None, float, "SharedDeadline"]] = ContextVar("deadline", default=None)
+
+
+def _at() -> Optional[float]:
+    d = _deadline.get()
+    return d.at if isinstance(d, SharedDeadline) else d
+
+
+class SharedDeadline:
+    """
+    Hora límite de una ejecución que esperan varios llamadores: arranca con la del
+    contexto que la crea y `join()` la alarga hasta la del contexto de cada uno que se
+    engancha (None = sin límite). Quien lee el presupuesto dentro de `applied()` ve
+    siempre el valor actual; un `within` anidado lo fija en ese momento.
+    """
+
+    def __init__(self) -> None:
+        self.at = _at()
+
+    def join(self) -> None:
+        if self.at is not None:
+            at = _at()
+            self.at = None if at is None else max(self.at, at)
+
+    @contextmanager
+    def applied(self) -> Iterator[None]:
+        token = _deadline.set(self)
+        try:
+            yield
+        finally:
+            _deadline.reset(token)
+
+
+@contextmanager
+def within(seconds: Optional[float]) -> Iterator[None]:
+    """Acota lo que corra dentro a `seconds` (None/<=0: sin límite). Anidado, gana el más corto."""
+    if seconds is None or seconds <= 0:
+        yield
+        return
+    at = time.monotonic() + seconds
+    current = _at()
+    token = _deadline.set(at if current is None else min(current, at))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Segundos que quedan (None si no hay presupuesto)."""
+    at = _at()
+    return None if at is None else at - time.monotonic()
+
+
+def expired() -> bool:
+    r = remaining()
+    return r is not None and r <= 0
+
+
+def timeout_s(default: float) -> float:
+    """`default` recortado a lo que queda del presupuesto."""
+    r = remaining()
+    return default if r is None else max(MIN_TIMEOUT_S, min(default, r))
+
+
+def timeout_ms(default_s: float) -> float:
+    """Igual que `timeout_s`, en milisegundos (timeouts de Playwright)."""
+    return 1000 * timeout_s(default_s)
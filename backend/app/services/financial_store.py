@@ -0,0 +1,295 @@
+"""
+Almacén local de datos financieros (exportaciones tipo SuperCías) indexado por RUC.
+
+SQLite en modo WAL: la ingesta escribe por lotes en transacciones cortas y los
+lectores (la API) nunca quedan bloqueados. Re-ingestar un año nuevo es
+incremental: solo reemplaza filas cuyo `anio` sea igual o más reciente.
+"""
+from __future__ import annotations
+import codecs, re, sqlite3, threading, unicodedata
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, Optional, Set
+
+from loguru import logger
+
+from app.config import FINANCIAL_DB_PATH
+
+if TYPE_CHECKING:  # pandas solo hace falta para ingestar
+    import pandas as pd
+
+# columnas de FinancialData (sin `ruc`) + año del ejercicio
+NUMERIC_FIELDS = [
+    "activos", "expediente", "impuesto_renta", "ingresos_ventas", "n_empleados",
+    "patrimonio", "utilidad_neta", "liquidez_corriente", "deuda_total",
+    "gastos_financieros", "margen_bruto", "rent_neta_ventas", "roe", "roa",
+]
+FIELDS = ["ruc", "nombre", "anio"] + NUMERIC_FIELDS
+
+# encabezados habituales de los rankings/exportaciones (ya normalizados) → campo
+ALIASES = {
+    "ruc": "ruc", "numero_ruc": "ruc",
+    "nombre": "nombre", "razon_social": "nombre", "nombre_compania": "nombre", "compania": "nombre",
+    "anio": "anio", "ano": "anio", "year": "anio", "periodo": "anio",
+    "expediente": "expediente",
+    "activo": "activos", "activos": "activos", "activo_total": "activos",
+    "patrimonio": "patrimonio", "patrimonio_total": "patrimonio",
+    "ingresos_por_venta": "ingresos_ventas", "ingresos_por_ventas": "ingresos_ventas",
+    "ingresos_ventas": "ingresos_ventas", "ventas": "ingresos_ventas",
+    "utilidad_neta": "utilidad_neta", "utilidad_del_ejercicio": "utilidad_neta",
+    "impuesto_a_la_renta": "impuesto_renta", "impuesto_renta": "impuesto_renta",
+    "n_de_empleados": "n_empleados", "no_de_empleados": "n_empleados",
+    "numero_de_empleados": "n_empleados", "n_empleados": "n_empleados", "empleados": "n_empleados",
+    "liquidez_corriente": "liquidez_corriente",
+    "deuda_total": "deuda_total", "pasivo_total": "deuda_total", "pasivo": "deuda_total",
+    "gastos_financieros": "gastos_financieros",
+    "margen_bruto": "margen_bruto",
+    "rentabilidad_neta_de_las_ventas": "rent_neta_ventas", "rentabilidad_neta_ventas": "rent_neta_ventas",
+    "rent_neta_ventas": "rent_neta_ventas",
+    "roe": "roe", "roa": "roa",
+}
+
+_local = threading.local()
+_write_lock = threading.Lock()
+
+
+def _norm_header(s: str) -> str:
+    s = unicodedata.normalize("NFKD", str(s)).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]+", "_", s.lower()).strip("_")
+
+
+def normalize_ruc(x: Any) -> Optional[str]:
+    """Solo dígitos; repone ceros a la izquierda que Excel/CSV suelen perder."""
+    digits = re.sub(r"\D", "", str(x or "").split(".")[0])
+    if not digits:
+        return None
+    return digits.zfill(13) if 10 < len(digits) < 13 else digits
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    cols = ", ".join(f"{f} REAL" for f in NUMERIC_FIELDS)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS financials ("
+        f" ruc TEXT PRIMARY KEY, nombre TEXT, anio INTEGER, {cols}, updated_at TEXT"
+        ") WITHOUT ROWID"
+    )
+    return conn
+
+
+def _reader(path: Path = FINANCIAL_DB_PATH) -> Optional[sqlite3.Connection]:
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(path)
+    if conn is None:
+        if not path.exists():
+            return None
+        conn = conns[path] = _connect(path)
+        conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+    d = dict(row)
+    d.pop("updated_at", None)
+    if d.get("n_empleados") is not None:
+        d["n_empleados"] = int(d["n_empleados"])
+    return d
+
+
+def get_financials(ruc: str, path: Path = FINANCIAL_DB_PATH) -> Optional[Dict[str, Any]]:
+    """FinancialData (como dict) del último ejercicio ingerido para `ruc`, o None."""
+    key = normalize_ruc(ruc)
+    conn = _reader(path)
+    if conn is None or key is None:
+        return None
+    row = conn.execute("SELECT * FROM financials WHERE ruc = ?", (key,)).fetchone()
+    return _row_to_dict(row) if row else None
+
+
+def get_many(rucs: Iterable[str], path: Path = FINANCIAL_DB_PATH) -> Dict[str, Dict[str, Any]]:
+    """Lookup por lotes: {ruc_normalizado: FinancialData} para los RUC encontrados."""
+    keys = sorted({k for k in (normalize_ruc(r) for r in rucs) if k})
+    conn = _reader(path)
+    if conn is None or not keys:
+        return {}
+    out: Dict[str, Dict[str, Any]] = {}
+    for i in range(0, len(keys), 900):  # límite de parámetros de SQLite
+        part = keys[i:i + 900]
+        q = f"SELECT * FROM financials WHERE ruc IN ({','.join('?' * len(part))})"
+        for row in conn.execute(q, part):
+            out[row["ruc"]] = _row_to_dict(row)
+    return out
+
+
+# ---- ingesta ----
+_SEPARATORS = (";", ",", "\t", "|")
+_SNIFF_BYTES = 1 << 16
+
+
+def _sniff_encoding(path: Path) -> str:
+    """utf-8 (con o sin BOM) si el comienzo del archivo lo es; si no, latin-1 (exportaciones viejas)."""
+    with open(path, "rb") as f:
+        head = f.read(_SNIFF_BYTES)
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+    except UnicodeDecodeError:
+        return "latin-1"
+    return "utf-8-sig"
+
+
+def _sniff_sep(path: Path, encoding: str = "utf-8-sig") -> str:
+    """Separador del CSV según el encabezado (`;` en las exportaciones es-EC, donde la coma es decimal)."""
+    with open(path, encoding=encoding, errors="replace") as f:
+        header = f.readline()
+    counts = {sep: header.count(sep) for sep in _SEPARATORS}
+    best = max(_SEPARATORS, key=counts.__getitem__)
+    return best if counts[best] else ","
+
+
+def _csv_options(path: Path) -> Optional[Dict[str, str]]:
+    """Separador y codificación explícitos para `read_csv` (None si es Excel)."""
+    if path.suffix.lower() in (".xlsx", ".xls"):
+        return None
+    encoding = _sniff_encoding(path)
+    return {"sep": _sniff_sep(path, encoding), "encoding": encoding}
+
+
+def _field_name(header: str) -> str:
+    h = _norm_header(header)
+    return ALIASES.get(h, h)
+
+
+def _read_chunks(path: Path, chunksize: int, csv: Optional[Dict[str, str]], **kw) -> Iterator[pd.DataFrame]:
+    import pandas as pd
+
+    if csv is None:
+        yield pd.read_excel(path, dtype=str, **kw)
+    else:
+        # separador explícito: el motor C de pandas (sep=None obliga al de Python, mucho más lento)
+        yield from pd.read_csv(path, dtype=str, chunksize=chunksize, **csv, **kw)
+
+
+_ES_DECIMAL_RE = r",\d{1,2}$"
+_GROUPS_RE = r"-?[1-9]\d{0,2}(?:\.\d{3})+"
+# celdas con punto que no son de punto decimal: solo miles, o con coma decimal al final
+_DOT_NOT_DECIMAL_RE = rf"{_GROUPS_RE}|.*{_ES_DECIMAL_RE}"
+
+
+def _uses_dot_decimal(col: pd.Series) -> bool:
+    """True si alguna celda tiene punto decimal ("0.125", "1.5"), no de miles ni es-EC."""
+    s = col.dropna().astype(str).str.strip()
+    s = s[s.str.contains(".", regex=False)]
+    return bool((~s.str.fullmatch(_DOT_NOT_DECIMAL_RE)).any())
+
+
+def _dot_decimal_fields(path: Path, chunksize: int, csv: Optional[Dict[str, str]]) -> Optional[Set[str]]:
+    """
+    Campos numéricos del archivo que usan punto decimal, decidido una vez por archivo y
+    columna (una pasada previa solo sobre esas columnas), para que "1.234" se lea igual
+    en todos los lotes. None para Excel: se lee en un solo lote y se decide ahí.
+    """
+    if csv is None:
+        return None
+    found: Set[str] = set()
+    for chunk in _read_chunks(path, chunksize, csv, usecols=lambda h: _field_name(h) in NUMERIC_FIELDS):
+        chunk = chunk.rename(columns=_field_name)
+        chunk = chunk.loc[:, ~chunk.columns.duplicated()]  # como `_prepare`: cuenta la primera
+        for f in chunk.columns:
+            if f not in found and _uses_dot_decimal(chunk[f]):
+                found.add(f)
+    return found
+
+
+def _to_number(col: pd.Series, dot_decimal: Optional[bool] = None) -> pd.Series:
+    """
+    Texto → número, admitiendo "1.234,56" (es-EC), "1,234.56" y "1234.56". Un número
+    con solo grupos de miles con punto ("1.234", "1.234.567") es es-EC, salvo que la
+    columna use punto decimal (`dot_decimal`; si no se indica, se mira `col`): ahí
+    "1.234" es 1.234 y solo "1.234.567" (varios puntos) se lee como miles.
+    """
+    import pandas as pd
+
+    s = col.astype(str).str.strip()
+    if dot_decimal is None:
+        dot_decimal = _uses_dot_decimal(col)
+    es_decimal = s.str.contains(_ES_DECIMAL_RE, regex=True, na=False)
+    groups = s.str.fullmatch(_GROUPS_RE, na=False)
+    if dot_decimal:
+        thousands = groups & (s.str.count(r"\.") > 1)
+    else:
+        thousands = groups
+    es = es_decimal | thousands
+    s = s.where(~es, s.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    return pd.to_numeric(s.str.replace(",", "", regex=False), errors="coerce")
+
+
+def _prepare(df: pd.DataFrame, year: Optional[int], dot_decimal: Optional[Set[str]] = None) -> pd.DataFrame:
+    import pandas as pd
+
+    df = df.rename(columns=_field_name)
+    df = df.loc[:, ~df.columns.duplicated()]
+    if "ruc" not in df.columns:
+        raise ValueError("El archivo no tiene columna RUC")
+    out = pd.DataFrame({"ruc": df["ruc"].map(normalize_ruc)})
+    out["nombre"] = df["nombre"] if "nombre" in df.columns else None
+    if year is not None:
+        out["anio"] = year
+    elif "anio" in df.columns:
+        out["anio"] = pd.to_numeric(df["anio"], errors="coerce")
+    else:
+        out["anio"] = None
+    for f in NUMERIC_FIELDS:
+        if f in df.columns:
+            out[f] = _to_number(df[f], None if dot_decimal is None else f in dot_decimal)
+        else:
+            out[f] = None
+    out = out.dropna(subset=["ruc"]).drop_duplicates(subset=["ruc"], keep="last")
+    return out.astype(object).where(out.notna(), None)
+
+
+def ingest_file(
+    path: Path,
+    year: Optional[int] = None,
+    db_path: Path = FINANCIAL_DB_PATH,
+    chunksize: int = 50_000,
+) -> Dict[str, Any]:
+    """Carga un CSV/Excel al almacén. Cada lote va en su propia transacción (WAL)."""
+    path = Path(path)
+    cols = ", ".join(FIELDS)
+    placeholders = ", ".join("?" * (len(FIELDS) + 1))
+    updates = ", ".join(f"{f} = excluded.{f}" for f in FIELDS[1:] + ["updated_at"])
+    sql = (
+        f"INSERT INTO financials ({cols}, updated_at) VALUES ({placeholders}) "
+        f"ON CONFLICT(ruc) DO UPDATE SET {updates} "
+        "WHERE excluded.anio IS NULL OR financials.anio IS NULL OR excluded.anio >= financials.anio"
+    )
+    stamp = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    rows_read = 0
+    written = 0
+    csv = _csv_options(path)
+    dot_decimal = _dot_decimal_fields(path, chunksize, csv)
+    with _write_lock:
+        conn = _connect(Path(db_path))
+        try:
+            for chunk in _read_chunks(path, chunksize, csv):
+                df = _prepare(chunk, year, dot_decimal)
+                rows_read += len(chunk)
+                records = [tuple(r) + (stamp,) for r in df[FIELDS].itertuples(index=False, name=None)]
+                with conn:
+                    before = conn.total_changes
+                    conn.executemany(sql, records)
+                    written += conn.total_changes - before
+                logger.info(f"Ingesta {path.name}: {rows_read} filas leídas, {written} escritas")
+        finally:
+            conn.close()
+    return {"file": str(path), "rows_read": rows_read, "rows_written": written, "db": str(db_path)}
+
+
+def count(path: Path = FINANCIAL_DB_PATH) -> int:
+    conn = _reader(path)
+    return conn.execute("SELECT COUNT(*) FROM financials").fetchone()[0] if conn else 0
@@ -0,0 +1,284 @@
+"""
+Cola de trabajos persistente (SQLite) para orquestaciones con scraping.
+
+`POST /api/jobs` encola y devuelve un id al instante; un número acotado de
+workers (JOB_WORKERS) corre los trabajos en el loop del pool de navegadores,
+así ningún hilo de request queda retenido por el scraping. La cola sobrevive
+reinicios: los trabajos `running` sin latido reciente vuelven a tomarse.
+
+Los workers hacen su I/O de SQLite en hilos (`asyncio.to_thread`): una escritura
+que espera el lock (busy timeout de 30 s) no frena a los scrapers del loop.
+"""
+from __future__ import annotations
+import asyncio, json, os, socket, sqlite3, threading, time, uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from app.config import JOBS_DB_PATH, JOB_WORKERS, JOB_TIMEOUT
+from app.services.browser_pool import get_loop, run_in_pool_sync
+from app.services.rate_limit import priority
+
+TERMINAL = ("done", "failed", "cancelled")
+HEARTBEAT_S = 5.0
+STALE_AFTER_S = 30.0
+POLL_S = 1.0
+
+
+def _dumps(x: Any) -> Optional[str]:
+    return None if x is None else json.dumps(x, ensure_ascii=False)
+
+
+def _loads(x: Optional[str]) -> Any:
+    return None if x is None else json.loads(x)
+
+
+class JobQueue:
+    def __init__(self, db_path: Path = JOBS_DB_PATH, workers: int = JOB_WORKERS, timeout: float = JOB_TIMEOUT):
+        self.db_path = Path(db_path)
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._local = threading.local()
+        self._tasks: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._started = False
+
+    # ---- SQLite ----
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, status TEXT NOT NULL, request TEXT NOT NULL,"
+                " partial TEXT, result TEXT, error TEXT, timings TEXT, worker TEXT,"
+                " created_at REAL NOT NULL, started_at REAL, finished_at REAL, heartbeat_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)")
+            self._local.conn = conn
+        return conn
+
+    def _update(self, job_id: str, **fields: Any) -> None:
+        sets = ", ".join(f"{k} = ?" for k in fields)
+        self._conn().execute(f"UPDATE jobs SET {sets} WHERE id = ?", (*fields.values(), job_id))
+
+    def _status(self, job_id: str) -> Optional[str]:
+        row = self._conn().execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row["status"] if row else None
+
+    def _execute(self, sql: str, params: tuple) -> None:
+        self._conn().execute(sql, params)
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        """Toma atómicamente el trabajo encolado más antiguo (o uno huérfano)."""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued'"
+                " OR (status = 'running' AND heartbeat_at < ?)"
+                " ORDER BY created_at LIMIT 1",
+                (now - STALE_AFTER_S,),
+            ).fetchone()
+            if row is not None:
+                if row["status"] == "running":
+                    logger.warning(f"Job {row['id']} huérfano (worker {row['worker']}); se reintenta")
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', worker = ?, started_at = ?, heartbeat_at = ?"
+                    " WHERE id = ?",
+                    (self.worker_id, now, now, row["id"]),
+                )
+            conn.execute("COMMIT")
+            return row
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    # ---- API pública (cualquier hilo) ----
+    def submit(self, request: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        self._conn().execute(
+            "INSERT INTO jobs (id, status, request, created_at) VALUES (?, 'queued', ?, ?)",
+            (job_id, _dumps(request), time.time()),
+        )
+        if self._wakeup is not None:
+            get_loop().call_soon_threadsafe(self._wakeup.set)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row["id"],
+            "status": row["status"],
+            "request": _loads(row["request"]),
+            "partial": _loads(row["partial"]),
+            "result": _loads(row["result"]),
+            "error": row["error"],
+            "timings": _loads(row["timings"]),
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+        }
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """Cancela un trabajo; devuelve el estado resultante (None si no existe)."""
+        conn = self._conn()
+        conn.execute(
+            "UPDATE jobs SET status = 'cancelled', finished_at = ?"
+            " WHERE id = ? AND status IN ('queued', 'running')",
+            (time.time(), job_id),
+        )
+        task = self._running.get(job_id)
+        if task is not None:
+            get_loop().call_soon_threadsafe(task.cancel)
+        return self._status(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        counts = {
+            r["status"]: r["n"]
+            for r in self._conn().execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")
+        }
+        return {
+            "workers": self.workers,
+            "started": self._started,
+            "running_here": len(self._running),
+            "counts": counts,
+        }
+
+    # ---- workers (loop del pool) ----
+    async def _run(self, row: sqlite3.Row) -> None:
+        from app.pipeline import orchestrate_async  # evita import circular
+
+        job_id = row["id"]
+        req = _loads(row["request"])
+        if req.get("deadline_ms") is None:
+            # sin presupuesto propio el pipeline usaría ORCHESTRATE_DEADLINE_MS (el de los
+            # requests interactivos); un trabajo tiene JOB_TIMEOUT
+            req["deadline_ms"] = int(self.timeout * 1000)
+        t0 = time.time()
+        timings: Dict[str, Any] = {"queue_wait_ms": round(1000 * (t0 - row["created_at"]), 1)}
+        partial: Dict[str, Any] = {}
+        flush: Dict[str, Any] = {"task": None, "dirty": False}
+
+        async def _flush() -> None:
+            # un solo escritor por trabajo: las fuentes que llegan mientras escribe se
+            # juntan en la siguiente escritura, en orden
+            while flush["dirty"]:
+                flush["dirty"] = False
+                await asyncio.to_thread(
+                    self._update, job_id, partial=_dumps(partial), timings=_dumps(timings), heartbeat_at=time.time()
+                )
+
+        def progress(source: str, payload: Optional[Dict[str, Any]]) -> None:
+            partial[source] = payload
+            timings[f"{source}_ms"] = round(1000 * (time.time() - t0), 1)
+            flush["dirty"] = True
+            if flush["task"] is None or flush["task"].done():
+                flush["task"] = asyncio.ensure_future(_flush())
+
+        async def _flushed() -> None:
+            if flush["task"] is not None:
+                await asyncio.gather(flush["task"], return_exceptions=True)
+
+        with priority("bulk"):  # sus scrapes ceden el turno a los requests interactivos (ver rate_limit)
+            task = asyncio.ensure_future(asyncio.wait_for(orchestrate_async(**req, progress=progress), self.timeout))
+        self._running[job_id] = task
+        try:
+            while not task.done():
+                await asyncio.wait({task}, timeout=HEARTBEAT_S)
+                if task.done():
+                    break
+                status = await asyncio.to_thread(self._status, job_id)
+                if status is None or status == "cancelled":
+                    task.cancel()  # cancelado desde otro proceso
+                    break
+                await asyncio.to_thread(self._update, job_id, heartbeat_at=time.time())
+            result = await task
+        except asyncio.CancelledError:
+            timings["run_ms"] = round(1000 * (time.time() - t0), 1)
+            if task.done():
+                # cancelado por el usuario (en este u otro proceso)
+                await _flushed()
+                await asyncio.to_thread(
+                    self._update, job_id, status="cancelled", finished_at=time.time(), timings=_dumps(timings)
+                )
+                return
+            # apagado del worker: el trabajo vuelve a la cola para el próximo arranque
+            task.cancel()
+            await asyncio.to_thread(
+                self._execute,
+                "UPDATE jobs SET status = 'queued', worker = NULL, started_at = NULL"
+                " WHERE id = ? AND status = 'running'",
+                (job_id,),
+            )
+            raise
+        except Exception as e:
+            timings["run_ms"] = round(1000 * (time.time() - t0), 1)
+            msg = "timeout" if isinstance(e, asyncio.TimeoutError) else str(e)
+            logger.error(f"Job {job_id} falló: {msg}")
+            await _flushed()
+            await asyncio.to_thread(
+                self._update, job_id, status="failed", error=msg, finished_at=time.time(), timings=_dumps(timings)
+            )
+            return
+        finally:
+            self._running.pop(job_id, None)
+
+        timings["run_ms"] = round(1000 * (time.time() - t0), 1)
+        await _flushed()
+        await asyncio.to_thread(
+            self._execute,
+            "UPDATE jobs SET status = 'done', result = ?, timings = ?, finished_at = ?"
+            " WHERE id = ? AND status = 'running'",
+            (_dumps(result), _dumps(timings), time.time(), job_id),
+        )
+
+    async def _worker(self, n: int) -> None:
+        while True:
+            try:
+                row = await asyncio.to_thread(self._claim)
+            except Exception as e:
+                logger.error(f"Worker {n}: error leyendo la cola: {e}")
+                row = None
+            if row is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), POLL_S)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(row)
+
+    async def _start(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.ensure_future(self._worker(i)) for i in range(self.workers)]
+        self._started = True
+        logger.info(f"Job workers iniciados (n={self.workers})")
+
+    async def _stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._started = False
+
+    def start(self) -> None:
+        if not self._started:
+            run_in_pool_sync(self._start())
+
+    def stop(self) -> None:
+        if self._started:
+            run_in_pool_sync(self._stop())
+
+
+job_queue = JobQueue()
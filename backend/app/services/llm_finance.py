@@ -1,14 +1,17 @@
 from typing import Dict, Any, List
-import json
+import asyncio, hashlib, importlib.util, json, weakref
 from loguru import logger
-from app.config import OPENAI_API_KEY
+from app.config import (
+    OPENAI_API_KEY, OPENAI_BASE_URL, OPENAI_MODEL, REQUEST_TIMEOUT,
+    LLM_MAX_CONCURRENCY, LLM_CACHE_TTL, CACHE_DIR,
+)
 from app.analysis.finance_rules import rule_based_financials
+from app.services.cache import TieredCache
+from app.services.deadline import expired, timeout_s
+from app.services.metrics import fallback, stage
 
-try:
-    from openai import OpenAI
-    _OPENAI_OK = True
-except Exception:
-    _OPENAI_OK = False
+# el SDK de OpenAI tarda en importarse: solo se carga al crear el primer cliente
+_OPENAI_OK = importlib.util.find_spec("openai") is not None
 
 
 PROMPT = """
@@ -24,44 +27,186 @@ Responde **exclusivamente** JSON con este formato:
 }
 Si faltan datos, menciónalo en uno de los factores.
 """
+SYSTEM_MSG = "Eres un analista financiero que responde únicamente JSON válido."
+
+# caché direccionada por contenido: hash(datos normalizados + prompt + modelo)
+llm_cache = TieredCache(CACHE_DIR / "llm.sqlite", ttls={"llm": LLM_CACHE_TTL})
+
+_client = None
+# cliente async y semáforo por event loop (no se pueden compartir entre loops)
+_loop_state: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, Any]]" = weakref.WeakKeyDictionary()
+
+
+def _llm_enabled() -> bool:
+    return bool(OPENAI_API_KEY and _OPENAI_OK)
+
+
+def _get_client():
+    """Cliente OpenAI reutilizado entre llamadas (pool de conexiones HTTP)."""
+    global _client
+    if _client is None:
+        from openai import OpenAI
+        _client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL, timeout=REQUEST_TIMEOUT)
+    return _client
+
+
+def _get_async_state() -> Dict[str, Any]:
+    loop = asyncio.get_running_loop()
+    st = _loop_state.get(loop)
+    if st is None:
+        from openai import AsyncOpenAI
+        st = _loop_state[loop] = {
+            "client": AsyncOpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL, timeout=REQUEST_TIMEOUT),
+            "sem": asyncio.Semaphore(max(1, LLM_MAX_CONCURRENCY)),
+        }
+    return st
+
+
+async def _close_async_state() -> None:
+    """Cierra el cliente async del loop actual (su pool de conexiones) antes de que el loop termine."""
+    st = _loop_state.pop(asyncio.get_running_loop(), None)
+    if st is not None:
+        await st["client"].close()
+
+
+def _normalize(d: Dict[str, Any]) -> Dict[str, Any]:
+    """Quita vacíos y unifica 100 / 100.0 para que datos equivalentes compartan caché."""
+    out = {}
+    for k, v in d.items():
+        if v is None:
+            continue
+        if isinstance(v, float) and v.is_integer():
+            v = int(v)
+        out[k] = v
+    return out
+
+
+def cache_key(d: Dict[str, Any], model: str = OPENAI_MODEL) -> str:
+    payload = json.dumps(_normalize(d), sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(f"{model}\n{PROMPT}\n{payload}".encode("utf-8")).hexdigest()
+
+
+def _messages(d: Dict[str, Any]) -> List[Dict[str, str]]:
+    user_msg = json.dumps(d, ensure_ascii=False)
+    return [
+        {"role": "system", "content": SYSTEM_MSG},
+        {"role": "user", "content": PROMPT + "\nDatos:\n" + user_msg},
+    ]
+
+
+def _parse(raw: str) -> Dict[str, Any]:
+    parsed = json.loads(raw.strip())
+    # normalización / defaults
+    score = int(parsed.get("score", 50))
+    credit_limit = float(parsed.get("creditLimit", 50000))
+    comments: List[str] = list(parsed.get("comments", []))
+
+    while len(comments) < 3:
+        comments.append("Información adicional insuficiente para análisis.")
+
+    level = "low" if score < 30 else "medium" if score < 70 else "high"
+    return {"score": score, "level": level, "creditLimit": credit_limit, "comments": comments[:3]}
+
+
+def _finish(d: Dict[str, Any], key: str, content: str) -> Dict[str, Any]:
+    """Parsea la respuesta del modelo y la cachea; si no es JSON válido, reglas."""
+    try:
+        res = _parse(content)
+    except Exception as e:
+        fallback("llm_parse_failure")
+        logger.warning(f"LLM fallback por respuesta inválida: {e}")
+        return rule_based_financials(d)
+    llm_cache.set("llm", key, res)
+    return {**res, "details": d}
 
 
 def analyze_financials(d: Dict[str, Any]) -> Dict[str, Any]:
-    """Usa OpenAI si hay API Key; si no, fallback determinista."""
-    if not (OPENAI_API_KEY and _OPENAI_OK):
+    """Usa OpenAI si hay API Key; si no (o sin presupuesto de tiempo), fallback determinista."""
+    if not _llm_enabled():
+        fallback("llm_disabled")
         return rule_based_financials(d)
 
-    client = OpenAI(api_key=OPENAI_API_KEY)
-    user_msg = json.dumps(d, ensure_ascii=False)
+    key = cache_key(d)
+    hit = llm_cache.get("llm", key)
+    if hit is not None:
+        return {**hit, "details": d}
 
+    if expired():
+        fallback("llm_deadline")
+        return rule_based_financials(d)
     try:
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "Eres un analista financiero que responde únicamente JSON válido."},
-                {"role": "user", "content": PROMPT + "\nDatos:\n" + user_msg}
-            ],
-            temperature=0.2,
-        )
-        raw = resp.choices[0].message.content.strip()
-        parsed = json.loads(raw)
-        # normalización / defaults
-        score = int(parsed.get("score", 50))
-        credit_limit = float(parsed.get("creditLimit", 50000))
-        comments: List[str] = list(parsed.get("comments", []))
+        with stage("llm.call"):
+            resp = _get_client().chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=_messages(d),
+                temperature=0.2,
+                timeout=timeout_s(REQUEST_TIMEOUT),
+            )
     except Exception as e:
+        fallback("llm_error")
         logger.warning(f"LLM fallback por error: {e}")
         return rule_based_financials(d)
 
-    while len(comments) < 3:
-        comments.append("Información adicional insuficiente para análisis.")
+    return _finish(d, key, resp.choices[0].message.content)
+
+
+async def analyze_financials_async(d: Dict[str, Any]) -> Dict[str, Any]:
+    """Variante async: comparte cliente y limita la concurrencia con LLM_MAX_CONCURRENCY."""
+    if not _llm_enabled():
+        fallback("llm_disabled")
+        return rule_based_financials(d)
+
+    key = cache_key(d)
+    hit = llm_cache.get("llm", key)
+    if hit is not None:
+        return {**hit, "details": d}
+
+    st = _get_async_state()
+    try:
+        async with st["sem"]:
+            if expired():  # se agotó esperando turno
+                fallback("llm_deadline")
+                return rule_based_financials(d)
+            with stage("llm.call"):
+                resp = await st["client"].chat.completions.create(
+                    model=OPENAI_MODEL,
+                    messages=_messages(d),
+                    temperature=0.2,
+                    timeout=timeout_s(REQUEST_TIMEOUT),
+                )
+    except Exception as e:
+        fallback("llm_error")
+        logger.warning(f"LLM fallback por error: {e}")
+        return rule_based_financials(d)
+
+    return _finish(d, key, resp.choices[0].message.content)
+
+
+async def analyze_financials_batch_async(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Muchas empresas en paralelo (acotado por el semáforo); cada una cae a reglas por separado."""
+    # entradas idénticas dentro del lote se consultan una sola vez
+    by_key: Dict[str, asyncio.Task] = {}
+    tasks = []
+    for d in items:
+        key = cache_key(d)
+        if key not in by_key:
+            by_key[key] = asyncio.ensure_future(analyze_financials_async(d))
+        tasks.append(by_key[key])
+    results = await asyncio.gather(*tasks)
+    return [{**r, "details": d} for r, d in zip(results, items)]
+
+
+def analyze_financials_batch(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Variante síncrona de `analyze_financials_batch_async` (scripts/CLI)."""
+    async def _run() -> List[Dict[str, Any]]:
+        # cada asyncio.run es un loop nuevo con su propio cliente: se cierra al terminar
+        try:
+            return await analyze_financials_batch_async(items)
+        finally:
+            await _close_async_state()
+
+    return asyncio.run(_run())
 
-    level = "low" if score < 30 else "medium" if score < 70 else "high"
 
-    return {
-        "score": score,
-        "level": level,
-        "creditLimit": credit_limit,
-        "details": d,
-        "comments": comments[:3]
-    }
\ No newline at end of file
+def llm_stats() -> Dict[str, Any]:
+    return {"enabled": _llm_enabled(), "model": OPENAI_MODEL, "cache": llm_cache.stats()}
@@ -0,0 +1,224 @@
+"""
+Métricas de proceso en formato de texto de Prometheus (sin dependencias externas).
+
+- `stage("nombre")`: mide una etapa (histograma + gauge de en curso) y, si hay un
+  request activo, la agrega a su `Server-Timing`.
+- `fallback("motivo")`: cuenta caídas a un camino alternativo.
+- `render()`: texto para `GET /metrics`.
+
+El acumulador de Server-Timing vive en un ContextVar: las corutinas que se mandan
+al loop del pool con `run_in_pool` heredan el contexto del request que las lanzó.
+"""
+from __future__ import annotations
+import bisect, threading, time
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt_num(x: float) -> str:
+    if x == float("inf"):
+        return "+Inf"
+    return repr(float(x)) if not float(x).is_integer() else str(int(x))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.doc = doc
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.label_names)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, doc: str, labels: Iterable[str] = ()):
+        super().__init__(name, doc, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc_key(self._key(labels), amount)
+
+    def inc_key(self, key: LabelValues, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [
+            f"{self.name}{_fmt_labels(self.label_names, k)} {_fmt_num(v)}" for k, v in items
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labels: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, doc, labels)
+        self.buckets = tuple(sorted(buckets))
+        # por etiquetas: [conteo por bucket..., +Inf], suma
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        self.observe_key(self._key(labels), value)
+
+    def observe_key(self, key: LabelValues, value: float) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[i] += 1
+            self._sums[key] += value
+
+    def count(self, **labels: str) -> int:
+        return sum(self._counts.get(self._key(labels), []))
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(c), self._sums[k]) for k, c in self._counts.items())
+        out = self._header()
+        for key, counts, total in items:
+            acc = 0
+            for le, c in zip(self.buckets + (float("inf"),), counts):
+                acc += c
+                le_label = 'le="' + _fmt_num(le) + '"'
+                out.append(f"{self.name}_bucket{_fmt_labels(self.label_names, key, le_label)} {acc}")
+            out.append(f"{self.name}_sum{_fmt_labels(self.label_names, key)} {_fmt_num(total)}")
+            out.append(f"{self.name}_count{_fmt_labels(self.label_names, key)} {acc}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for m in self._metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "scoring_stage_seconds", "Duración de cada etapa del scoring (s).", ["stage"],
+))
+STAGE_INFLIGHT = REGISTRY.register(Gauge(
+    "scoring_stage_inflight", "Etapas en curso.", ["stage"],
+))
+FALLBACKS = REGISTRY.register(Counter(
+    "scoring_fallbacks_total", "Caídas a un camino alternativo, por motivo.", ["reason"],
+))
+CIRCUIT_OPEN = REGISTRY.register(Gauge(
+    "scoring_circuit_open", "1 si el circuit breaker de la fuente está abierto.", ["source"],
+))
+RATE_FACTOR = REGISTRY.register(Gauge(
+    "scoring_rate_factor", "Fracción de la tasa base permitida por dominio (baja al detectar bloqueos).", ["domain"],
+))
+HTTP_SECONDS = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Duración de los requests HTTP (s).", ["method", "route", "status"],
+))
+HTTP_INFLIGHT = REGISTRY.register(Gauge(
+    "http_requests_inflight", "Requests HTTP en curso.",
+))
+
+# etapas del request actual, para Server-Timing: [(nombre, segundos), ...]
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+
+class stage:
+    """
+    `with stage("fetch.gmaps"): ...` mide la etapa (también alrededor de awaits).
+    Cuesta un par de µs: no usarlo dentro de bucles por fila.
+    """
+
+    __slots__ = ("name", "_key", "_t0")
+
+    def __init__(self, name: str):
+        self.name = name
+        self._key = (name,)
+
+    def __enter__(self) -> "stage":
+        STAGE_INFLIGHT.inc_key(self._key)
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        elapsed = time.perf_counter() - self._t0
+        STAGE_INFLIGHT.inc_key(self._key, -1.0)
+        STAGE_SECONDS.observe_key(self._key, elapsed)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((self.name, elapsed))
+
+
+def fallback(reason: str) -> None:
+    FALLBACKS.inc(reason=reason)
+
+
+def start_request() -> List[Tuple[str, float]]:
+    """Abre el acumulador de etapas del request actual (lo usa el middleware HTTP)."""
+    timings: List[Tuple[str, float]] = []
+    _request_timings.set(timings)
+    return timings
+
+
+def server_timing(timings: List[Tuple[str, float]], total_s: Optional[float] = None) -> str:
+    """Valor del header `Server-Timing` (etapas repetidas se suman, en orden de aparición)."""
+    acc: Dict[str, float] = {}
+    for name, secs in timings:
+        acc[name] = acc.get(name, 0.0) + secs
+    parts = [f"{name};dur={secs * 1000:.1f}" for name, secs in acc.items()]
+    if total_s is not None:
+        parts.append(f"total;dur={total_s * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def render() -> str:
+    return REGISTRY.render()
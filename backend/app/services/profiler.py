@@ -0,0 +1,240 @@
+"""
+Perfil de muestreo por request, bajo demanda (sin dependencias externas).
+
+Un request con `X-Profile: <PROFILE_SECRET>` (o `?profile=<PROFILE_SECRET>`) se
+perfila: un hilo toma cada `PROFILE_INTERVAL_MS` las pilas de todos los hilos del
+proceso (`sys._current_frames`), así que cubre el loop del request, los hilos de
+endpoints síncronos y el loop del pool de navegadores donde corren los scrapers.
+Las pilas ociosas (esperando en `select`/`wait`) se descartan: el perfil muestra CPU,
+las esperas de red se ven en `Server-Timing`.
+
+Por perfil se escriben en `PROFILE_DIR`:
+
+- `<id>.speedscope.json`: una pila por muestra y por hilo (https://www.speedscope.app).
+- `<id>.pstats`: tiempos propios/acumulados por función, para `python -m pstats`/snakeviz
+  (solo si hubo muestras: un request más corto que el intervalo no deja ninguna).
+- `<id>.json`: metadatos (ruta, estado, duración, muestras) que usa `scripts/profiles.py`.
+
+Si hay otros requests en vuelo al mismo tiempo, sus muestras también entran: el
+perfil es del proceso durante la ventana del request.
+"""
+from __future__ import annotations
+import asyncio, hmac, json, marshal, os, secrets, sys, threading, time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from app.config import PROFILE_DIR, PROFILE_INTERVAL_MS, PROFILE_KEEP, PROFILE_SECRET
+
+# (archivo, función) de la hoja en un hilo que solo espera
+_IDLE = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+Frame = Tuple[str, str, int]  # (función, archivo, línea de inicio)
+
+
+def profiling_allowed(token: Optional[str]) -> bool:
+    """True si `token` coincide con PROFILE_SECRET (vacío = perfilado deshabilitado)."""
+    if not PROFILE_SECRET or not token:
+        return False
+    return hmac.compare_digest(token.encode("utf-8"), PROFILE_SECRET.encode("utf-8"))
+
+
+def new_profile_id() -> str:
+    return time.strftime("%Y%m%d-%H%M%S") + "-" + secrets.token_hex(3)
+
+
+class Sampler:
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.interval = max(0.001, interval_ms / 1000)
+        self.frames: List[Frame] = []
+        self._index: Dict[Any, int] = {}  # code object → índice en frames
+        self.threads: Dict[int, Dict[str, Any]] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.started = self.ended = 0.0
+
+    def _frame_id(self, code) -> int:
+        idx = self._index.get(code)
+        if idx is None:
+            idx = self._index[code] = len(self.frames)
+            name = getattr(code, "co_qualname", code.co_name)  # co_qualname: Python 3.11+
+            self.frames.append((name, code.co_filename, code.co_firstlineno))
+        return idx
+
+    def _stack(self, frame) -> List[int]:
+        stack = []
+        while frame is not None:
+            stack.append(self._frame_id(frame.f_code))
+            frame = frame.f_back
+        stack.reverse()  # raíz → hoja
+        return stack
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            dt, last = now - last, now
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in _IDLE:
+                    continue
+                th = self.threads.get(tid)
+                if th is None:
+                    if tid not in names:
+                        names = {t.ident: t.name for t in threading.enumerate()}
+                    th = self.threads[tid] = {"name": names.get(tid, str(tid)), "samples": [], "weights": []}
+                th["samples"].append(self._stack(frame))
+                th["weights"].append(dt)
+
+    def start(self) -> "Sampler":
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.ended = time.perf_counter()
+
+    @property
+    def n_samples(self) -> int:
+        return sum(len(t["samples"]) for t in self.threads.values())
+
+    def speedscope(self, name: str) -> Dict[str, Any]:
+        duration = self.ended - self.started
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "app.services.profiler",
+            "activeProfileIndex": 0,
+            "shared": {"frames": [{"name": n, "file": f, "line": l} for n, f, l in self.frames]},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": th["name"],
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": duration,
+                    "samples": th["samples"],
+                    "weights": th["weights"],
+                }
+                for th in sorted(self.threads.values(), key=lambda t: -len(t["samples"]))
+            ],
+        }
+
+    def pstats(self) -> Dict[Tuple[str, int, str], Tuple]:
+        """Estructura que carga `pstats.Stats` (la que escribe `cProfile.dump_stats`)."""
+        stats: Dict[Tuple[str, int, str], list] = {}
+        for th in self.threads.values():
+            for stack, w in zip(th["samples"], th["weights"]):
+                keys = [(self.frames[i][1], self.frames[i][2], self.frames[i][0]) for i in stack]
+                seen = set()
+                for depth, key in enumerate(keys):
+                    st = stats.setdefault(key, [0, 0, 0.0, 0.0, {}])
+                    if key not in seen:  # recursión: el acumulado cuenta una vez
+                        seen.add(key)
+                        st[0] += 1
+                        st[1] += 1
+                        st[3] += w
+                    if depth:
+                        c = st[4].get(keys[depth - 1], (0, 0, 0.0, 0.0))
+                        st[4][keys[depth - 1]] = (c[0] + 1, c[1] + 1, c[2], c[3] + w)
+                stats[keys[-1]][2] += w
+        return {k: (cc, nc, tt, ct, callers) for k, (cc, nc, tt, ct, callers) in stats.items()}
+
+
+class RequestProfile:
+    """
+    Un perfil en curso; `finish()` detiene el muestreo y escribe los archivos. Desde
+    el loop se usa `finish_async()`, que hace lo mismo en un hilo (escritura y poda
+    son I/O de disco y armar el pstats es CPU).
+    """
+
+    def __init__(self, method: str, path: str, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.id = new_profile_id()
+        self.method = method
+        self.path = path
+        self.created_at = time.time()
+        self.sampler = Sampler(interval_ms).start()
+        self._done = False
+
+    def finish(self, status: int) -> Optional[Path]:
+        if self._done:
+            return None
+        self._done = True
+        self.sampler.stop()
+        try:
+            return self._write(status)
+        except OSError as e:
+            logger.warning(f"[profiler] no se pudo guardar {self.id}: {e}")
+            return None
+
+    async def finish_async(self, status: int) -> Optional[Path]:
+        return await asyncio.to_thread(self.finish, status)
+
+    def _write(self, status: int) -> Path:
+        s = self.sampler
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        base = PROFILE_DIR / self.id
+        title = f"{self.method} {self.path}"
+        with open(f"{base}.speedscope.json", "w", encoding="utf-8") as f:
+            json.dump(s.speedscope(title), f, separators=(",", ":"))
+        if s.n_samples:  # pstats no carga un perfil vacío
+            with open(f"{base}.pstats", "wb") as f:
+                marshal.dump(s.pstats(), f)
+        meta = {
+            "id": self.id,
+            "created_at": self.created_at,
+            "method": self.method,
+            "path": self.path,
+            "status": status,
+            "duration_ms": round((s.ended - s.started) * 1000, 1),
+            "interval_ms": s.interval * 1000,
+            "samples": s.n_samples,
+            "threads": {th["name"]: len(th["samples"]) for th in s.threads.values()},
+        }
+        meta_path = Path(f"{base}.json")
+        meta_path.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        logger.info(f"[profiler] {title} → {self.id} ({meta['samples']} muestras, {meta['duration_ms']} ms)")
+        prune(PROFILE_KEEP)
+        return meta_path
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """Metadatos de los perfiles guardados, del más reciente al más antiguo."""
+    out = []
+    for p in PROFILE_DIR.glob("*.json"):
+        if p.name.endswith(".speedscope.json"):
+            continue
+        try:
+            out.append(json.loads(p.read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            continue
+    out.sort(key=lambda m: m["created_at"], reverse=True)
+    return out
+
+
+def prune(keep: int) -> int:
+    """Borra los perfiles más antiguos dejando `keep`; devuelve cuántos borró."""
+    removed = 0
+    for meta in list_profiles()[max(0, keep):]:
+        for suffix in (".json", ".speedscope.json", ".pstats"):
+            try:
+                (PROFILE_DIR / f"{meta['id']}{suffix}").unlink()
+            except FileNotFoundError:
+                pass
+        removed += 1
+    return removed
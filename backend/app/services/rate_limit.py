@@ -0,0 +1,329 @@
+"""
+Límite de tasa y de concurrencia por dominio, compartido por todos los procesos del host
+(workers de uvicorn, cola de jobs, `scripts/score_bulk.py`).
+
+Antes de abrir una página, el scraper pide turno con `async with rate_limiter.slot(url)`.
+El turno exige, para el dominio de la URL (según RATE_LIMITS):
+
+- un token del bucket (`por_minuto` por minuto, ráfaga de `ráfaga`; `0` = sin límite de
+  tasa, solo de concurrencia);
+- una de sus `concurrencia` plazas (se guarda el pid: las de procesos muertos se liberan);
+- ser el primero de su cola: primero la prioridad (`interactive` antes que `bulk`, ver
+  `priority()`), luego el orden de llegada.
+
+Buckets, plazas y colas viven en SQLite (WAL, `BEGIN IMMEDIATE`), así que un proceso ve
+lo que consumen los demás. Cada consulta es una transacción corta que corre en un hilo
+(`asyncio.to_thread`): esperar el lock no frena el loop del pool, y si se vence el busy
+timeout ("database is locked") se reintenta en vez de fallar el scrape.
+Quien espera sondea y deja un latido; un turno sin latido (proceso caído) sale de la cola.
+
+Backoff adaptativo (AIMD): si el scraper detecta una página de bloqueo lanza `Blocked`;
+la tasa del dominio se multiplica por RATE_BACKOFF y el dominio se pausa
+RATE_BLOCK_COOLDOWN_S (el doble con cada bloqueo seguido). Cada scrape correcto suma
+RATE_RECOVERY a la fracción de la tasa hasta volver a la base.
+"""
+from __future__ import annotations
+import asyncio, os, sqlite3, threading, time, uuid
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Tuple
+from urllib.parse import urlparse
+
+from loguru import logger
+
+from app.config import (
+    RATE_BACKOFF, RATE_BLOCK_COOLDOWN_S, RATE_LEASE_TTL_S, RATE_LIMIT_DB_PATH, RATE_LIMIT_ENABLED, RATE_LIMITS,
+    RATE_MAX_COOLDOWN_S, RATE_MIN_FACTOR, RATE_RECOVERY,
+)
+from app.services.deadline import expired, remaining
+from app.services.metrics import RATE_FACTOR, stage
+
+PRIORITIES = {"interactive": 0, "bulk": 1}
+POLL_S = 0.05         # sondeo del primero de la cola mientras las plazas están ocupadas
+QUEUED_POLL_S = 0.2   # sondeo del resto de la cola
+MAX_SLEEP_S = 1.0     # tope entre latidos aunque falte más para el próximo token
+WAITER_STALE_S = 5.0
+BUSY_TIMEOUT_S = 5.0  # espera del lock de SQLite por consulta (en el hilo); vencida, se reintenta
+
+_priority: ContextVar[int] = ContextVar("scrape_priority", default=PRIORITIES["interactive"])
+
+
+class Blocked(Exception):
+    """El sitio respondió con una página de bloqueo/CAPTCHA."""
+
+
+@contextmanager
+def priority(level: str) -> Iterator[None]:
+    """Prioridad de los scrapes que se lancen dentro (la heredan las tareas y `run_in_pool`)."""
+    token = _priority.set(PRIORITIES[level])
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def parse_limits(spec: str) -> Dict[str, Dict[str, float]]:
+    """`"google.com=30/5/4,tiktok.com=12/3/2"` → {dominio: {per_min, burst, concurrency}}."""
+    out: Dict[str, Dict[str, float]] = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        domain, _, nums = part.partition("=")
+        per_min, burst, conc = (float(x) for x in nums.split("/"))
+        out[domain.strip().lower()] = {"per_min": per_min, "burst": max(1.0, burst), "concurrency": max(1, int(conc))}
+    return out
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _locked(e: sqlite3.OperationalError) -> bool:
+    msg = str(e).lower()
+    return "locked" in msg or "busy" in msg
+
+
+class RateLimiter:
+    def __init__(
+        self, db_path: Path = RATE_LIMIT_DB_PATH, limits: str = RATE_LIMITS, enabled: bool = RATE_LIMIT_ENABLED
+    ):
+        self.db_path = Path(db_path)
+        self.limits = parse_limits(limits)
+        self.enabled = enabled and bool(self.limits)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {"granted": 0, "waited_s": 0.0, "blocked": 0}
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_S, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                " domain TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, factor REAL NOT NULL,"
+                " paused_until REAL NOT NULL, streak INTEGER NOT NULL, blocks INTEGER NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS leases ("
+                " id TEXT PRIMARY KEY, domain TEXT NOT NULL, pid INTEGER NOT NULL, acquired REAL NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS waiters ("
+                " id TEXT PRIMARY KEY, domain TEXT NOT NULL, priority INTEGER NOT NULL, enqueued REAL NOT NULL,"
+                " heartbeat REAL NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS waiters_queue ON waiters (domain, priority, enqueued);"
+                "CREATE INDEX IF NOT EXISTS leases_domain ON leases (domain);"
+            )
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _tx(self) -> Iterator[sqlite3.Connection]:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def domain_for(self, url: str) -> Optional[str]:
+        """Dominio configurado al que pertenece `url` (o un dominio suelto); None si no se limita."""
+        host = (urlparse(url).hostname if "://" in url else url).lower()
+        for domain in self.limits:
+            if host == domain or host.endswith("." + domain):
+                return domain
+        return None
+
+    # ---- estado en SQLite ----
+    def _bucket(self, conn: sqlite3.Connection, domain: str, now: float) -> Dict[str, Any]:
+        """Bucket del dominio con los tokens repuestos hasta `now`."""
+        lim = self.limits[domain]
+        row = conn.execute(
+            "SELECT tokens, updated, factor, paused_until, streak, blocks FROM buckets WHERE domain = ?", (domain,)
+        ).fetchone()
+        if row is None:
+            return {"tokens": lim["burst"], "factor": 1.0, "paused_until": 0.0, "streak": 0, "blocks": 0}
+        tokens, updated, factor, paused_until, streak, blocks = row
+        rate = max(0.0, lim["per_min"] / 60 * factor)
+        tokens = min(lim["burst"], tokens + max(0.0, now - max(updated, paused_until)) * rate)
+        return {"tokens": tokens, "factor": factor, "paused_until": paused_until, "streak": streak, "blocks": blocks}
+
+    def _save(self, conn: sqlite3.Connection, domain: str, b: Dict[str, Any], now: float) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO buckets (domain, tokens, updated, factor, paused_until, streak, blocks)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (domain, b["tokens"], now, b["factor"], b["paused_until"], b["streak"], b["blocks"]),
+        )
+
+    def _reap_leases(self, conn: sqlite3.Connection, domain: str, now: float) -> int:
+        """Plazas ocupadas, tras liberar las de procesos muertos o vencidas."""
+        held = conn.execute("SELECT id, pid, acquired FROM leases WHERE domain = ?", (domain,)).fetchall()
+        dead = [lid for lid, pid, acquired in held if now - acquired > RATE_LEASE_TTL_S or not _pid_alive(pid)]
+        if dead:
+            conn.executemany("DELETE FROM leases WHERE id = ?", [(lid,) for lid in dead])
+            logger.warning(f"[rate_limit] {domain}: {len(dead)} plazas abandonadas liberadas")
+        return len(held) - len(dead)
+
+    def _try_acquire(self, domain: str, wid: str, prio: int) -> Tuple[Optional[str], float]:
+        """(id de la plaza, 0) si hay turno; (None, segundos a esperar) si no."""
+        lim = self.limits[domain]
+        now = time.time()
+        with self._tx() as conn:
+            conn.execute("DELETE FROM waiters WHERE domain = ? AND heartbeat < ?", (domain, now - WAITER_STALE_S))
+            conn.execute(
+                "INSERT INTO waiters (id, domain, priority, enqueued, heartbeat) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(id) DO UPDATE SET heartbeat = excluded.heartbeat",
+                (wid, domain, prio, now, now),
+            )
+            head = conn.execute(
+                "SELECT id FROM waiters WHERE domain = ? ORDER BY priority, enqueued, id LIMIT 1", (domain,)
+            ).fetchone()[0]
+            if head != wid:
+                return None, QUEUED_POLL_S
+            b = self._bucket(conn, domain, now)
+            if b["paused_until"] > now:
+                return None, b["paused_until"] - now
+            limited = lim["per_min"] > 0  # 0 = solo límite de concurrencia
+            rate = lim["per_min"] / 60 * b["factor"]
+            if limited and b["tokens"] < 1:
+                return None, (1 - b["tokens"]) / rate if rate > 0 else MAX_SLEEP_S
+            if self._reap_leases(conn, domain, now) >= lim["concurrency"]:
+                return None, POLL_S
+            if limited:
+                b["tokens"] -= 1
+            self._save(conn, domain, b, now)
+            lid = uuid.uuid4().hex
+            conn.execute("INSERT INTO leases (id, domain, pid, acquired) VALUES (?, ?, ?, ?)", (lid, domain, os.getpid(), now))
+            conn.execute("DELETE FROM waiters WHERE id = ?", (wid,))
+        return lid, 0.0
+
+    def _leave_queue(self, wid: str) -> None:
+        try:
+            with self._tx() as conn:
+                conn.execute("DELETE FROM waiters WHERE id = ?", (wid,))
+        except sqlite3.Error as e:
+            logger.warning(f"[rate_limit] no se pudo salir de la cola: {e}")
+
+    def _release(self, domain: str, lid: str, outcome: str) -> None:
+        """Libera la plaza y ajusta la tasa: `blocked` la reduce y pausa, `ok` la recupera."""
+        now = time.time()
+        with self._tx() as conn:
+            conn.execute("DELETE FROM leases WHERE id = ?", (lid,))
+            if outcome == "error":
+                return  # un fallo cualquiera no dice nada de la tasa
+            b = self._bucket(conn, domain, now)
+            if outcome == "blocked":
+                b["factor"] = max(RATE_MIN_FACTOR, b["factor"] * RATE_BACKOFF)
+                b["streak"] += 1
+                b["blocks"] += 1
+                b["tokens"] = 0.0
+                b["paused_until"] = now + min(RATE_MAX_COOLDOWN_S, RATE_BLOCK_COOLDOWN_S * 2 ** (b["streak"] - 1))
+            else:
+                b["factor"] = min(1.0, b["factor"] + RATE_RECOVERY)
+                b["streak"] = 0
+            self._save(conn, domain, b, now)
+        RATE_FACTOR.set(b["factor"], domain=domain)
+        if outcome == "blocked":
+            logger.warning(
+                f"[rate_limit] {domain} bloqueado: tasa ×{b['factor']:.2f}, pausa {b['paused_until'] - now:.0f}s"
+            )
+
+    async def _release_async(self, domain: str, lid: str, outcome: str) -> None:
+        for attempt in range(3):
+            try:
+                # shield: aunque cancelen la tarea, la plaza se libera igual en el hilo
+                await asyncio.shield(asyncio.to_thread(self._release, domain, lid, outcome))
+                return
+            except sqlite3.OperationalError as e:
+                if not _locked(e) or attempt == 2:
+                    logger.warning(f"[rate_limit] no se pudo liberar la plaza de {domain}: {e}")
+                    return
+            except sqlite3.Error as e:
+                logger.warning(f"[rate_limit] no se pudo liberar la plaza de {domain}: {e}")
+                return
+
+    # ---- API ----
+    @asynccontextmanager
+    async def slot(self, url: str) -> AsyncIterator[Optional[str]]:
+        """
+        Espera turno para `url` (respetando el presupuesto de la orquestación) y lo
+        libera al salir. Un `Blocked` dentro del bloque activa el backoff del dominio.
+        Cede el dominio limitado, o None si no aplica límite.
+        """
+        domain = self.domain_for(url) if self.enabled else None
+        if domain is None:
+            yield None
+            return
+        wid = uuid.uuid4().hex
+        prio = _priority.get()
+        t0 = time.perf_counter()
+        lid: Optional[str] = None
+        with stage("ratelimit.wait"):
+            try:
+                while True:
+                    if expired():
+                        raise asyncio.TimeoutError(f"sin presupuesto esperando turno para {domain}")
+                    try:
+                        lid, wait = await asyncio.to_thread(self._try_acquire, domain, wid, prio)
+                    except sqlite3.OperationalError as e:
+                        if not _locked(e):
+                            raise
+                        lid, wait = None, POLL_S  # lock muy disputado: se reintenta, no es un fallo del scrape
+                    if lid:
+                        break
+                    r = remaining()
+                    await asyncio.sleep(max(0.001, min(wait, MAX_SLEEP_S, r if r is not None else MAX_SLEEP_S)))
+            except BaseException:
+                await asyncio.shield(asyncio.to_thread(self._leave_queue, wid))
+                raise
+        with self._lock:
+            self._stats["granted"] += 1
+            self._stats["waited_s"] += time.perf_counter() - t0
+
+        outcome = "error"
+        try:
+            yield domain
+            outcome = "ok"
+        except Blocked:
+            outcome = "blocked"
+            with self._lock:
+                self._stats["blocked"] += 1
+            raise
+        finally:
+            await self._release_async(domain, lid, outcome)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            local = {**self._stats, "waited_s": round(self._stats["waited_s"], 3)}
+        if not self.enabled:
+            return {"enabled": False, **local}
+        now = time.time()
+        domains: Dict[str, Any] = {}
+        try:
+            conn = self._conn()
+            for domain, lim in self.limits.items():
+                b = self._bucket(conn, domain, now)
+                waiting = dict(conn.execute(
+                    "SELECT priority, COUNT(*) FROM waiters WHERE domain = ? GROUP BY priority", (domain,)
+                ).fetchall())
+                domains[domain] = {
+                    **lim,
+                    "tokens": round(b["tokens"], 2),
+                    "factor": round(b["factor"], 3),
+                    "paused_s": round(max(0.0, b["paused_until"] - now), 1),
+                    "blocks": b["blocks"],
+                    "leases": conn.execute("SELECT COUNT(*) FROM leases WHERE domain = ?", (domain,)).fetchone()[0],
+                    "waiting": {name: waiting.get(p, 0) for name, p in PRIORITIES.items()},
+                }
+        except sqlite3.Error:
+            pass
+        return {"enabled": True, **local, "domains": domains}
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,184 @@
+"""
+Historial append-only de resultados de scoring, indexado por RUC.
+
+SQLite en modo WAL con índice (ruc, id): el último resultado y el historial de
+un RUC se leen en O(log n) aunque la tabla tenga millones de filas. Las
+escrituras no bloquean al request: `record` solo encola y un hilo de fondo
+inserta por lotes en una transacción.
+"""
+from __future__ import annotations
+import atexit, json, queue, sqlite3, threading, time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from app.config import RESULTS_DB_PATH
+from app.services.financial_store import normalize_ruc
+from app.services.metrics import stage
+
+BATCH_SIZE = 500
+_COLS = (
+    "ruc, created_at, final_score, risk_label, fin, maps, tt, weights, used_files, generated_at"
+)
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS results ("
+        " id INTEGER PRIMARY KEY AUTOINCREMENT, ruc TEXT NOT NULL, created_at REAL NOT NULL,"
+        " final_score REAL, risk_label TEXT, fin REAL, maps REAL, tt REAL,"
+        " weights TEXT, used_files TEXT, generated_at TEXT)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS results_ruc_id ON results (ruc, id)")
+    return conn
+
+
+def _ruc_key(ruc: Any) -> str:
+    return normalize_ruc(ruc) or str(ruc or "").strip()
+
+
+def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+    return {
+        "id": row["id"],
+        "ruc": row["ruc"],
+        "created_at": row["created_at"],
+        "final_score": row["final_score"],
+        "risk_label": row["risk_label"],
+        "component_scores": {"fin": row["fin"], "maps": row["maps"], "tt": row["tt"]},
+        "weights": json.loads(row["weights"]) if row["weights"] else None,
+        "used_files": json.loads(row["used_files"]) if row["used_files"] else None,
+        "generated_at": row["generated_at"],
+    }
+
+
+class ResultStore:
+    def __init__(self, db_path: Path = RESULTS_DB_PATH, batch_size: int = BATCH_SIZE):
+        self.db_path = Path(db_path)
+        self.batch_size = max(1, batch_size)
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._local = threading.local()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        self.written = 0
+        self.batches = 0
+        self.errors = 0
+
+    # ---- escritura (hilo de fondo) ----
+    def _ensure_writer(self) -> None:
+        if self._writer is not None:
+            return
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="results-writer", daemon=True)
+                self._writer.start()
+                atexit.register(self.flush)
+
+    def _write_loop(self) -> None:
+        conn = _connect(self.db_path)
+        sql = f"INSERT INTO results ({_COLS}) VALUES ({', '.join('?' * 10)})"
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [r for r in batch if r is not None]
+            try:
+                if rows:
+                    with stage("results.write"), conn:
+                        conn.executemany(sql, rows)
+                    self.written += len(rows)
+                    self.batches += 1
+            except Exception as e:
+                self.errors += len(rows)
+                logger.error(f"No se pudieron guardar {len(rows)} resultados: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def record(self, result: Dict[str, Any], weights: Optional[Dict[str, float]] = None) -> None:
+        """Encola un resultado fusionado (dict de `orchestrate`); no bloquea."""
+        comp = result.get("component_scores") or {}
+        self._queue.put((
+            _ruc_key(result.get("ruc")),
+            time.time(),
+            result.get("final_score"),
+            result.get("risk_label"),
+            comp.get("fin"),
+            comp.get("maps"),
+            comp.get("tt"),
+            json.dumps(weights) if weights else None,
+            json.dumps(result.get("used_files"), ensure_ascii=False) if result.get("used_files") else None,
+            result.get("_generated_at"),
+        ))
+        self._ensure_writer()
+
+    def flush(self) -> None:
+        """Espera a que todo lo encolado quede escrito (scripts, apagado, tests)."""
+        if self._writer is not None:
+            self._queue.join()
+
+    # ---- lectura ----
+    def _conn(self) -> Optional[sqlite3.Connection]:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if not self.db_path.exists():
+                return None
+            conn = self._local.conn = _connect(self.db_path)
+        return conn
+
+    def history(
+        self, ruc: str, limit: int = 20, before_id: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Resultados de `ruc`, del más reciente al más antiguo (paginado por id)."""
+        conn = self._conn()
+        if conn is None:
+            return []
+        q = "SELECT * FROM results WHERE ruc = ?"
+        args: List[Any] = [_ruc_key(ruc)]
+        if before_id is not None:
+            q += " AND id < ?"
+            args.append(before_id)
+        q += " ORDER BY id DESC LIMIT ?"
+        args.append(max(1, limit))
+        return [_row_to_dict(r) for r in conn.execute(q, args)]
+
+    def latest(self, ruc: str) -> Optional[Dict[str, Any]]:
+        rows = self.history(ruc, limit=1)
+        return rows[0] if rows else None
+
+    def latest_many(self, rucs: List[str]) -> Dict[str, Dict[str, Any]]:
+        """{ruc pedido: último resultado} de los que tienen historial (una consulta por cada 900)."""
+        conn = self._conn()
+        keys = list(dict.fromkeys(_ruc_key(r) for r in rucs))
+        if conn is None or not keys:
+            return {}
+        found: Dict[str, Dict[str, Any]] = {}
+        for i in range(0, len(keys), 900):
+            part = keys[i:i + 900]
+            rows = conn.execute(
+                "SELECT * FROM results WHERE id IN ("
+                f" SELECT MAX(id) FROM results WHERE ruc IN ({','.join('?' * len(part))}) GROUP BY ruc)",
+                part,
+            )
+            for r in rows:
+                found[r["ruc"]] = _row_to_dict(r)
+        return {r: found[_ruc_key(r)] for r in rucs if _ruc_key(r) in found}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self._queue.qsize(),
+            "written": self.written,
+            "batches": self.batches,
+            "errors": self.errors,
+        }
+
+
+results_store = ResultStore()
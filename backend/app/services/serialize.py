@@ -0,0 +1,123 @@
+"""
+Camino rápido de respuesta para los endpoints de scoring.
+
+Los resultados que arma el pipeline ya tienen la forma del `response_model`, así que
+no se vuelven a validar con Pydantic: se proyectan a los campos del modelo y se
+codifican directamente.
+
+- JSON con orjson si está instalado; si no, `json` con las mismas opciones que
+  `JSONResponse` de Starlette (mismos bytes que el camino validado). NaN/Infinity
+  salen como `null` en los dos (orjson lo hace solo; con `json` se reemplazan).
+- MessagePack si el cliente manda `Accept: application/msgpack` y msgpack está
+  instalado; si no, JSON (el `Content-Type` dice cuál se usó).
+- `?fields=compact` omite los campos que solo repiten la entrada (`details` en
+  /evaluate, `used_files` en /orchestrate); `?fields=a,b` deja solo esos campos.
+
+Los modelos siguen declarados en las rutas para el esquema de OpenAPI.
+"""
+from __future__ import annotations
+import importlib.util, json, math
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Type
+
+from fastapi import Request
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+_ORJSON_OK = importlib.util.find_spec("orjson") is not None
+_MSGPACK_OK = importlib.util.find_spec("msgpack") is not None
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+
+def _default(o: Any) -> Any:
+    # arrays y escalares de numpy y similares que se cuelen en un resultado
+    # (tolist primero: en un array de más de un elemento `item()` falla)
+    if hasattr(o, "tolist"):
+        return o.tolist()
+    if hasattr(o, "item"):
+        return o.item()
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def _finite(obj: Any) -> Any:
+    """Copia de `obj` con los float no finitos como None (lo que hace orjson)."""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {k: _finite(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(v) for v in obj]
+    return obj
+
+
+def _dumps_stdlib(obj: Any, default) -> str:
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"), default=default)
+
+
+def dumps_json(obj: Any) -> bytes:
+    if _ORJSON_OK:
+        import orjson
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    try:
+        return _dumps_stdlib(obj, _default).encode("utf-8")
+    except ValueError:  # NaN/Infinity: se repite reemplazándolos (caso raro, no se paga siempre)
+        return _dumps_stdlib(_finite(obj), lambda o: _finite(_default(o))).encode("utf-8")
+
+
+def dumps_msgpack(obj: Any) -> bytes:
+    import msgpack
+    return msgpack.packb(obj, default=_default, use_bin_type=True)
+
+
+def wants_msgpack(request: Request) -> bool:
+    accept = request.headers.get("accept", "")
+    return _MSGPACK_OK and any(t in accept for t in MSGPACK_TYPES)
+
+
+def model_fields(model: Type[BaseModel]) -> Dict[str, Any]:
+    """{campo: default} de un modelo (Pydantic 1 o 2); los obligatorios sin default."""
+    fields = getattr(model, "model_fields", None)
+    if fields is not None:  # Pydantic 2
+        return {k: f.get_default(call_default_factory=True) for k, f in fields.items()}
+    return {k: f.get_default() for k, f in model.__fields__.items()}
+
+
+class Shape:
+    """
+    Campos de un `response_model` y, para `compact`, los que se omiten. `project()`
+    da lo mismo que serializar con el modelo (sin claves extra como `_generated_at`,
+    con los defaults de los campos ausentes) pero sin validar.
+    """
+
+    def __init__(self, model: Type[BaseModel], compact_drop: Sequence[str] = ()):
+        self.defaults = model_fields(model)
+        self.names: Tuple[str, ...] = tuple(self.defaults)
+        self.compact_drop = tuple(compact_drop)
+
+    def select(self, fields: Optional[str]) -> Tuple[str, ...]:
+        if not fields:
+            return self.names
+        if fields == "compact":
+            return tuple(n for n in self.names if n not in self.compact_drop)
+        wanted = {f.strip() for f in fields.split(",")}
+        return tuple(n for n in self.names if n in wanted)
+
+    def project(self, obj: Dict[str, Any], names: Iterable[str]) -> Dict[str, Any]:
+        d = self.defaults
+        return {n: obj[n] if n in obj else d[n] for n in names}
+
+    def project_many(self, objs: List[Dict[str, Any]], names: Iterable[str]) -> List[Dict[str, Any]]:
+        names = tuple(names)
+        d = self.defaults
+        return [{n: o[n] if n in o else d[n] for n in names} for o in objs]
+
+
+def fast_response(request: Request, content: Any, status_code: int = 200) -> Response:
+    """JSON (orjson o json) o MessagePack según `Accept`, sin pasar por `response_model`."""
+    if wants_msgpack(request):
+        return Response(dumps_msgpack(content), status_code, media_type="application/msgpack", headers={"Vary": "Accept"})
+    return Response(dumps_json(content), status_code, media_type="application/json", headers={"Vary": "Accept"})
+
+
+def serializer_info() -> Dict[str, Any]:
+    return {"json": "orjson" if _ORJSON_OK else "json", "msgpack": _MSGPACK_OK}
@@ -0,0 +1,86 @@
+"""
+Single-flight: llamadas concurrentes con la misma clave comparten una sola ejecución.
+
+Debe usarse siempre desde el mismo event loop (en la app, el loop del pool de
+navegadores; ver `pipeline._fetch_source`).
+
+La ejecución corre con el presupuesto más largo de los llamadores que la esperan
+(`deadline.SharedDeadline`), no con el del primero: uno que llega después con más
+tiempo no recibe un resultado recortado. Cada llamador acota su propia espera.
+"""
+from __future__ import annotations
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+from app.services.deadline import SharedDeadline
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    def __init__(self, max_tracked_keys: int = 1000):
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._deadlines: Dict[str, SharedDeadline] = {}
+        self._waiters: Dict[str, int] = {}
+        self._shared_by_key: Dict[str, int] = {}
+        self._max_tracked_keys = max_tracked_keys
+        self.calls = 0
+        self.executions = 0
+        self.shared = 0
+
+    def _forget(self, key: str, fut: asyncio.Future) -> None:
+        if self._inflight.get(key) is fut:
+            del self._inflight[key]
+            self._waiters.pop(key, None)
+            self._deadlines.pop(key, None)
+
+    def _track_shared(self, key: str) -> None:
+        self.shared += 1
+        self._shared_by_key[key] = self._shared_by_key.get(key, 0) + 1
+        if len(self._shared_by_key) > self._max_tracked_keys:
+            keep = sorted(self._shared_by_key.items(), key=lambda kv: kv[1], reverse=True)
+            self._shared_by_key = dict(keep[: self._max_tracked_keys // 2])
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Ejecuta `fn()` o se engancha a la ejecución en curso para `key`."""
+        self.calls += 1
+        fut = self._inflight.get(key)
+        if fut is None:
+            deadline = self._deadlines[key] = SharedDeadline()
+            fut = asyncio.ensure_future(self._run(deadline, fn))
+            self._inflight[key] = fut
+            self._waiters[key] = 0
+            fut.add_done_callback(lambda f, k=key: self._forget(k, f))
+            self.executions += 1
+        else:
+            self._deadlines[key].join()
+            self._track_shared(key)
+
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            # shield: si un cliente se va, la ejecución sigue para el resto
+            return await asyncio.shield(fut)
+        finally:
+            if self._inflight.get(key) is fut:
+                self._waiters[key] -= 1
+
+    @staticmethod
+    async def _run(deadline: SharedDeadline, fn: Callable[[], Awaitable[T]]) -> T:
+        with deadline.applied():
+            return await fn()
+
+    def stats(self) -> Dict[str, Any]:
+        waiters = dict(self._waiters)
+        shared_by_key = dict(self._shared_by_key)
+        top = sorted(shared_by_key.items(), key=lambda kv: kv[1], reverse=True)[:20]
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "shared": self.shared,
+            "saved_ratio": round(self.shared / self.calls, 4) if self.calls else 0.0,
+            "inflight": waiters,
+            "top_shared_keys": dict(top),
+        }
+
+
+scrape_flight = SingleFlight()
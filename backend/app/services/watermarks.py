@@ -0,0 +1,90 @@
+"""
+Marcas de agua por perfil de TikTok y por local de Maps, para re-scrapear incrementalmente.
+
+Por fuente+clave se guarda el último resultado ya combinado: videos y reseñas vistos
+(con su sentimiento) y las sumas acumuladas (`totals`). Con eso el scraper deja de
+paginar al llegar a contenido conocido, y `summarize_*` leen los totales en vez de
+recorrer toda la lista. SQLite en modo WAL, una fila por clave.
+"""
+from __future__ import annotations
+import json, sqlite3, threading, time
+from pathlib import Path
+from typing import Any, Dict, Optional, Set
+
+from app.config import WATERMARKS_DB_PATH
+
+
+class WatermarkStore:
+    def __init__(self, db_path: Path = WATERMARKS_DB_PATH):
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "writes": 0}
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS watermarks ("
+                " source TEXT NOT NULL, k TEXT NOT NULL, state TEXT NOT NULL, updated_at REAL NOT NULL,"
+                " PRIMARY KEY (source, k)) WITHOUT ROWID"
+            )
+            self._local.conn = conn
+        return conn
+
+    def _bump(self, counter: str) -> None:
+        with self._lock:
+            self._stats[counter] += 1
+
+    def get(self, source: str, key: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(
+            "SELECT state FROM watermarks WHERE source = ? AND k = ?", (source, key)
+        ).fetchone()
+        self._bump("hits" if row else "misses")
+        return json.loads(row[0]) if row else None
+
+    def put(self, source: str, key: str, state: Dict[str, Any]) -> None:
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO watermarks (source, k, state, updated_at) VALUES (?, ?, ?, ?)",
+                (source, key, json.dumps(state, ensure_ascii=False), time.time()),
+            )
+        self._bump("writes")
+
+    def delete(self, source: str, key: str) -> bool:
+        conn = self._conn()
+        with conn:
+            cur = conn.execute("DELETE FROM watermarks WHERE source = ? AND k = ?", (source, key))
+        return cur.rowcount > 0
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            rows = dict(self._conn().execute("SELECT source, COUNT(*) FROM watermarks GROUP BY source").fetchall())
+        except sqlite3.Error:
+            rows = {}
+        with self._lock:
+            return {**self._stats, "rows": rows}
+
+
+watermarks = WatermarkStore()
+
+
+def tiktok_known(state: Optional[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """{video_id: {"comments": n, "comment_ids": {...}}} de lo ya visto, para `TikTokCapture`."""
+    return {
+        v["id"]: {
+            "comments": v.get("comments", 0),
+            "comment_ids": {c["id"] for c in v.get("comment_items") or [] if c.get("id")},
+        }
+        for v in (state or {}).get("videos") or []
+    }
+
+
+def review_ids(state: Optional[Dict[str, Any]]) -> Set[str]:
+    """Ids de reseñas de Maps ya vistas."""
+    return {r["id"] for r in (state or {}).get("review_items") or [] if r.get("id")}
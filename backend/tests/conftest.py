@@ -0,0 +1,42 @@
+"""Las bases SQLite de la app van a un directorio temporal durante las pruebas."""
+import atexit
+import os
+import shutil
+import tempfile
+
+import pytest
+
+_TMP = tempfile.mkdtemp(prefix="scoring-tests-")
+atexit.register(shutil.rmtree, _TMP, True)
+
+for _var, _name in (
+    ("RESULTS_DB_PATH", "results.sqlite"),
+    ("JOBS_DB_PATH", "jobs.sqlite"),
+    ("WATERMARKS_DB_PATH", "watermarks.sqlite"),
+    ("FINANCIAL_DB_PATH", "financials.sqlite"),
+    ("RATE_LIMIT_DB_PATH", "rate_limit.sqlite"),
+    ("PROFILE_DIR", "profiles"),
+):
+    os.environ.setdefault(_var, os.path.join(_TMP, _name))
+
+
+@pytest.fixture
+def sentiment_cache(tmp_path, monkeypatch):
+    """Caché de sentimiento vacía en tmp_path (la de la app vive en data/cache)."""
+    from app.analysis import sentiment
+    from app.services.cache import TieredCache
+
+    cache = TieredCache(tmp_path / "sentiment.sqlite", ttls={"sentiment": 3600})
+    monkeypatch.setattr(sentiment, "sentiment_cache", cache)
+    return cache
+
+
+@pytest.fixture(scope="module")
+def client():
+    """TestClient de la API con el ciclo de vida de la app (pool, workers de jobs)."""
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    with TestClient(app) as c:
+        yield c
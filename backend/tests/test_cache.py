@@ -0,0 +1,68 @@
+"""Caché en dos niveles: copias independientes, TTL y purga de vencidos."""
+import sqlite3
+import time
+
+from app.services.cache import TieredCache, normalize_key
+
+
+def _cache(tmp_path, **kw):
+    return TieredCache(tmp_path / "c.sqlite", ttls={"ns": 60}, **kw)
+
+
+def _disk_rows(c):
+    return sqlite3.connect(c.db_path).execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+def test_normalize_key():
+    assert normalize_key("  @Nike  Miraflores ") == "nike miraflores"
+
+
+def test_callers_get_independent_copies(tmp_path):
+    c = _cache(tmp_path)
+    value = {"videos": [{"id": 1}]}
+    c.set("ns", "k", value)
+    value["videos"].append({"id": 2})  # quien escribió sigue con su objeto
+    hit = c.get("ns", "k")
+    assert hit == {"videos": [{"id": 1}]}
+    hit["videos"].clear()
+    assert c.get("ns", "k") == {"videos": [{"id": 1}]}
+    many = c.get_many("ns", ["k"])
+    many["k"]["videos"].clear()
+    assert c.get_many("ns", ["k"]) == {"k": {"videos": [{"id": 1}]}}
+
+
+def test_memory_and_disk_return_the_same(tmp_path):
+    c = _cache(tmp_path)
+    c.set("ns", "k", {"t": (1, 2), 3: "x"})
+    from_mem = c.get("ns", "k")
+    fresh = _cache(tmp_path)  # otro proceso: solo disco
+    assert from_mem == fresh.get("ns", "k") == {"t": [1, 2], "3": "x"}
+    st = c.stats()["namespaces"]["ns"]
+    assert st["mem_hits"] == 1 and fresh.stats()["namespaces"]["ns"]["disk_hits"] == 1
+
+
+def test_expired_entries_miss(tmp_path):
+    c = _cache(tmp_path)
+    c.set("ns", "k", 1, ttl=-1)
+    assert c.get("ns", "k", "miss") == "miss"
+    assert c.get_many("ns", ["k"]) == {}
+
+
+def test_writes_purge_expired_rows_periodically(tmp_path):
+    c = _cache(tmp_path, purge_interval=0.2)
+    c.set("ns", "a", 1)  # primera escritura tras arrancar: purga
+    c.set_many("ns", {f"old{i}": i for i in range(5)}, ttl=-1)  # dentro del intervalo: no purga
+    assert _disk_rows(c) == 6
+    time.sleep(0.25)
+    c.set("ns", "b", 2)
+    assert _disk_rows(c) == 2
+    assert c.stats()["purged"] == 5
+    assert c.get("ns", "a") == 1
+
+
+def test_purge_disabled(tmp_path):
+    c = _cache(tmp_path, purge_interval=0)
+    c.set("ns", "old", 1, ttl=-1)
+    c.set("ns", "new", 1)
+    assert _disk_rows(c) == 2
+    assert c.purge_expired() == 1
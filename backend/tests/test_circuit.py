@@ -0,0 +1,128 @@
+"""Circuit breaker por fuente y fusión parcial (`timed_out` / `skipped`) dentro del presupuesto."""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app import pipeline
+from app.services.cache import TieredCache
+from app.services.circuit import CircuitBreaker
+
+
+def test_breaker_transitions():
+    b = CircuitBreaker("t", failures=2, reset_s=0.05)
+    assert b.allow() and b.state == "closed"
+    b.record_failure()
+    assert b.state == "closed" and b.allow()
+    b.record_failure()
+    assert b.state == "open" and not b.allow()
+    time.sleep(0.06)
+    assert b.allow() and b.state == "half_open"  # un intento de prueba por ventana
+    assert not b.allow()
+    b.record_failure()  # la prueba falla: abierto otra vez
+    assert b.state == "open" and b.stats()["trips"] == 2
+    time.sleep(0.06)
+    assert b.allow()
+    b.record_success()
+    assert (b.state, b.failures) == ("closed", 0) and b.allow()
+    assert b.stats()["rejected"] == 2
+
+
+def test_success_resets_failure_count():
+    b = CircuitBreaker("t", failures=2, reset_s=60)
+    b.record_failure()
+    b.record_success()
+    b.record_failure()
+    assert b.state == "closed"
+
+
+TIKTOK_RAW = {"username": "shop", "followers": 1000, "videos": [{"id": "v", "likes": 50, "comments": 5, "shares": 5}]}
+
+
+@pytest.fixture
+def sources(monkeypatch, tmp_path):
+    """
+    Scrapers falsos, caché de scraping temporal y circuitos nuevos; devuelve
+    (breakers, llamadas, use, release). Un scraper que no se esperó sigue corriendo en el
+    loop del pool: al terminar la prueba se lo libera con `release` y se espera a que
+    vuelva, antes de restaurar la caché y los circuitos reales.
+    """
+    breakers = {s: CircuitBreaker(s, failures=2, reset_s=60) for s in ("gmaps", "tiktok")}
+    calls = {"gmaps": 0, "tiktok": 0}
+    running = {"n": 0}
+    release = threading.Event()
+    monkeypatch.setattr(pipeline, "breaker", breakers.__getitem__)
+    monkeypatch.setattr(pipeline, "scrape_cache", TieredCache(tmp_path / "scrape.sqlite", ttls={}))
+    monkeypatch.setattr(pipeline, "FUSION_RESERVE_S", 0.05)
+
+    def wrap(source, fn):
+        async def scraper(query, **opts):
+            calls[source] += 1
+            running["n"] += 1
+            try:
+                return await fn(query)
+            finally:
+                running["n"] -= 1
+        return scraper
+
+    def use(gmaps, tiktok):
+        monkeypatch.setitem(pipeline._SCRAPERS, "gmaps", wrap("gmaps", gmaps))
+        monkeypatch.setitem(pipeline._SCRAPERS, "tiktok", wrap("tiktok", tiktok))
+
+    yield breakers, calls, use, release
+    release.set()
+    end = time.monotonic() + 5
+    while running["n"] and time.monotonic() < end:
+        time.sleep(0.01)
+
+
+def _orchestrate(query, **kw):
+    # una consulta por prueba: un scrape lento de otra prueba sigue en vuelo (single-flight)
+    return asyncio.run(pipeline.orchestrate_async(
+        "0990000000001", tiktok=query, gmaps=query, run_scrapers=True, mock=False, refresh=True, **kw
+    ))
+
+
+def test_slow_source_is_left_out_of_the_fusion(sources):
+    breakers, calls, use, release = sources
+
+    async def slow(query):
+        while not release.is_set():
+            await asyncio.sleep(0.01)
+        return {"query": query, "rating": 4.5, "reviews": 100}
+
+    async def tiktok(query):
+        return dict(TIKTOK_RAW)
+
+    use(slow, tiktok)
+    t0 = time.perf_counter()
+    res = _orchestrate("lenta", deadline_ms=400)
+    assert time.perf_counter() - t0 < 1.5
+    assert (res["timed_out"], res["skipped"]) == (["gmaps"], [])
+    assert res["component_scores"] == {"fin": 0.6, "maps": None, "tt": 0.4}
+    # pesos renormalizados sobre los componentes presentes
+    assert res["final_score"] == pytest.approx((0.6 * 0.6 + 0.15 * 0.4) / 0.75)
+    assert breakers["gmaps"].failures == 0  # quedarse sin presupuesto no es culpa de la fuente
+
+
+def test_open_circuit_skips_the_source(sources):
+    breakers, calls, use, _ = sources
+
+    async def maps(query):
+        return {"query": query, "rating": 4.5, "reviews": 100}
+
+    async def broken(query):
+        return {"username": query, "followers": 0, "videos": [], "error": "boom"}
+
+    use(maps, broken)
+    for _ in range(2):
+        res = _orchestrate("rota", deadline_ms=0)
+        assert res["skipped"] == [] and res["component_scores"]["tt"] is None
+    assert breakers["tiktok"].state == "open"
+
+    res = _orchestrate("rota", deadline_ms=0)
+    assert (res["timed_out"], res["skipped"]) == ([], ["tiktok"])
+    assert calls["tiktok"] == 2  # con el circuito abierto ni se intenta
+    assert res["component_scores"]["maps"] is not None
+    assert breakers["gmaps"].state == "closed"
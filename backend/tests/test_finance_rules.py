@@ -0,0 +1,83 @@
+"""Paridad entre las reglas financieras escalares y su versión columnar (por lotes)."""
+import math
+import random
+
+import pytest
+
+from app.analysis.finance_rules import (
+    heuristic_financials,
+    heuristic_financials_batch,
+    rule_based_financials,
+    rule_based_financials_batch,
+)
+
+FIELDS = [
+    "activos", "patrimonio", "ingresos_ventas", "utilidad_neta", "deuda_total",
+    "gastos_financieros", "liquidez_corriente", "margen_bruto", "rent_neta_ventas", "roe", "roa",
+]
+SPECIAL = [None, math.nan, math.inf, -math.inf, 0.0, 1.0, -1.0]
+
+
+def _rows(n, specials, seed=7):
+    rnd = random.Random(seed)
+    rows = []
+    for _ in range(n):
+        row = {}
+        for f in FIELDS:
+            r = rnd.random()
+            if r < 0.1:
+                continue  # campo ausente
+            if r < 0.4:
+                row[f] = rnd.choice(specials)
+            else:
+                row[f] = rnd.choice([rnd.uniform(-2, 5), rnd.uniform(-1e6, 5e6), 0.5, 0.03, 2.0])
+        rows.append(row)
+    return rows
+
+
+def _same(a, b):
+    if isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b):
+        return True
+    return a == b
+
+
+def _assert_parity(scalar, batch):
+    assert len(scalar) == len(batch)
+    for s, b in zip(scalar, batch):
+        assert s.keys() == b.keys()
+        for k in s:
+            assert _same(s[k], b[k]), (k, s, b)
+
+
+def test_rule_based_parity_with_nan_none_strings_and_missing():
+    rows = _rows(2000, SPECIAL + ["nan", "abc", "12.5", ""])
+    _assert_parity([rule_based_financials(r) for r in rows], rule_based_financials_batch(rows))
+
+
+def test_heuristic_parity_with_nan_none_and_missing():
+    rows = _rows(2000, SPECIAL)
+    _assert_parity([heuristic_financials(r) for r in rows], heuristic_financials_batch(rows))
+
+
+@pytest.mark.parametrize("row", [
+    {"patrimonio": math.nan, "utilidad_neta": 10.0},
+    {"patrimonio": None, "utilidad_neta": 10.0},
+    {"liquidez_corriente": math.nan},
+    {"roe": math.nan, "rent_neta_ventas": math.nan},
+])
+def test_rule_based_nan_is_not_zero(row):
+    assert rule_based_financials_batch([row])[0]["score"] == rule_based_financials(row)["score"]
+
+
+@pytest.mark.parametrize("row", [
+    {"ingresos_ventas": 100.0, "deuda_total": math.nan},
+    {"ingresos_ventas": math.nan, "deuda_total": 50.0},
+    {"ingresos_ventas": 100.0, "utilidad_neta": math.nan, "liquidez_corriente": math.nan},
+])
+def test_heuristic_nan_follows_python_min_max(row):
+    assert heuristic_financials_batch([row])[0]["score"] == heuristic_financials(row)["score"]
+
+
+def test_empty_batch():
+    assert rule_based_financials_batch([]) == []
+    assert heuristic_financials_batch([]) == []
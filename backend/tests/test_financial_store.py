@@ -0,0 +1,93 @@
+"""Ingesta de exportaciones tipo SuperCías: números es-EC, separador y lectura por RUC."""
+import pandas as pd
+import pytest
+
+from app.services.financial_store import (
+    _sniff_encoding, _sniff_sep, _to_number, get_financials, get_many, ingest_file, normalize_ruc,
+)
+
+
+@pytest.mark.parametrize("values, expected", [
+    (["1.234", "56.789", "999"], [1234, 56789, 999]),          # solo miles con punto (es-EC)
+    (["1.234,56", "1.234"], [1234.56, 1234]),
+    (["1.234.567", "-1.234"], [1234567, -1234]),
+    (["0.125", "1.250"], [0.125, 1.25]),                        # columna con punto decimal
+    (["1,234.56", "1.234"], [1234.56, 1.234]),
+    (["1.234.567", "0.5"], [1234567, 0.5]),
+    (["1,5", "1,234"], [1.5, 1234]),
+])
+def test_to_number(values, expected):
+    assert _to_number(pd.Series(values, dtype=object)).tolist() == pytest.approx(expected)
+
+
+def test_to_number_invalid_is_nan():
+    assert _to_number(pd.Series([None, "", "abc"], dtype=object)).isna().all()
+
+
+def test_normalize_ruc():
+    assert normalize_ruc("990000000001") == "0990000000001"
+    assert normalize_ruc("1790012345001.0") == "1790012345001"
+    assert normalize_ruc(None) is None
+
+
+@pytest.mark.parametrize("header, sep", [
+    ("RUC;Razón Social;Activo Total\n", ";"),
+    ("ruc,nombre,activos\n", ","),
+    ("ruc\tnombre\n", "\t"),
+    ("ruc\n", ","),
+])
+def test_sniff_sep(tmp_path, header, sep):
+    p = tmp_path / "f.csv"
+    p.write_text(header + "x\n", encoding="utf-8")
+    assert _sniff_sep(p) == sep
+
+
+def test_ingest_es_ec_csv(tmp_path):
+    csv = tmp_path / "ranking.csv"
+    csv.write_text(
+        "RUC;Razón Social;Año;Activo Total;Patrimonio;Utilidad Neta;Liquidez Corriente;ROE\n"
+        "990000000001;Comercial Uno S.A.;2023;1.234.567,89;250.000;12.345,6;1,45;0,12\n"
+        "1790012345001;Dos Cía. Ltda.;2023;98.765;10.500;-1.200;0,8;-0,05\n",
+        encoding="utf-8",
+    )
+    db = tmp_path / "fin.sqlite"
+    res = ingest_file(csv, db_path=db)
+    assert (res["rows_read"], res["rows_written"]) == (2, 2)
+
+    one = get_financials("0990000000001", path=db)
+    assert one["nombre"] == "Comercial Uno S.A." and one["anio"] == 2023
+    assert (one["activos"], one["patrimonio"], one["utilidad_neta"]) == (1234567.89, 250000, 12345.6)
+    assert (one["liquidez_corriente"], one["roe"]) == (1.45, 0.12)
+
+    two = get_many(["1790012345001"], path=db)["1790012345001"]
+    assert (two["activos"], two["patrimonio"], two["utilidad_neta"], two["roe"]) == (98765, 10500, -1200, -0.05)
+
+
+@pytest.mark.parametrize("chunksize", [1, 2, 50_000])
+def test_ingest_convention_does_not_depend_on_chunks(tmp_path, chunksize):
+    # el punto decimal aparece recién en el último lote: "1.234" sigue siendo 1.234 en el primero
+    csv = tmp_path / "mixed.csv"
+    csv.write_text(
+        "RUC;Activo Total;Patrimonio\n"
+        "0990000000001;1.234;1.234\n"
+        "0990000000002;2.500;56.789\n"
+        "0990000000003;0.5;1.000.000\n",
+        encoding="utf-8",
+    )
+    db = tmp_path / f"fin{chunksize}.sqlite"
+    ingest_file(csv, db_path=db, chunksize=chunksize)
+    got = get_many(["0990000000001", "0990000000002", "0990000000003"], path=db)
+    assert [got[r]["activos"] for r in sorted(got)] == [1.234, 2.5, 0.5]
+    assert [got[r]["patrimonio"] for r in sorted(got)] == [1234, 56789, 1000000]  # sin punto decimal: miles
+
+
+def test_ingest_latin1_export(tmp_path):
+    csv = tmp_path / "supercias.csv"
+    csv.write_bytes(
+        "RUC;Razón Social;Año;Activo Total\n0990000000001;Compañía Ñandú S.A.;2023;1.234,5\n".encode("latin-1")
+    )
+    assert _sniff_encoding(csv) == "latin-1"
+    assert _sniff_sep(csv, "latin-1") == ";"
+    ingest_file(csv, db_path=tmp_path / "fin.sqlite")
+    one = get_financials("0990000000001", path=tmp_path / "fin.sqlite")
+    assert (one["nombre"], one["anio"], one["activos"]) == ("Compañía Ñandú S.A.", 2023, 1234.5)
@@ -0,0 +1,93 @@
+"""Fusión por lotes: fila a fila idéntica a fuse_scores; errores por fila en /api/orchestrate/batch."""
+import random
+
+import pytest
+
+from app import pipeline
+from app.pipeline import DEFAULT_WEIGHTS, fuse_scores, fuse_scores_batch
+
+FIN_ROWS = {
+    "0990000000001": {"ruc": "0990000000001", "activos": 1_000_000, "patrimonio": 400_000, "utilidad_neta": 50_000,
+                      "ingresos_ventas": 900_000, "liquidez_corriente": 1.6, "roe": 0.12},
+    "1790012345001": {"ruc": "1790012345001", "activos": 80_000, "patrimonio": -5_000, "utilidad_neta": -9_000,
+                      "liquidez_corriente": 0.4},
+}
+
+
+@pytest.fixture(autouse=True)
+def _financials(monkeypatch):
+    monkeypatch.setattr(pipeline, "get_financials", lambda ruc: FIN_ROWS.get(ruc))
+    monkeypatch.setattr(pipeline, "get_many", lambda rucs: {r: FIN_ROWS[r] for r in rucs if r in FIN_ROWS})
+
+
+def _sentiment(rng):
+    return rng.choice([None, {"n": 0}, {"n": 2, "mean": 0.9}, {"n": rng.randint(5, 80), "mean": rng.uniform(-1, 1)}])
+
+
+def _maps(rng):
+    kind = rng.randrange(6)
+    if kind == 0:
+        return None
+    if kind == 1:
+        return {"rating": None}
+    if kind == 2:
+        return {"rating": "n/d"}
+    return {
+        "rating": round(rng.uniform(1, 5), 1),
+        "user_ratings_total": rng.choice([0, 1, 9, 10, rng.randint(0, 5000)]),
+        "sentiment": _sentiment(rng),
+    }
+
+
+def _tiktok(rng):
+    kind = rng.randrange(5)
+    if kind == 0:
+        return None
+    if kind == 1:
+        return {"overview": {}}
+    return {"overview": {"risk_score": rng.choice([0, 33, 66, 150, -10, rng.uniform(0, 100)]),
+                         "sentiment": _sentiment(rng)}}
+
+
+def _weights(rng):
+    return rng.choice([
+        None, {}, DEFAULT_WEIGHTS, {"fin": 0.0, "maps": 0.0, "tt": 0.0}, {"fin": 0.0, "maps": 0.5, "tt": 0.5},
+        {"fin": 1.0, "maps": 0.0, "tt": 0.0}, {k: rng.uniform(0, 1) for k in ("fin", "maps", "tt")},
+    ])
+
+
+def _assert_same(rows):
+    batch = fuse_scores_batch(*map(list, zip(*rows)))
+    for row, got in zip(rows, batch):
+        assert got == fuse_scores(*row), row
+
+
+def test_batch_matches_scalar_on_random_rows():
+    rng = random.Random(20240101)
+    rucs = ["", "0990000000001", "1790012345001", "0999999999001"]  # sin RUC / con datos / placeholder
+    _assert_same([(rng.choice(rucs), _maps(rng), _tiktok(rng), _weights(rng)) for _ in range(500)])
+
+
+@pytest.mark.parametrize("risk, label", [(32.99, "bajo"), (33, "medio"), (65.99, "medio"), (66, "alto")])
+def test_label_boundaries(risk, label):
+    row = ("", None, {"overview": {"risk_score": risk}}, {"fin": 0.6, "maps": 0.0, "tt": 1.0})
+    assert fuse_scores(*row)["risk_label"] == label
+    _assert_same([row])
+
+
+def test_batch_endpoint_reports_errors_per_row(client):
+    items = [
+        {"ruc": "0990000000001", "mock": True},
+        {"ruc": "123", "mock": True},                                  # RUC demasiado corto
+        {"ruc": "0990000000001", "mock": True, "weights": {"fin": 1.0}},  # pesos incompletos
+    ]
+    r = client.post("/api/orchestrate/batch", json={"items": items})
+    assert r.status_code == 200
+    res = r.json()["results"]
+    assert [x["ok"] for x in res] == [True, False, False]
+    assert res[1]["error"].startswith("invalid request: ruc")
+    assert "weights sin claves" in res[2]["error"] and res[2]["result"] is None
+
+    single = client.post("/api/orchestrate", json=items[0]).json()
+    for k in ("component_scores", "final_score", "risk_label"):
+        assert res[0]["result"][k] == single[k]
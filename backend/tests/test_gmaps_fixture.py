@@ -0,0 +1,113 @@
+"""Scraper de Maps contra el HTML de data/fixtures/gmaps (scripts/fixture_server.py), sin red."""
+import asyncio
+import os
+
+import pytest
+
+from app.scrapers import gmaps
+from app.scrapers.gmaps import _parse_rating, _parse_reviews
+from app.scripts.fixture_server import serve_in_background
+
+
+def test_parse_rating_and_reviews():
+    assert _parse_rating("4,5") == 4.5
+    assert _parse_rating("") == 0.0
+    assert _parse_reviews("1.234 reseñas") == 1234
+    assert _parse_reviews(None) == 0
+
+
+def _chromium_available() -> bool:
+    if not gmaps.PLAYWRIGHT_OK:
+        return False
+    try:
+        from playwright.sync_api import sync_playwright
+
+        with sync_playwright() as p:
+            return os.path.exists(p.chromium.executable_path)
+    except Exception:
+        return False
+
+
+@pytest.fixture(scope="module")
+def maps_server():
+    if not _chromium_available():
+        pytest.skip("Playwright o Chromium no disponible")
+    from app.services.browser_pool import close_pool
+
+    srv = serve_in_background("gmaps")
+    yield srv
+    srv.shutdown()
+    asyncio.run(close_pool())
+
+
+@pytest.fixture
+def fixture_maps(maps_server, monkeypatch):
+    monkeypatch.setattr(gmaps, "GMAPS_BASE_URL", maps_server.base_url + "/maps")
+    return maps_server
+
+
+@pytest.mark.parametrize("lean", [True, False])
+def test_scrape_fixture_place(fixture_maps, lean):
+    r = gmaps.scrape_gmaps("Nike Miraflores", lean=lean)
+    assert "error" not in r, r
+    assert (r["rating"], r["reviews"]) == (4.5, 1234)
+
+
+def test_scrape_place_without_reviews(fixture_maps):
+    r = gmaps.scrape_gmaps("Panaderia sin resenas")
+    assert (r["rating"], r["reviews"]) == (0.0, 0)
+
+
+def test_scrape_many_keeps_order(fixture_maps):
+    res = gmaps.scrape_gmaps_many(["Cafe Quito Centro", "Ferreteria El Tornillo"], tabs=2)
+    assert [(r["rating"], r["reviews"]) for r in res] == [(4.1, 87), (3.6, 12)]
+
+
+def test_streamed_reviews_respect_limit(fixture_maps):
+    reviews = list(gmaps.iter_gmaps_reviews_sync("Nike Miraflores", max_reviews=25))
+    assert len(reviews) == 25
+    assert all(r["text"] and 1 <= r["stars"] <= 5 for r in reviews)
+    assert len({r["id"] for r in reviews}) == 25
+
+
+@pytest.fixture
+def maps_watermarks(fixture_maps, monkeypatch, tmp_path):
+    from app.analysis import sentiment
+    from app.services.cache import TieredCache
+    from app.services.watermarks import WatermarkStore
+
+    monkeypatch.setattr(gmaps, "GMAPS_SENTIMENT_REVIEWS", 20)
+    monkeypatch.setattr(gmaps, "WATERMARKS_ENABLED", True)
+    monkeypatch.setattr(gmaps, "watermarks", WatermarkStore(tmp_path / "wm.sqlite"))
+    monkeypatch.setattr(
+        sentiment, "sentiment_cache", TieredCache(tmp_path / "s.sqlite", ttls={"sentiment": 60})
+    )
+
+    def scrape(params: str):
+        monkeypatch.setattr(gmaps, "GMAPS_BASE_URL", f"{fixture_maps.base_url}/maps?{params}")
+        return gmaps.scrape_gmaps("Ferreteria El Tornillo")
+
+    return scrape
+
+
+def _ids(r):
+    return [x["id"] for x in r["review_items"]]
+
+
+def test_rescrape_without_sort_menu_reads_everything(maps_watermarks):
+    # orden por relevancia: las reseñas nuevas van después de una ya vista
+    first = maps_watermarks("")
+    assert len(first["review_items"]) == 12
+    again = maps_watermarks("new=3")
+    assert {"r22-n0", "r22-n1", "r22-n2"} <= set(_ids(again))
+    assert len(again["review_items"]) == 15
+    assert again["totals"]["sentiment"]["n"] == 15
+
+
+def test_rescrape_sorted_stops_at_known_review(maps_watermarks):
+    first = maps_watermarks("sort=1")
+    assert len(first["review_items"]) == 12
+    again = maps_watermarks("sort=1&new=3")
+    assert _ids(again)[:3] == ["r22-n2", "r22-n1", "r22-n0"]
+    assert len(again["review_items"]) == 15
+    assert again["totals"]["sentiment"]["n"] == 15
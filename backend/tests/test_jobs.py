@@ -0,0 +1,138 @@
+"""Cola de trabajos: encolar → correr → resultado, parciales, cancelación y trabajos huérfanos."""
+import asyncio
+import time
+
+import pytest
+
+from app import pipeline
+from app.services.jobs import STALE_AFTER_S, JobQueue
+
+
+def _wait(q, job_id, statuses=("done", "failed", "cancelled"), timeout=10.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        job = q.get(job_id)
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} sigue en {q.get(job_id)['status']}")
+
+
+@pytest.fixture
+def queue(tmp_path):
+    q = JobQueue(tmp_path / "jobs.sqlite", workers=1, timeout=30)
+    yield q
+    q.stop()
+
+
+def test_lifecycle_mock_orchestration(queue):
+    job_id = queue.submit({"ruc": "0990000000001", "mock": True})
+    assert queue.get(job_id)["status"] == "queued"
+    queue.start()
+    job = _wait(queue, job_id)
+    assert job["status"] == "done", job["error"]
+    assert job["result"]["ruc"] == "0990000000001" and 0 <= job["result"]["final_score"] <= 1
+    assert set(job["partial"]) == {"gmaps", "tiktok"}
+    assert {"queue_wait_ms", "run_ms"} <= set(job["timings"])
+    assert queue.stats()["counts"] == {"done": 1}
+
+
+def test_progress_is_flushed_before_the_result(queue, monkeypatch):
+    async def fake(ruc, progress=None, **kw):
+        for i in range(20):  # ráfaga: se juntan en pocas escrituras
+            progress(f"s{i}", {"i": i})
+        await asyncio.sleep(0)
+        return {"ruc": ruc}
+
+    monkeypatch.setattr(pipeline, "orchestrate_async", fake)
+    queue.start()
+    job = _wait(queue, queue.submit({"ruc": "0990000000001"}))
+    assert job["status"] == "done"
+    assert job["partial"] == {f"s{i}": {"i": i} for i in range(20)}
+
+
+def test_cancel_running_job(queue, monkeypatch):
+    started = []
+
+    async def slow(ruc, progress=None, **kw):
+        started.append(ruc)
+        await asyncio.sleep(30)
+
+    monkeypatch.setattr(pipeline, "orchestrate_async", slow)
+    queue.start()
+    job_id = queue.submit({"ruc": "0990000000001"})
+    end = time.monotonic() + 5
+    while not started and time.monotonic() < end:
+        time.sleep(0.02)
+    assert queue.cancel(job_id) == "cancelled"
+    assert _wait(queue, job_id)["status"] == "cancelled"
+    end = time.monotonic() + 5
+    while queue.stats()["running_here"] and time.monotonic() < end:
+        time.sleep(0.02)
+    assert queue.stats()["running_here"] == 0
+
+
+def test_cancel_queued_job_is_never_claimed(queue):
+    job_id = queue.submit({"ruc": "0990000000001", "mock": True})
+    assert queue.cancel(job_id) == "cancelled"
+    assert queue._claim() is None
+    assert queue.cancel("no-existe") is None
+
+
+def _orphan_and_live(queue):
+    old = queue.submit({"ruc": "0990000000001", "mock": True})
+    live = queue.submit({"ruc": "0990000000002", "mock": True})
+    now = time.time()
+    # `old` quedó de un worker que murió (sin latido); `live` lo corre otro worker vivo
+    queue._update(old, status="running", worker="otro:1", heartbeat_at=now - STALE_AFTER_S - 1)
+    queue._update(live, status="running", worker="otro:2", heartbeat_at=now)
+    return old, live
+
+
+def test_claim_takes_stale_job_only(queue):
+    old, live = _orphan_and_live(queue)
+    row = queue._claim()
+    assert row["id"] == old
+    assert queue._claim() is None  # el vivo no se toma
+    assert queue.get(old)["status"] == "running"
+
+
+def test_stale_job_runs_to_completion(queue):
+    old, live = _orphan_and_live(queue)
+    queue.start()
+    job = _wait(queue, old)
+    assert job["status"] == "done" and job["result"]["ruc"] == "0990000000001"
+    assert queue.get(live)["status"] == "running"
+
+
+def test_job_budget_is_job_timeout(tmp_path, monkeypatch):
+    seen = []
+
+    async def fake(ruc, progress=None, deadline_ms=None, **kw):
+        seen.append(deadline_ms)
+        return {"ruc": ruc}
+
+    monkeypatch.setattr(pipeline, "orchestrate_async", fake)
+    q = JobQueue(tmp_path / "jobs.sqlite", workers=1, timeout=7)
+    try:
+        q.start()
+        _wait(q, q.submit({"ruc": "0990000000001"}))
+        _wait(q, q.submit({"ruc": "0990000000001", "deadline_ms": 1234}))
+    finally:
+        q.stop()
+    assert seen == [7000, 1234]  # no el ORCHESTRATE_DEADLINE_MS de los requests interactivos
+
+
+def test_job_over_timeout_fails(tmp_path, monkeypatch):
+    async def slow(ruc, progress=None, **kw):
+        await asyncio.sleep(30)
+
+    monkeypatch.setattr(pipeline, "orchestrate_async", slow)
+    q = JobQueue(tmp_path / "jobs.sqlite", workers=1, timeout=0.2)
+    try:
+        q.start()
+        job = _wait(q, q.submit({"ruc": "0990000000001"}))
+    finally:
+        q.stop()
+    assert (job["status"], job["error"]) == ("failed", "timeout")
+    assert job["timings"]["run_ms"] >= 200
@@ -0,0 +1,95 @@
+"""Análisis financiero con LLM contra el stub local de OpenAI (scripts/llm_stub.py)."""
+import asyncio
+import socket
+
+import pytest
+
+pytest.importorskip("openai")
+
+from app.analysis.finance_rules import rule_based_financials
+from app.scripts.llm_stub import serve_in_background
+from app.services import llm_finance
+from app.services.cache import TieredCache
+
+ROW = {"ruc": "0990000000001", "patrimonio": 120000.0, "utilidad_neta": 8000.0, "liquidez_corriente": 1.4}
+
+
+@pytest.fixture(scope="module")
+def stub():
+    srv = serve_in_background()
+    yield srv
+    srv.shutdown()
+
+
+@pytest.fixture
+def llm(stub, tmp_path, monkeypatch):
+    """llm_finance apuntando al stub, con clientes y caché nuevos."""
+    monkeypatch.setattr(llm_finance, "OPENAI_API_KEY", "stub")
+    monkeypatch.setattr(llm_finance, "OPENAI_BASE_URL", stub.base_url)
+    monkeypatch.setattr(llm_finance, "_client", None)
+    monkeypatch.setattr(llm_finance, "_loop_state", type(llm_finance._loop_state)())
+    monkeypatch.setattr(llm_finance, "llm_cache", TieredCache(tmp_path / "llm.sqlite", ttls={"llm": 3600}))
+    with stub.lock:
+        stub.calls = 0
+    return stub
+
+
+def test_analyze_uses_llm_and_caches(llm):
+    res = llm_finance.analyze_financials(ROW)
+    assert res["comments"] == ["Stub: factor 1", "Stub: factor 2", "Stub: factor 3"]
+    assert 0 <= res["score"] <= 100
+    assert res["level"] == ("low" if res["score"] < 30 else "medium" if res["score"] < 70 else "high")
+    assert res["details"] == ROW
+    assert llm_finance.analyze_financials(dict(ROW)) == res
+    assert llm.calls == 1
+
+
+def test_cache_key_ignores_equivalent_inputs():
+    assert llm_finance.cache_key({"a": 100.0, "b": None}) == llm_finance.cache_key({"a": 100})
+    assert llm_finance.cache_key({"a": 100.5}) != llm_finance.cache_key({"a": 100})
+
+
+def test_async_matches_sync(llm):
+    sync = llm_finance.analyze_financials(ROW)
+    assert asyncio.run(llm_finance.analyze_financials_async(ROW)) == sync
+    assert llm.calls == 1  # la segunda sale de la caché compartida
+
+
+def test_batch_deduplicates_identical_inputs(llm):
+    items = [dict(ROW, ruc=str(i % 3)) for i in range(9)]
+    res = llm_finance.analyze_financials_batch(items)
+    assert [r["details"] for r in res] == items
+    assert llm.calls == 3
+    assert res[0]["score"] == res[3]["score"] == res[6]["score"]
+
+
+def test_falls_back_to_rules_when_llm_unreachable(llm, monkeypatch):
+    with socket.socket() as sock:  # puerto libre y cerrado: conexión rechazada
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    monkeypatch.setattr(llm_finance, "OPENAI_BASE_URL", f"http://127.0.0.1:{port}/v1")
+    assert llm_finance.analyze_financials(ROW) == rule_based_financials(ROW)
+    assert asyncio.run(llm_finance.analyze_financials_async(ROW)) == rule_based_financials(ROW)
+    assert llm.calls == 0
+
+
+def test_disabled_without_api_key(monkeypatch):
+    monkeypatch.setattr(llm_finance, "OPENAI_API_KEY", None)
+    assert llm_finance.analyze_financials(ROW) == rule_based_financials(ROW)
+
+
+def test_batch_closes_its_loop_client(llm, monkeypatch):
+    clients = []
+    get_state = llm_finance._get_async_state
+
+    def spy():
+        st = get_state()
+        clients.append(st["client"])
+        return st
+
+    monkeypatch.setattr(llm_finance, "_get_async_state", spy)
+    for n in range(2):  # un asyncio.run por llamada: un cliente por llamada, cerrado al salir
+        llm_finance.analyze_financials_batch([dict(ROW, ruc=f"{n}-{i}") for i in range(3)])
+    assert len({id(c) for c in clients}) == 2
+    assert all(c.is_closed() for c in clients)
+    assert len(llm_finance._loop_state) == 0
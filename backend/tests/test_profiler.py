@@ -0,0 +1,27 @@
+"""Perfilador por request: nombres de frame y escritura de archivos."""
+import asyncio
+
+from app.services import profiler
+
+
+def test_frame_name_without_co_qualname():
+    # Python 3.10: los code objects no tienen co_qualname
+    class Code:
+        co_name = "f"
+        co_filename = "x.py"
+        co_firstlineno = 3
+
+    code = Code()
+    s = profiler.Sampler()
+    assert s.frames[s._frame_id(code)] == ("f", "x.py", 3)
+
+
+def test_finish_async_writes_profile(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiler, "PROFILE_DIR", tmp_path)
+    prof = profiler.RequestProfile("GET", "/api/x", interval_ms=1)
+    sum(i * i for i in range(200_000))
+    meta = asyncio.run(prof.finish_async(200))
+    assert meta is not None and meta.exists()
+    assert (tmp_path / f"{prof.id}.speedscope.json").exists()
+    assert [m["id"] for m in profiler.list_profiles()] == [prof.id]
+    assert asyncio.run(prof.finish_async(200)) is None  # solo una vez
@@ -0,0 +1,117 @@
+"""Límite de tasa por dominio en SQLite: turnos, concurrencia y lock disputado."""
+import asyncio
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from app.services import rate_limit
+from app.services.rate_limit import Blocked, RateLimiter, parse_limits
+
+
+def _limiter(tmp_path, spec):
+    return RateLimiter(db_path=tmp_path / "rl.sqlite", limits=spec, enabled=True)
+
+
+def test_parse_limits():
+    assert parse_limits("google.com=30/5/4, tiktok.com=12/0/2") == {
+        "google.com": {"per_min": 30.0, "burst": 5.0, "concurrency": 4},
+        "tiktok.com": {"per_min": 12.0, "burst": 1.0, "concurrency": 2},
+    }
+
+
+def test_unlisted_domain_is_not_limited(tmp_path):
+    rl = _limiter(tmp_path, "google.com=1/1/1")
+
+    async def go():
+        async with rl.slot("http://127.0.0.1:8000/x") as domain:
+            return domain
+
+    assert asyncio.run(go()) is None
+
+
+def test_burst_then_wait(tmp_path):
+    rl = _limiter(tmp_path, "example.com=600/2/4")  # 10 por segundo tras la ráfaga
+
+    async def go():
+        t0 = time.perf_counter()
+        for _ in range(4):
+            async with rl.slot("https://www.example.com/a"):
+                pass
+        return time.perf_counter() - t0
+
+    assert asyncio.run(go()) >= 0.15  # 2 de ráfaga + 2 a 0.1 s
+    assert rl.stats()["granted"] == 4
+
+
+def test_per_min_zero_only_limits_concurrency(tmp_path):
+    rl = _limiter(tmp_path, "example.com=0/1/2")
+    active = {"now": 0, "max": 0}
+
+    async def one():
+        async with rl.slot("https://example.com/"):
+            active["now"] += 1
+            active["max"] = max(active["max"], active["now"])
+            await asyncio.sleep(0.05)
+            active["now"] -= 1
+
+    async def go():
+        await asyncio.gather(*(one() for _ in range(6)))
+
+    asyncio.run(go())
+    assert active["max"] == 2
+    assert rl.stats()["granted"] == 6
+
+
+def test_blocked_pauses_domain(tmp_path):
+    rl = _limiter(tmp_path, "example.com=60/5/1")
+
+    async def go():
+        with pytest.raises(Blocked):
+            async with rl.slot("https://example.com/"):
+                raise Blocked("captcha")
+
+    asyncio.run(go())
+    dom = rl.stats()["domains"]["example.com"]
+    assert dom["blocks"] == 1 and dom["paused_s"] > 0 and dom["factor"] < 1
+
+
+def test_lock_timeout_is_retried_without_blocking_the_loop(tmp_path, monkeypatch):
+    monkeypatch.setattr(rate_limit, "BUSY_TIMEOUT_S", 0.05)
+    rl = _limiter(tmp_path, "example.com=600/5/2")
+    rl.stats()  # crea el esquema
+
+    held = threading.Event()
+
+    def hold_lock():
+        conn = sqlite3.connect(tmp_path / "rl.sqlite", isolation_level=None)
+        conn.execute("BEGIN IMMEDIATE")
+        held.set()
+        time.sleep(0.4)
+        conn.execute("COMMIT")
+        conn.close()
+
+    th = threading.Thread(target=hold_lock)
+    th.start()
+    held.wait()
+
+    async def go():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        t = asyncio.ensure_future(ticker())
+        async with rl.slot("https://example.com/") as domain:
+            pass
+        t.cancel()
+        return domain, ticks
+
+    domain, ticks = asyncio.run(go())
+    th.join()
+    assert domain == "example.com"
+    assert ticks >= 10  # el loop siguió corriendo mientras el lock estaba tomado
@@ -0,0 +1,74 @@
+"""Historial de resultados: escritor por lotes en segundo plano, lecturas por RUC y /api/results."""
+import threading
+
+from app.services.results_store import ResultStore, results_store
+
+
+def _result(ruc, score):
+    return {
+        "ruc": ruc, "final_score": score, "risk_label": "medio",
+        "component_scores": {"fin": 0.6, "maps": None, "tt": score},
+        "used_files": {"gmaps": None, "tiktok": "sample_tiktok.json"}, "_generated_at": "2024-01-01T00:00:00Z",
+    }
+
+
+def test_reads_before_any_write(tmp_path):
+    store = ResultStore(tmp_path / "r.sqlite")
+    assert store.history("0990000000001") == [] and store.latest("0990000000001") is None
+    assert store.latest_many(["0990000000001"]) == {}
+    store.flush()  # sin escritor: no espera
+
+
+def test_concurrent_writers_then_flush(tmp_path):
+    store = ResultStore(tmp_path / "r.sqlite", batch_size=10)
+    rucs = [f"09900000000{i:02d}" for i in range(5)]
+
+    def writer(ruc):
+        for k in range(50):
+            store.record(_result(ruc, k / 100), weights={"fin": 0.6, "maps": 0.25, "tt": 0.15})
+
+    threads = [threading.Thread(target=writer, args=(r,)) for r in rucs]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    store.flush()
+
+    stats = store.stats()
+    assert (stats["written"], stats["pending"], stats["errors"]) == (250, 0, 0)
+    assert stats["batches"] >= 25  # lotes de hasta 10
+    for ruc in rucs:
+        latest = store.latest(ruc)
+        assert latest["final_score"] == 0.49  # el último que escribió su hilo
+        assert latest["component_scores"] == {"fin": 0.6, "maps": None, "tt": 0.49}
+        assert latest["weights"] == {"fin": 0.6, "maps": 0.25, "tt": 0.15}
+        assert latest["used_files"]["tiktok"] == "sample_tiktok.json"
+        assert len(store.history(ruc, limit=100)) == 50
+
+
+def test_history_pages_and_normalized_ruc(tmp_path):
+    store = ResultStore(tmp_path / "r.sqlite")
+    for k in range(5):
+        store.record(_result("990000000001", k / 10))  # sin el 0 inicial
+    store.flush()
+
+    page = store.history("0990000000001", limit=2)
+    assert [r["final_score"] for r in page] == [0.4, 0.3]
+    rest = store.history("990000000001", limit=10, before_id=page[-1]["id"])
+    assert [r["final_score"] for r in rest] == [0.2, 0.1, 0.0]
+    many = store.latest_many(["990000000001", "0990000000999"])
+    assert list(many) == ["990000000001"] and many["990000000001"]["final_score"] == 0.4
+
+
+def test_results_endpoint(client):
+    ruc = "0990000000777"
+    assert client.get(f"/api/results/{ruc}").status_code == 404
+    scores = [client.post("/api/orchestrate", json={"ruc": ruc, "mock": True}).json()["final_score"] for _ in range(3)]
+    results_store.flush()
+
+    body = client.get(f"/api/results/{ruc}", params={"limit": 2}).json()
+    assert body["latest"]["final_score"] == scores[-1]
+    assert len(body["history"]) == 2 and body["next_before_id"] == body["history"][-1]["id"]
+    older = client.get(f"/api/results/{ruc}", params={"limit": 2, "before_id": body["next_before_id"]}).json()
+    assert len(older["history"]) == 1 and older["next_before_id"] is None
+    assert older["latest"]["id"] == body["latest"]["id"]
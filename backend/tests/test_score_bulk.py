@@ -0,0 +1,94 @@
+"""Scoring masivo: checkpoint del JSONL, reanudación y validación de --chunk."""
+import json
+
+import pytest
+
+from app.scripts.score_bulk import JsonlSink, ParquetSink, chunks, run
+
+
+def _rows(idx, n=2):
+    return [{"ruc": f"{idx}-{i}", "final_score": 0.5} for i in range(n)]
+
+
+def _lines(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_chunks_numbering():
+    got = list(chunks(iter(range(5)), 2))
+    assert got == [(0, [0, 1]), (1, [2, 3]), (2, [4])]
+
+
+def test_resume_truncates_after_last_checkpoint(tmp_path):
+    out = tmp_path / "scores.jsonl"
+    sink = JsonlSink(out, resume=False, chunk=2)
+    sink.write(0, _rows(0))
+    sink.write(1, _rows(1))
+    sink.close()
+    # caída a mitad del bloque 2: filas sin anotar y una línea de checkpoint cortada
+    with open(out, "a", encoding="utf-8") as f:
+        f.write(json.dumps(_rows(2)[0]) + "\n" + '{"ruc": "2-1", "fin')
+    with open(out.with_name("scores.jsonl.ckpt"), "a", encoding="utf-8") as f:
+        f.write('{"chunk": 2, "si')
+
+    sink = JsonlSink(out, resume=True, chunk=2)
+    assert sink.done == {0, 1}
+    sink.write(2, _rows(2))
+    sink.close()
+    assert [r["ruc"] for r in _lines(out)] == ["0-0", "0-1", "1-0", "1-1", "2-0", "2-1"]
+    ckpt = _lines(out.with_name("scores.jsonl.ckpt"))
+    assert [c["chunk"] for c in ckpt] == [0, 1, 2]
+    assert ckpt[-1]["offset"] == out.stat().st_size
+
+
+def test_resume_refuses_other_chunk_size(tmp_path):
+    out = tmp_path / "scores.jsonl"
+    sink = JsonlSink(out, resume=False, chunk=2)
+    sink.write(0, _rows(0))
+    sink.close()
+    with pytest.raises(SystemExit, match="--chunk 2"):
+        JsonlSink(out, resume=True, chunk=3)
+
+
+def test_without_resume_starts_over(tmp_path):
+    out = tmp_path / "scores.jsonl"
+    sink = JsonlSink(out, resume=False, chunk=2)
+    sink.write(0, _rows(0))
+    sink.close()
+    sink = JsonlSink(out, resume=False, chunk=2)
+    assert sink.done == set()
+    sink.close()
+    assert out.read_bytes() == b"" and out.with_name("scores.jsonl.ckpt").read_text() == ""
+
+
+def test_run_resumes_skipping_finished_chunks(tmp_path):
+    src = tmp_path / "cartera.csv"
+    src.write_text("ruc;tiktok;maps\n" + "".join(f"09900000000{i:02d};shop{i};Local {i}\n" for i in range(5)))
+    out = tmp_path / "scores.jsonl"
+    opts = {"mock": True, "run_scrapers": False, "deadline_ms": None, "video_limit": 10}
+
+    first = run(src, out, workers=1, chunk=2, opts=opts, resume=False, progress_s=60)
+    assert (first["rows"], first["errors"], first["chunks_skipped"]) == (5, 0, 0)
+
+    # caída antes de anotar el último bloque escrito (los bloques terminan en cualquier
+    # orden), con basura al final
+    ckpt = out.with_name("scores.jsonl.ckpt")
+    marks = ckpt.read_text(encoding="utf-8").splitlines()
+    ckpt.write_text("\n".join(marks[:-1]) + "\n", encoding="utf-8")
+    with open(out, "a", encoding="utf-8") as f:
+        f.write('{"ruc": "a medias')
+
+    again = run(src, out, workers=1, chunk=2, opts=opts, resume=True, progress_s=60)
+    assert (again["rows"], again["chunks_skipped"]) == (json.loads(marks[-1])["rows"], 2)
+    rucs = [r["ruc"] for r in _lines(out)]
+    assert sorted(rucs) == [f"09900000000{i:02d}" for i in range(5)]
+
+
+def test_parquet_resume_without_chunk_file(tmp_path):
+    pytest.importorskip("pyarrow")
+    out = tmp_path / "scores"
+    ParquetSink(out, resume=False, chunk=2).write(0, _rows(0))
+    (out / "_chunk").unlink()  # partes sin `_chunk`: no hay con qué comparar, se reanuda
+    assert ParquetSink(out, resume=True, chunk=2).done == {0}
+    with pytest.raises(SystemExit, match="--chunk 2"):
+        ParquetSink(out, resume=True, chunk=3)
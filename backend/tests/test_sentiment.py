@@ -0,0 +1,123 @@
+"""Sentimiento: caché por id/hash, pool de procesos, idioma y efecto en los scores de Maps/TikTok."""
+import asyncio
+import threading
+
+import pytest
+
+from app import pipeline
+from app.analysis import sentiment
+from app.analysis.sentiment import analyze, detect_lang, score_text, score_texts
+
+
+def test_scrape_payloads_score_off_the_event_loop(monkeypatch, sentiment_cache):
+    raws = {
+        "gmaps": {"query": "x", "rating": 4.2, "reviews": 10,
+                  "review_items": [{"id": f"r{i}", "text": "Excelente atención"} for i in range(6)]},
+        "tiktok": {"username": "x", "followers": 100,
+                   "videos": [{"id": "v", "likes": 5, "comment_items": [{"id": "c", "text": "malo"}]}]},
+    }
+    threads = []
+
+    async def fetch(source, query, refresh, flags, **opts):
+        return raws[source]
+
+    def spy(fn):
+        def wrapped(raw):
+            threads.append(threading.get_ident())
+            return fn(raw)
+        return wrapped
+
+    monkeypatch.setattr(pipeline, "_fetch_bounded", fetch)
+    monkeypatch.setattr(pipeline, "summarize_maps", spy(pipeline.summarize_maps))
+    monkeypatch.setattr(pipeline, "summarize_tiktok", spy(pipeline.summarize_tiktok))
+
+    async def go():
+        loop_thread = threading.get_ident()
+        used = {"gmaps": None, "tiktok": None}
+        maps, tt = await pipeline._scrape_payloads("x", "x", used)
+        return loop_thread, maps, tt
+
+    loop_thread, maps, tt = asyncio.run(go())
+    assert len(threads) == 2 and loop_thread not in threads
+    assert maps["sentiment"]["n"] == 6 and tt["overview"]["risk_score"] >= 0
+
+
+
+@pytest.fixture
+def scored(monkeypatch):
+    """Textos que llegan a `score_texts` (lo que no salió de la caché)."""
+    seen = []
+    real = sentiment.score_texts
+
+    def spy(texts, workers=None):
+        seen.extend(texts)
+        return real(texts, workers)
+
+    monkeypatch.setattr(sentiment, "score_texts", spy)
+    return seen
+
+
+def test_rerun_scores_only_new_texts(sentiment_cache, scored):
+    items = [{"id": f"c{i}", "text": f"Muy buena atención {i}"} for i in range(5)]
+    first = analyze(items, "tiktok")
+    assert len(scored) == 5
+    scored.clear()
+    again = analyze(items + [{"id": "c5", "text": "Pésimo, nunca más"}], "tiktok")
+    assert scored == ["Pésimo, nunca más"]
+    assert again[:5] == first and again[5]["compound"] < 0
+
+
+def test_cache_by_text_hash_without_id(sentiment_cache, scored):
+    items = [{"text": "Excelente servicio"}, {"text": "Excelente servicio"}, {"text": "  "}]
+    res = analyze(items)
+    assert len(res) == 2 and res[0] == res[1]  # el vacío se omite
+    assert scored == ["Excelente servicio"]  # repetido en el lote: una vez
+    analyze([{"text": "Excelente servicio"}])
+    assert scored == ["Excelente servicio"]  # y la segunda vez sale de la caché
+
+
+def test_pool_gives_same_results(monkeypatch):
+    texts = [
+        "Excelente atención, muy recomendado 👍", "Pésimo servicio, nunca más", "Great products, love it",
+        "No es bueno pero es barato", "meh", "Todo bien!!!",
+    ] * 5
+    monkeypatch.setattr(sentiment, "SENTIMENT_POOL_MIN", 10)
+    try:
+        pooled = score_texts(texts, workers=2)
+        assert sentiment._pool is not None
+    finally:
+        if sentiment._pool is not None:
+            sentiment._pool.shutdown()
+            sentiment._pool = None
+    assert pooled == score_texts(texts, workers=1)
+
+
+@pytest.mark.parametrize("text, lang", [
+    ("La atención fue excelente y los precios muy buenos", "es"),
+    ("No tenían lo que buscaba, pero el personal es amable", "es"),
+    ("The service was great and the staff is very friendly", "en"),
+    ("I love this shop, it's the best in town", "en"),
+])
+def test_detect_lang(text, lang):
+    assert detect_lang(text) == lang
+
+
+def test_lexicon_polarity():
+    assert score_text("Excelente, muy recomendado")[1] > 0.5
+    assert score_text("Pésimo servicio, nunca más")[1] < -0.5
+    assert score_text("no es bueno")[1] < 0  # negación
+    assert score_text("bueno")[1] < score_text("muy bueno")[1]  # intensificador
+
+
+def test_sentiment_moves_component_scores():
+    maps = {"rating": 4.0, "user_ratings_total": 120}
+    base = pipeline._score_from_maps_features(maps)
+    assert pipeline._score_from_maps_features({**maps, "sentiment": {"n": 20, "mean": -0.8}}) > base
+    assert pipeline._score_from_maps_features({**maps, "sentiment": {"n": 20, "mean": 0.9}}) < base
+    assert pipeline._score_from_maps_features({**maps, "sentiment": {"n": 2, "mean": -0.8}}) == base  # pocos textos
+
+    tt = {"overview": {"risk_score": 40}}
+    base = pipeline._score_from_tiktok_features(tt)
+    neg = {"overview": {"risk_score": 40, "sentiment": {"n": 20, "mean": -0.8}}}
+    pos = {"overview": {"risk_score": 40, "sentiment": {"n": 20, "mean": 0.9}}}
+    assert pipeline._score_from_tiktok_features(neg) > base > pipeline._score_from_tiktok_features(pos)
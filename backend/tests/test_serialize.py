@@ -0,0 +1,44 @@
+"""Serialización rápida de respuestas: el fallback con `json` da lo mismo que orjson."""
+import json
+import math
+
+import numpy as np
+import pytest
+
+from app.services import serialize
+
+OBJ = {
+    "score": 50,
+    "creditLimit": math.nan,
+    "ratios": [1.5, math.inf, -math.inf, (2.0, math.nan)],
+    "np": {"f32": np.float32("nan"), "f64": np.float64(0.25), "arr": np.array([1.0, np.nan]), "i": np.int64(3)},
+    "texto": "año",
+}
+EXPECTED = {
+    "score": 50,
+    "creditLimit": None,
+    "ratios": [1.5, None, None, [2.0, None]],
+    "np": {"f32": None, "f64": 0.25, "arr": [1.0, None], "i": 3},
+    "texto": "año",
+}
+
+
+def test_stdlib_fallback_maps_non_finite_to_null(monkeypatch):
+    monkeypatch.setattr(serialize, "_ORJSON_OK", False)
+    assert json.loads(serialize.dumps_json(OBJ)) == EXPECTED
+
+
+def test_stdlib_fallback_keeps_starlette_bytes(monkeypatch):
+    monkeypatch.setattr(serialize, "_ORJSON_OK", False)
+    obj = {"a": 1.5, "b": "ñ", "c": [None, True]}
+    assert serialize.dumps_json(obj) == json.dumps(
+        obj, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def test_orjson_and_fallback_agree(monkeypatch):
+    pytest.importorskip("orjson")
+    monkeypatch.setattr(serialize, "_ORJSON_OK", True)
+    fast = serialize.dumps_json(OBJ)
+    monkeypatch.setattr(serialize, "_ORJSON_OK", False)
+    assert json.loads(fast) == json.loads(serialize.dumps_json(OBJ)) == EXPECTED
@@ -0,0 +1,92 @@
+"""Single-flight con presupuesto compartido: la ejecución dura lo que el llamador más largo."""
+import asyncio
+
+import pytest
+
+from app.services.deadline import SharedDeadline, expired, remaining, within
+from app.services.singleflight import SingleFlight
+
+
+async def _work(steps=6, step_s=0.05):
+    """Como un scraper: corta con `_partial` si se agota el presupuesto."""
+    for i in range(steps):
+        if expired():
+            return {"steps": i, "_partial": True}
+        await asyncio.sleep(step_s)
+    return {"steps": steps}
+
+
+def test_solo_caller_keeps_its_deadline():
+    async def go():
+        with within(0.1):
+            return await SingleFlight().do("k", _work)
+
+    assert asyncio.run(go())["_partial"] is True
+
+
+def test_later_caller_with_longer_budget_gets_full_result():
+    sf = SingleFlight()
+
+    async def caller(budget, delay):
+        await asyncio.sleep(delay)
+        with within(budget):
+            return await asyncio.wait_for(sf.do("k", _work), budget)
+
+    async def go():
+        return await asyncio.gather(caller(0.1, 0), caller(2.0, 0.02), return_exceptions=True)
+
+    short, long_ = asyncio.run(go())
+    assert isinstance(short, asyncio.TimeoutError)  # el corto deja de esperar al vencer el suyo
+    assert long_ == {"steps": 6}
+    assert sf.executions == 1 and sf.shared == 1
+
+
+def test_joiner_without_deadline_lifts_the_limit():
+    sf = SingleFlight()
+
+    async def go():
+        async def first():
+            with within(0.1):
+                return await sf.do("k", _work)
+
+        t = asyncio.ensure_future(first())
+        await asyncio.sleep(0.01)
+        second = await sf.do("k", _work)
+        return await t, second
+
+    first, second = asyncio.run(go())
+    assert first == second == {"steps": 6}
+
+
+def test_shared_deadline_join_and_nested_within():
+    async def go():
+        with within(0.1):
+            d = SharedDeadline()
+        with within(1.0):
+            d.join()
+        with d.applied():
+            assert remaining() > 0.5
+            with within(0.05):
+                assert remaining() <= 0.05
+        d2 = SharedDeadline()  # sin presupuesto en el contexto
+        with within(0.1):
+            d2.join()
+        assert d2.at is None
+
+    asyncio.run(go())
+
+
+def test_execution_survives_first_caller_cancel():
+    sf = SingleFlight()
+
+    async def go():
+        t1 = asyncio.ensure_future(sf.do("k", _work))
+        await asyncio.sleep(0.01)
+        t2 = asyncio.ensure_future(sf.do("k", _work))
+        await asyncio.sleep(0.01)
+        t1.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await t1
+        return await t2
+
+    assert asyncio.run(go()) == {"steps": 6}
@@ -0,0 +1,56 @@
+"""/api/orchestrate/stream: financiero primero, cada fuente al terminar con fusión provisional, y el final."""
+import asyncio
+import json
+
+from app import pipeline
+
+BODY = {"ruc": "0990000000001", "mock": True}
+SAME = ("component_scores", "final_score", "risk_label", "used_files", "timed_out", "skipped")
+
+
+def _events(client, body, **kw):
+    with client.stream("POST", "/api/orchestrate/stream", json=body, **kw) as r:
+        assert r.status_code == 200
+        return r.headers["content-type"], [line for line in r.iter_lines() if line]
+
+
+def test_mock_stream_order_and_final(client):
+    ctype, lines = _events(client, BODY)
+    assert ctype.startswith("application/x-ndjson")
+    events = [json.loads(line) for line in lines]
+    assert [e["event"] for e in events] == ["fin", "gmaps", "tiktok", "final"]
+
+    fin, maps, tt, final = events
+    assert fin["provisional"] and fin["component_scores"]["maps"] is None and fin["component_scores"]["tt"] is None
+    assert maps["component_scores"]["maps"] is not None and maps["component_scores"]["tt"] is None
+    assert tt["component_scores"]["maps"] is not None and tt["component_scores"]["tt"] is not None
+    assert fin["component_scores"]["fin"] == final["result"]["component_scores"]["fin"]
+    assert tt["final_score"] == final["result"]["final_score"]  # la última provisional ya es la final
+    assert [e["elapsed_ms"] for e in events] == sorted(e["elapsed_ms"] for e in events)
+
+    single = client.post("/api/orchestrate", json=BODY).json()
+    assert {k: final["result"][k] for k in SAME} == {k: single[k] for k in SAME}
+
+
+def test_sources_are_emitted_as_they_finish(client, monkeypatch):
+    async def fetch(source, query, refresh, flags, **opts):
+        if source == "gmaps":
+            await asyncio.sleep(0.2)  # Maps termina después de TikTok
+            return {"query": query, "rating": 4.5, "reviews": 100}
+        return {"username": query, "followers": 1000, "videos": [{"id": "v", "likes": 50}]}
+
+    monkeypatch.setattr(pipeline, "_fetch_bounded", fetch)
+    body = {"ruc": "0990000000001", "mock": False, "run_scrapers": True, "gmaps": "Tienda", "tiktok": "shop"}
+    _, lines = _events(client, body)
+    events = [json.loads(line) for line in lines]
+    assert [e["event"] for e in events] == ["fin", "tiktok", "gmaps", "final"]
+    assert events[1]["component_scores"]["maps"] is None and events[1]["component_scores"]["tt"] is not None
+
+
+def test_stream_as_server_sent_events(client):
+    ctype, lines = _events(client, BODY, headers={"Accept": "text/event-stream"})
+    assert ctype.startswith("text/event-stream")
+    names = [line.split(": ", 1)[1] for line in lines if line.startswith("event: ")]
+    assert names == ["fin", "gmaps", "tiktok", "final"]
+    data = [json.loads(line.split(": ", 1)[1]) for line in lines if line.startswith("data: ")]
+    assert data[-1]["result"]["ruc"] == BODY["ruc"]
@@ -0,0 +1,53 @@
+"""Captura de TikTok reproducida sobre las respuestas grabadas en data/fixtures/tiktok."""
+from app.config import BASE_DIR
+from app.scrapers.tiktok_capture import api_kind, replay_fixtures
+
+FIXTURE = BASE_DIR / "app" / "data" / "fixtures" / "tiktok" / "fixture_shop"
+V1, V2, V5 = "7310000000000000001", "7310000000000000002", "7310000000000000005"
+
+
+def test_api_kind():
+    assert api_kind("https://www.tiktok.com/api/post/item_list/?count=5") == "item_list"
+    assert api_kind("https://www.tiktok.com/api/comment/list/?aweme_id=1") == "comment_list"
+    assert api_kind("https://www.tiktok.com/@fixture_shop") is None
+
+
+def test_replay_profile_and_limits():
+    r = replay_fixtures(FIXTURE, "fixture_shop")
+    assert r["username"] == "fixture_shop"
+    assert (r["followers"], r["following"], r["likes_total"], r["videos_total"]) == (15200, 87, 412000, 64)
+    assert r["nickname"] == "Fixture Shop EC"
+    assert len(r["videos"]) == 10
+    counts = {v["id"]: len(v["comment_items"]) for v in r["videos"]}
+    assert counts[V1] == 5 and counts[V2] == 2
+    assert r["_capture"] == {"responses": 5, "comment_pages": 3, "reached_known": False}
+
+
+def test_replay_stops_at_limits():
+    r = replay_fixtures(FIXTURE, "fixture_shop", video_limit=3, comments_per_video=2, comment_pages=1)
+    assert [v["id"] for v in r["videos"]] == [V1, V2, "7310000000000000003"]
+    assert [len(v["comment_items"]) for v in r["videos"]] == [2, 2, 0]
+    assert r["_capture"]["responses"] == 3  # una página de videos + una de comentarios por video
+
+
+def test_replay_comment_pages_are_deduplicated():
+    r = replay_fixtures(FIXTURE, "fixture_shop", comments_per_video=10, comment_pages=10)
+    items = r["videos"][0]["comment_items"]
+    assert len(items) == 8
+    assert len({c["id"] for c in items}) == len(items)
+    assert items[0] == {
+        "id": "7310000000000000001000", "text": "Excelente atención, muy recomendados", "likes": 20,
+        "replies": 0, "create_time": 1717100000, "author": "cliente_0",
+    }
+
+
+def test_replay_stops_at_known_video():
+    r = replay_fixtures(FIXTURE, "fixture_shop", known={V5: {"comments": 18, "comment_ids": set()}})
+    assert len(r["videos"]) == 5  # la segunda página de videos no se pide
+    assert r["_capture"]["reached_known"] is True
+
+
+def test_replay_skips_comments_of_unchanged_video():
+    r = replay_fixtures(FIXTURE, "fixture_shop", known={V1: {"comments": 56, "comment_ids": set()}})
+    counts = {v["id"]: len(v["comment_items"]) for v in r["videos"]}
+    assert counts[V1] == 0 and counts[V2] == 2
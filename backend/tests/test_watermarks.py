@@ -0,0 +1,105 @@
+"""Re-scrape incremental: los totales ajustados por deltas coinciden con recalcular todo."""
+import pytest
+
+from app.analysis.analyze_maps import merge_maps, summarize_maps
+from app.analysis.analyze_tiktok import merge_tiktok, summarize_tiktok
+from app.analysis.sentiment import analyze, sentiment_sums
+from app.services.watermarks import WatermarkStore, review_ids, tiktok_known
+
+TEXTS = [
+    "Excelente atención, muy recomendado 👍",
+    "Pésimo servicio, nunca más",
+    "Great products, love this shop",
+    "Llegó roto y no responden",
+    "Todo bien, gracias",
+    "meh",
+]
+
+
+def _c(cid, i):
+    return {"id": cid, "text": TEXTS[i % len(TEXTS)]}
+
+
+def _video(vid, t, likes, comments):
+    return {
+        "id": vid, "create_time": t, "likes": likes, "comments": len(comments), "shares": likes // 10,
+        "comment_items": comments,
+    }
+
+
+def _tiktok_recompute(state):
+    vids = state["videos"]
+    return {
+        "videos": len(vids),
+        "likes": sum(v["likes"] for v in vids),
+        "comments": sum(v["comments"] for v in vids),
+        "shares": sum(v["shares"] for v in vids),
+        "sentiment": sentiment_sums(analyze([c for v in vids for c in v["comment_items"]], "tiktok")),
+    }
+
+
+def _without_totals(state):
+    return {k: v for k, v in state.items() if k != "totals"}
+
+
+@pytest.fixture(autouse=True)
+def _cache(sentiment_cache):
+    return sentiment_cache
+
+
+def test_store_roundtrip_and_known_ids(tmp_path):
+    store = WatermarkStore(tmp_path / "wm.sqlite")
+    assert store.get("tiktok", "shop|10") is None
+    state = {
+        "videos": [_video("v1", 100, 50, [_c("c1", 0), _c("c2", 1), {"text": "sin id"}])],
+        "review_items": [{"id": "r1"}, {"text": "sin id"}],
+    }
+    store.put("tiktok", "shop|10", state)
+    assert store.get("tiktok", "shop|10") == state
+    assert tiktok_known(state) == {"v1": {"comments": 3, "comment_ids": {"c1", "c2"}}}
+    assert review_ids(state) == {"r1"}
+    assert tiktok_known(None) == {} and review_ids(None) == set()
+    assert store.stats()["rows"] == {"tiktok": 1}
+    assert store.delete("tiktok", "shop|10") and store.get("tiktok", "shop|10") is None
+
+
+def test_merge_tiktok_matches_full_recompute():
+    first = {"followers": 1000, "videos": [
+        _video("v3", 300, 90, [_c("a1", 0), _c("a2", 1)]),
+        _video("v2", 200, 40, [_c("b1", 2)]),
+        _video("v1", 100, 10, [_c("d1", 3), _c("d2", 4)]),
+    ]}
+    s1 = merge_tiktok(None, first, video_limit=3, comments_per_video=3)
+    assert s1["totals"] == _tiktok_recompute(s1)
+
+    # llega un video nuevo (v1 sale de la ventana) y v3 cambia: más likes y un comentario nuevo;
+    # el scrape se corta en v3 (ya conocido), así que v2 no viene
+    second = {"followers": 1100, "videos": [
+        _video("v4", 400, 5, [_c("e1", 5)]),
+        _video("v3", 300, 120, [_c("a0", 3)]),
+    ]}
+    s2 = merge_tiktok(s1, second, video_limit=3, comments_per_video=2)
+    assert [v["id"] for v in s2["videos"]] == ["v4", "v3", "v2"]
+    assert [c["id"] for c in s2["videos"][1]["comment_items"]] == ["a0", "a1"]
+    assert s2["totals"] == _tiktok_recompute(s2)
+    assert summarize_tiktok(s2) == summarize_tiktok(_without_totals(s2))
+
+    # re-scrape sin cambios: mismo estado
+    s3 = merge_tiktok(s2, {"followers": 1100, "videos": [dict(s2["videos"][0])]}, 3, 2)
+    assert s3["totals"] == s2["totals"]
+
+
+def test_merge_maps_skips_known_reviews():
+    def r(rid, i):
+        return {"id": rid, "stars": 1 + i % 5, "text": TEXTS[i % len(TEXTS)]}
+
+    s1 = merge_maps(None, {"rating": 4.1, "reviews": 3, "review_items": [r("r3", 0), r("r2", 1), r("r1", 2)]}, 4)
+    assert s1["totals"]["sentiment"] == sentiment_sums(analyze(s1["review_items"], "gmaps"))
+
+    # lectura completa: r3 y r2 ya estaban y no se cuentan dos veces; r1 sale de la ventana
+    fresh = {"rating": 4.2, "reviews": 5, "review_items": [r("r5", 3), r("r4", 4), r("r3", 0), r("r2", 1)]}
+    s2 = merge_maps(s1, fresh, 4)
+    assert [x["id"] for x in s2["review_items"]] == ["r5", "r4", "r3", "r2"]
+    assert s2["totals"]["sentiment"]["n"] == 4
+    assert s2["totals"]["sentiment"] == sentiment_sums(analyze(s2["review_items"], "gmaps"))
+    assert summarize_maps(s2) == summarize_maps(_without_totals(s2))
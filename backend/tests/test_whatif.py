@@ -0,0 +1,45 @@
+"""Barrido de pesos (/api/whatif): grilla, límite de celdas y paridad con fuse_scores."""
+import time
+
+import pytest
+
+from app.pipeline import WHATIF_MAX_CELLS, sweep_weights, weight_grid
+
+
+def test_weight_grid_product():
+    w = weight_grid({"fin": [0.5, 0.6], "maps": [0.2], "tt": [0.1, 0.2, 0.3]})
+    assert len(w) == 6
+    assert w[0] == {"fin": 0.5, "maps": 0.2, "tt": 0.1}
+
+
+def test_weight_grid_rejects_before_building():
+    huge = {k: [i / 1000 for i in range(1000)] for k in ("fin", "maps", "tt")}  # 1e9 vectores
+    t0 = time.perf_counter()
+    with pytest.raises(ValueError, match="demasiadas combinaciones"):
+        weight_grid(huge)
+    assert time.perf_counter() - t0 < 0.5
+
+
+def test_weight_grid_counts_rows():
+    grid = {"fin": [0.1] * 100, "maps": [0.1] * 100, "tt": [0.1] * 10}  # 1e5 vectores
+    assert len(weight_grid(grid)) == 100_000
+    with pytest.raises(ValueError):
+        weight_grid(grid, rows=WHATIF_MAX_CELLS // 100_000 + 1)
+
+
+def test_weight_grid_missing_component():
+    with pytest.raises(ValueError, match="grid sin valores"):
+        weight_grid({"fin": [0.5], "maps": []})
+
+
+def test_sweep_renormalizes_missing_components():
+    comps = [{"fin": 0.2, "maps": 0.7, "tt": None}, {"fin": None, "maps": 0.4, "tt": 0.9}]
+    weights = weight_grid({"fin": [0.5, 0.7], "maps": [0.3], "tt": [0.2, 0.0]})
+    final, labels = sweep_weights(comps, weights)
+    assert final.shape == labels.shape == (2, 4)
+    for i, c in enumerate(comps):
+        for j, w in enumerate(weights):
+            present = [k for k in ("fin", "maps", "tt") if c[k] is not None]
+            tot = sum(w[k] for k in present)
+            expected = sum(w[k] * c[k] for k in present) / tot if tot > 0 else 0.0
+            assert final[i, j] == pytest.approx(expected)